@@ -5,6 +5,8 @@ import numpy as np
 from scipy.signal import find_peaks
 import time
 
+from aiTrader.upbitconf import api_url
+
 
 def compute_stoch_rsi(series, window=14, smooth_k=3, smooth_d=3):
     # 1. RSI 먼저 계산
@@ -50,9 +52,9 @@ def peak_trade(
 
     api_type, minute = candle_map[candle_unit]
     if api_type == 'days':
-        url = f'https://api.upbit.com/v1/candles/days?market={ticker}&count={count}'
+        url = api_url(f'/v1/candles/days?market={ticker}&count={count}')
     else:
-        url = f'https://api.upbit.com/v1/candles/minutes/{minute}?market={ticker}&count={count}'
+        url = api_url(f'/v1/candles/minutes/{minute}?market={ticker}&count={count}')
 
     # 1. 데이터 가져오기
     response = requests.get(url)
@@ -0,0 +1,100 @@
+import asyncio
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+from multiprocessing.pool import Pool
+from typing import Callable, Dict
+
+import numpy as np
+
+
+# 트렌드 계산 같은 pandas/NumPy 작업을 이벤트 루프 밖 프로세스 풀에서 돌린다.
+# 캔들 배열은 pickle 하지 않고 공유 메모리 한 블록에 복사해 이름과 배치 정보만 넘긴다.
+# 시간 초과(또는 호출 취소) 시 워커는 계속 돌고 있으므로 풀을 terminate 하고 다음 호출에서 새 풀을 만든다
+# (같은 풀에서 돌던 다른 작업도 실패한다). 공유 메모리는 워커가 끝난 뒤에 해제한다.
+# 워커를 직접 끝낼 수 있도록 concurrent.futures 대신 multiprocessing Pool(terminate 제공)을 쓴다.
+
+def _run_with_shared_arrays(func: Callable, shm_name: str, layout, args, kwargs):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        views = {}
+        for name, dtype, shape, offset in layout:
+            views[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+        return func(*args, **views, **kwargs)
+    finally:
+        views = None
+        try:
+            shm.close()
+        except BufferError:
+            # 예외 traceback 이 뷰를 잡고 있는 경우. 프로세스 종료 시 정리된다
+            pass
+
+
+class AnalyticsExecutor:
+    def __init__(self, workers: int = None, timeout: float = None):
+        self.workers = int(workers if workers is not None
+                           else os.getenv("analytics_workers", max(1, (os.cpu_count() or 2) // 2)))
+        self.timeout = float(timeout if timeout is not None else os.getenv("analytics_timeout", "30"))
+        self._pool = None
+
+    @property
+    def pool(self) -> Pool:
+        if self._pool is None:
+            self._pool = multiprocessing.get_context("spawn").Pool(self.workers)
+        return self._pool
+
+    async def run(self, func: Callable, arrays: Dict[str, np.ndarray], *args, timeout: float = None, **kwargs):
+        # func(*args, **arrays, **kwargs) 를 워커에서 실행. arrays 는 워커에서 공유 메모리 뷰로 받는다
+        arrays = {name: np.ascontiguousarray(arr) for name, arr in arrays.items()}
+        layout = []
+        offset = 0
+        for name, arr in arrays.items():
+            layout.append((name, arr.dtype.str, arr.shape, offset))
+            offset += -(-arr.nbytes // 8) * 8  # 8바이트 정렬
+        shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        try:
+            for (name, dtype, shape, off), arr in zip(layout, arrays.values()):
+                np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=off)[...] = arr
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+
+            def resolve(value, error=False):
+                # 풀의 결과 스레드에서 불린다
+                loop.call_soon_threadsafe(_settle, future, value, error)
+
+            self.pool.apply_async(_run_with_shared_arrays, (func, shm.name, layout, args, kwargs),
+                                  callback=resolve, error_callback=lambda e: resolve(e, True))
+            try:
+                return await asyncio.wait_for(future, timeout if timeout is not None else self.timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                await asyncio.to_thread(self._terminate_pool)
+                raise
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def _terminate_pool(self):
+        # 실행 중인 작업은 취소할 수 없으므로 워커 프로세스를 끝낸다 (terminate 는 워커 종료까지 기다린다)
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.terminate()
+
+    def shutdown(self, wait: bool = True):
+        # 블로킹 호출. 이벤트 루프에서는 asyncio.to_thread 로 부른다
+        pool, self._pool = self._pool, None
+        if pool is None:
+            return
+        if wait:
+            pool.close()
+            pool.join()
+        else:
+            pool.terminate()
+
+
+def _settle(future: asyncio.Future, value, error: bool):
+    if future.done():  # 시간 초과로 이미 포기한 작업
+        return
+    if error:
+        future.set_exception(value)
+    else:
+        future.set_result(value)
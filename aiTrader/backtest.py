@@ -0,0 +1,292 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Sequence
+
+import numpy as np
+import pandas as pd
+
+from aiTrader.candlearchive import CandleArchive
+from aiTrader.candlestore import KST_OFFSET, candle_seconds, candles_to_arrays, kst_to_epoch
+from aiTrader.orderexec import FEE_RATE, order_amounts
+
+
+# 저장해 둔 캔들로 전략을 오프라인 재생한다.
+# 신호는 봉 전체에 대해 벡터로 계산하고, 포지션(보유/미보유) 상태만 신호가 있는 봉을 따라가며 처리한다.
+# 체결은 신호가 난 봉의 종가, 수수료는 buy_crypto/sell_crypto 와 같은 0.05% (orderexec.order_amounts).
+#
+# 전략
+#   cross : activetracer.peak_trade — VWMA 골든/데드 크로스 + 최근 크로스 이후 고/저점 대비 threshold, long VWMA 근접
+#   peak  : peaktrade.trade_loop    — 단기 VWMA 직전 봉의 최고/최저점 + 최근 3봉 추세
+#
+# 캔들: data_dir 이 캔들 보관소(candlearchive) 이면 {data_dir}/{market}/{tf}/ 를 memmap 으로 읽고,
+#   아니면 {data_dir}/{market}_{tf}.json (업비트 캔들 응답 리스트) 또는 .csv
+#   (candle_date_time_kst, trade_price, candle_acc_trade_volume 컬럼). 해당 tf 파일이 없으면 1m 파일을 묶어서 쓴다.
+
+STAKE_KRW = 500_000  # 마켓별 초기 자금 (activetracer 1회 매수 금액과 같음)
+
+
+class Bars(NamedTuple):
+    ts: np.ndarray  # epoch 초 (KST naive), 오름차순
+    close: np.ndarray
+    volume: np.ndarray
+
+
+class BacktestResult(NamedTuple):
+    market: str
+    tf: str
+    trades: List[dict]
+    pnl: float
+    pnl_pct: float
+    max_drawdown: float  # 비율 (-0.12 = -12%)
+    final_equity: float
+    equity: np.ndarray  # 봉마다 평가금액 (초기 STAKE 기준)
+
+    def summary(self) -> dict:
+        return {"market": self.market, "tf": self.tf, "trades": len(self.trades), "pnl": round(self.pnl, 2),
+                "pnl_pct": round(self.pnl_pct * 100, 4), "max_drawdown_pct": round(self.max_drawdown * 100, 4),
+                "final_equity": round(self.final_equity, 2)}
+
+
+def load_candle_file(path: str) -> Bars:
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            ts, rows = candles_to_arrays(json.load(f))
+        close, volume = rows[:, 3], rows[:, 4]
+    else:
+        df = pd.read_csv(path, usecols=["candle_date_time_kst", "trade_price", "candle_acc_trade_volume"])
+        ts = kst_to_epoch(df["candle_date_time_kst"].to_numpy(dtype=str))
+        order = np.argsort(ts, kind="stable")
+        ts = ts[order]
+        close = df["trade_price"].to_numpy(np.float64)[order]
+        volume = df["candle_acc_trade_volume"].to_numpy(np.float64)[order]
+    # 파일을 이어 붙이며 생긴 중복 봉은 마지막 값을 쓴다
+    keep = np.append(ts[1:] != ts[:-1], True)
+    return Bars(ts[keep], close[keep], volume[keep])
+
+
+def resample_bars(bars: Bars, seconds: int) -> Bars:
+    # 분봉을 더 긴 봉으로. 업비트 봉 경계(UTC 기준)에 맞추고 종가=마지막, 거래량=합
+    if len(bars.ts) == 0:
+        return bars
+    bucket = (bars.ts - KST_OFFSET) // seconds
+    last = np.append(bucket[1:] != bucket[:-1], True)
+    starts = np.flatnonzero(np.insert(bucket[1:] != bucket[:-1], 0, True))
+    return Bars(bucket[last] * seconds + KST_OFFSET, bars.close[last], np.add.reduceat(bars.volume, starts))
+
+
+def load_market(data_dir: str, market: str, tf: str) -> Bars:
+    archive = CandleArchive(data_dir)
+    if archive.exists(market, tf):
+        cols = archive.series(market, tf).arrays()
+        return Bars(cols['timestamp'], cols['close'], cols['volume'])
+    for ext in (".json", ".csv"):
+        path = os.path.join(data_dir, f"{market}_{tf}{ext}")
+        if os.path.exists(path):
+            return load_candle_file(path)
+    if tf != "1m":
+        return resample_bars(load_market(data_dir, market, "1m"), candle_seconds(tf))
+    raise FileNotFoundError(f"캔들 파일 없음: {market} {tf} ({data_dir})")
+
+
+class PriceSums:
+    """가격x거래량, 거래량 누적합. 어떤 창 길이의 VWMA 든 봉마다 O(1) 로 구한다."""
+
+    def __init__(self, close: np.ndarray, volume: np.ndarray):
+        self.close = close
+        self.cpv = np.concatenate(([0.0], np.cumsum(close * volume)))
+        self.cv = np.concatenate(([0.0], np.cumsum(volume)))
+
+    def vwma(self, window: int) -> np.ndarray:
+        out = np.full(len(self.close), np.nan)
+        if window <= len(self.close):
+            with np.errstate(divide="ignore", invalid="ignore"):
+                out[window - 1:] = ((self.cpv[window:] - self.cpv[:-window])
+                                    / (self.cv[window:] - self.cv[:-window]))
+        return out
+
+
+def _recent(flags: np.ndarray, window: int) -> np.ndarray:
+    # 최근 window 봉(현재 포함) 안에 flag 가 하나라도 있는지
+    c = np.concatenate(([0], np.cumsum(flags)))
+    idx = np.arange(1, len(flags) + 1)
+    return c[idx] - c[np.maximum(idx - window, 0)] > 0
+
+
+class CrossState(NamedTuple):
+    # threshold 와 무관한 크로스 구조. (short, long) 이 같으면 threshold 조합끼리 공유한다
+    g3: np.ndarray
+    d3: np.ndarray
+    wait: np.ndarray
+    has_cross: np.ndarray
+    fall: np.ndarray
+    rise: np.ndarray
+    gap: np.ndarray
+
+
+def cross_state(close: np.ndarray, vs: np.ndarray, vl: np.ndarray, count=200) -> CrossState:
+    n = len(close)
+    prev_vs = np.concatenate(([np.nan], vs[:-1]))
+    prev_vl = np.concatenate(([np.nan], vl[:-1]))
+    golden = (vs > vl) & (prev_vs <= prev_vl)
+    dead = (vs < vl) & (prev_vs >= prev_vl)
+
+    # 마지막 크로스 이후 최고/최저가 (크로스 봉 포함). 조회 창(count) 밖의 크로스는 없는 것으로 본다
+    cross = golden | dead
+    seg = np.cumsum(cross)
+    last_cross = np.maximum.accumulate(np.where(cross, np.arange(n), -1))
+    s = pd.Series(close)
+    hi = s.groupby(seg).cummax().to_numpy()
+    lo = s.groupby(seg).cummin().to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fall = (hi - close) / hi
+        rise = (close - lo) / lo
+        gap = np.abs(close - vl) / vl
+    return CrossState(_recent(golden, 3), _recent(dead, 3), _recent(golden, 5) & _recent(dead, 5),
+                      (last_cross >= 0) & (np.arange(n) - last_cross < count), fall, rise, gap)
+
+
+def cross_state_signals(state: CrossState, threshold=0.03, close_threshold=0.001):
+    near = state.gap <= close_threshold
+    rest = ~state.g3 & ~state.d3 & state.has_cross
+    buy = ~state.wait & (state.g3 | (rest & ((state.rise >= threshold) | near)))
+    sell = ~state.wait & ~state.g3 & (state.d3 | (rest & ((state.fall >= threshold) | near)))
+    return buy, sell
+
+
+def cross_signals(close: np.ndarray, vs: np.ndarray, vl: np.ndarray, threshold=0.03, close_threshold=0.001,
+                  count=200):
+    # activetracer.peak_trade 를 봉마다 적용한 결과 (매수 신호, 매도 신호)
+    return cross_state_signals(cross_state(close, vs, vl, count), threshold, close_threshold)
+
+
+def peak_signals(close: np.ndarray, vs: np.ndarray):
+    # peaktrade.trade_loop: 직전 봉이 단기 VWMA 최저점이고 최근 3봉 상승이면 매수, 최고점이고 하락이면 매도.
+    # 원본은 최저/최고점 봉의 가격을 기록하지만 실제로 주문할 수 있는 것은 확인 시점이므로 현재 봉 종가로 체결한다
+    n = len(close)
+    buy = np.zeros(n, dtype=bool)
+    sell = np.zeros(n, dtype=bool)
+    if n < 4:
+        return buy, sell
+    a, b, c = vs[:-2], vs[1:-1], vs[2:]  # b = 직전 봉, c = 현재 봉
+    peak = (b > a) & (b > c)
+    trough = (b < a) & (b < c)
+    # find_peaks(distance=3): 2봉 앞의 더 높은(낮은) 꼭지점이 있으면 무시
+    peak[2:] &= ~(peak[:-2] & (b[:-2] > b[2:]))
+    trough[2:] &= ~(trough[:-2] & (b[:-2] < b[2:]))
+    up = (close[:-2] < close[1:-1]) & (close[1:-1] < close[2:])
+    down = (close[:-2] > close[1:-1]) & (close[1:-1] > close[2:])
+    buy[2:] = trough & up
+    sell[2:] = peak & down
+    return buy, sell
+
+
+def simulate(market: str, tf: str, bars: Bars, buy: np.ndarray, sell: np.ndarray,
+             stake: float = STAKE_KRW) -> BacktestResult:
+    # 미보유 상태의 매수 신호에 보유 KRW 전액(수수료 포함) 매수, 보유 상태의 매도 신호에 전량 매도
+    close = bars.close
+    n = len(close)
+    dcash = np.zeros(n)
+    dqty = np.zeros(n)
+    trades = []
+    volum = 0.0
+    cash = stake
+    for i in np.flatnonzero(buy | sell):
+        price = float(close[i])
+        if not volum and buy[i]:
+            volum = cash / (price * (1 + FEE_RATE))
+            krw = order_amounts("BUY", price, volum)
+            cash -= krw
+            dcash[i] -= krw
+            dqty[i] += volum
+            trades.append({"ts": int(bars.ts[i]), "side": "BUY", "price": price, "volume": volum, "krw": krw})
+        elif volum and sell[i]:
+            krw = order_amounts("SELL", price, volum)
+            cash += krw
+            dcash[i] += krw
+            dqty[i] -= volum
+            trades.append({"ts": int(bars.ts[i]), "side": "SELL", "price": price, "volume": volum, "krw": krw})
+            volum = 0.0
+    # 보유 중인 코인은 마지막 종가로 평가 (미실현)
+    equity = stake + np.cumsum(dcash) + np.cumsum(dqty) * close
+    if n == 0:
+        return BacktestResult(market, tf, trades, 0.0, 0.0, 0.0, stake, equity)
+    peak = np.maximum.accumulate(equity)
+    final = float(equity[-1])
+    return BacktestResult(market, tf, trades, final - stake, (final - stake) / stake,
+                          float(np.min(equity / peak - 1)), final, equity)
+
+
+def run_strategy(market: str, tf: str, bars: Bars, strategy: str = "cross", short_window=1, long_window=45,
+                 threshold=0.03, close_threshold=0.001, count=200, stake=STAKE_KRW, sums: PriceSums = None):
+    sums = sums or PriceSums(bars.close, bars.volume)
+    vs = sums.vwma(short_window)
+    if strategy == "cross":
+        buy, sell = cross_signals(bars.close, vs, sums.vwma(long_window), threshold, close_threshold, count)
+    elif strategy == "peak":
+        buy, sell = peak_signals(bars.close, vs)
+    else:
+        raise ValueError(f"지원하지 않는 전략입니다: {strategy}")
+    return simulate(market, tf, bars, buy, sell, stake)
+
+
+def portfolio_drawdown(results: Sequence[BacktestResult], bars: Dict[str, Bars]) -> float:
+    # 마켓별 평가금액을 전체 봉 시각에 맞춰(앞 값 유지) 더한 합계의 최대 낙폭
+    series = [pd.Series(r.equity, index=bars[r.market].ts) for r in results if len(r.equity)]
+    if not series:
+        return 0.0
+    total = pd.concat(series, axis=1).sort_index().ffill().bfill().sum(axis=1).to_numpy()
+    return float(np.min(total / np.maximum.accumulate(total) - 1))
+
+
+def _run_market(args):
+    data_dir, market, tf, params = args
+    bars = load_market(data_dir, market, tf)
+    return run_strategy(market, tf, bars, **params), bars
+
+
+def run_backtest(data_dir: str, markets: Sequence[str], tf: str, workers: int = 1, **params) -> dict:
+    jobs = [(data_dir, market, tf, params) for market in markets]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            done = list(pool.map(_run_market, jobs))
+    else:
+        done = [_run_market(job) for job in jobs]
+    results = [r for r, _ in done]
+    bars = {r.market: b for r, b in done}
+    stake = params.get("stake", STAKE_KRW)
+    pnl = sum(r.pnl for r in results)
+    return {"markets": [r.summary() for r in results],
+            "total": {"pnl": round(pnl, 2), "pnl_pct": round(pnl / (stake * len(results)) * 100, 4) if results else 0,
+                      "trades": sum(len(r.trades) for r in results),
+                      "max_drawdown_pct": round(portfolio_drawdown(results, bars) * 100, 4)},
+            "trades": [dict(t, market=r.market) for r in results for t in r.trades]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="저장된 캔들로 전략 백테스트")
+    parser.add_argument("--data", required=True, help="캔들 파일 디렉터리")
+    parser.add_argument("--markets", nargs="+", required=True)
+    parser.add_argument("--tf", default="3m")
+    parser.add_argument("--strategy", choices=["cross", "peak"], default="cross")
+    parser.add_argument("--short", type=int, default=1)
+    parser.add_argument("--long", type=int, default=45)
+    parser.add_argument("--threshold", type=float, default=0.03)
+    parser.add_argument("--close-threshold", type=float, default=0.001)
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--stake", type=float, default=STAKE_KRW)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--trades", help="체결 내역 CSV 저장 경로")
+    args = parser.parse_args()
+    report = run_backtest(args.data, args.markets, args.tf, workers=args.workers, strategy=args.strategy,
+                          short_window=args.short, long_window=args.long, threshold=args.threshold,
+                          close_threshold=args.close_threshold, count=args.count, stake=args.stake)
+    if args.trades:
+        pd.DataFrame(report["trades"]).to_csv(args.trades, index=False)
+    report.pop("trades")
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import argparse
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from aiTrader.candlefetch import CandleFetcher, candle_path
+from aiTrader.candlestore import KST_OFFSET, UPBIT_MAX_COUNT, candle_seconds, candles_to_arrays
+from aiTrader.logpipe import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# (market, timeframe) 별 로컬 캔들 보관소.
+# {root}/{market}/{tf}/ 아래 컬럼마다 고정폭 파일 하나 (ts.i64, open/high/low/close/volume.f64) 에 마감된 봉만 덧붙인다.
+# 읽기는 np.memmap 뷰 (복사 없음). ts 는 오름차순이므로 searchsorted 가 곧 시각 인덱스다.
+# 쓰기는 값 컬럼을 먼저, ts 를 마지막에 덧붙여 ts 길이를 커밋 표시로 쓴다 (중간에 죽으면 다음 쓰기에서 잘라낸다).
+
+COLUMNS = (('timestamp', 'ts.i64', np.int64), ('open', 'open.f64', np.float64), ('high', 'high.f64', np.float64),
+           ('low', 'low.f64', np.float64), ('close', 'close.f64', np.float64),
+           ('volume', 'volume.f64', np.float64))
+
+
+class ArchiveSeries:
+    def __init__(self, path: str):
+        self.path = path
+        self._maps: Dict[str, np.ndarray] = {}
+        self._mapped = -1
+
+    def _file(self, fname: str) -> str:
+        return os.path.join(self.path, fname)
+
+    def __len__(self) -> int:
+        try:
+            return os.path.getsize(self._file('ts.i64')) // 8
+        except FileNotFoundError:
+            return 0
+
+    def _columns(self) -> Dict[str, np.ndarray]:
+        n = len(self)
+        if n != self._mapped:
+            # 파일이 늘어났을 때만 다시 매핑한다
+            if n == 0:
+                self._maps = {name: np.empty(0, dtype=dtype) for name, _, dtype in COLUMNS}
+            else:
+                self._maps = {name: np.memmap(self._file(fname), dtype=dtype, mode='r', shape=(n,))
+                              for name, fname, dtype in COLUMNS}
+            self._mapped = n
+        return self._maps
+
+    @property
+    def last_ts(self):
+        cols = self._columns()
+        return int(cols['timestamp'][-1]) if len(cols['timestamp']) else None
+
+    def arrays(self, start: int = None, end: int = None) -> Dict[str, np.ndarray]:
+        # start <= ts < end 구간 (epoch 초, KST naive). CandleRing.arrays() 와 같은 키
+        cols = self._columns()
+        ts = cols['timestamp']
+        i = 0 if start is None else int(np.searchsorted(ts, start, 'left'))
+        j = len(ts) if end is None else int(np.searchsorted(ts, end, 'left'))
+        return {name: col[i:j] for name, col in cols.items()}
+
+    def tail(self, count: int) -> Dict[str, np.ndarray]:
+        return {name: col[-count:] for name, col in self._columns().items()}
+
+    def append(self, ts: np.ndarray, rows: np.ndarray) -> int:
+        # ts 오름차순, rows = [open, high, low, close, volume]. 이미 있는 시각 이전/같은 봉은 버린다
+        last = self.last_ts
+        if last is not None:
+            keep = ts > last
+            ts, rows = ts[keep], rows[keep]
+        if not len(ts):
+            return 0
+        os.makedirs(self.path, exist_ok=True)
+        n = len(self)
+        ts_path = self._file('ts.i64')
+        if os.path.exists(ts_path) and os.path.getsize(ts_path) > n * 8:
+            # ts 도 8바이트 단위가 아닌 꼬리가 남을 수 있다 (쓰다가 죽은 경우). 그대로 덧붙이면 이후 시각이 어긋난다
+            os.truncate(ts_path, n * 8)
+        for k, (name, fname, dtype) in enumerate(COLUMNS[1:]):
+            path = self._file(fname)
+            if os.path.exists(path) and os.path.getsize(path) > n * 8:
+                os.truncate(path, n * 8)
+            with open(path, 'ab') as f:
+                f.write(np.ascontiguousarray(rows[:, k], dtype=dtype).tobytes())
+        with open(ts_path, 'ab') as f:
+            f.write(np.ascontiguousarray(ts, dtype=np.int64).tobytes())
+        return len(ts)
+
+
+class CandleArchive:
+    def __init__(self, root: str):
+        self.root = root
+        self._series: Dict[Tuple[str, str], ArchiveSeries] = {}
+
+    def series(self, market: str, candle_unit: str) -> ArchiveSeries:
+        key = (market, candle_unit)
+        if key not in self._series:
+            self._series[key] = ArchiveSeries(os.path.join(self.root, market, candle_unit))
+        return self._series[key]
+
+    def exists(self, market: str, candle_unit: str) -> bool:
+        return len(self.series(market, candle_unit)) > 0
+
+
+def _upbit_to(ts: int) -> str:
+    # KST naive epoch 초 -> 업비트 to 파라미터 (UTC)
+    return datetime.fromtimestamp(ts - KST_OFFSET, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class ArchiveCollector:
+    """보관소를 최신으로 유지한다. 마지막 봉 이후만 받고, 비어 있으면 backfill 봉 수만큼 과거로 거슬러 받는다."""
+
+    def __init__(self, archive: CandleArchive, fetcher: CandleFetcher,
+                 pairs: Callable[[], Iterable[Tuple[str, str]]], interval: float = 60, backfill: int = None):
+        self.archive = archive
+        self.fetcher = fetcher
+        self.pairs = pairs
+        self.interval = interval
+        self.backfill = int(backfill if backfill is not None else os.getenv("candle_archive_backfill", "1000"))
+        self._task = None
+
+    async def sync(self, market: str, candle_unit: str, now: float = None) -> int:
+        series = self.archive.series(market, candle_unit)
+        tf_sec = candle_seconds(candle_unit)
+        now = time.time() if now is None else now
+        current = int(now // tf_sec * tf_sec) + KST_OFFSET  # 아직 마감되지 않은 봉의 시작 시각
+        last = series.last_ts
+        pages: List[Tuple[np.ndarray, np.ndarray]] = []
+        total, to = 0, None
+        while True:
+            params = {"market": market, "count": UPBIT_MAX_COUNT}
+            if to:
+                params["to"] = to
+            data = await self.fetcher.get_json(candle_path(candle_unit), params)
+            if not data:
+                break
+            ts, rows = candles_to_arrays(data)
+            pages.append((ts, rows))
+            total += len(ts)
+            if len(ts) < UPBIT_MAX_COUNT:
+                break
+            if last is not None and ts[0] <= last:
+                break
+            if last is None and total >= self.backfill:
+                break
+            to = _upbit_to(int(ts[0]))
+        if not pages:
+            return 0
+        ts = np.concatenate([p[0] for p in reversed(pages)])
+        rows = np.concatenate([p[1] for p in reversed(pages)])
+        keep = ts < current
+        ts, rows = ts[keep], rows[keep]
+        ts, idx = np.unique(ts, return_index=True)
+        return series.append(ts, rows[idx])
+
+    async def sync_all(self) -> Dict[Tuple[str, str], object]:
+        pairs = list(self.pairs())
+        results = await asyncio.gather(*(self.sync(m, tf) for m, tf in pairs), return_exceptions=True)
+        return dict(zip(pairs, results))
+
+    async def run(self):
+        while True:
+            for (market, unit), res in (await self.sync_all()).items():
+                if isinstance(res, Exception):
+                    logger.warning("캔들 보관 오류 %s %s: %s", market, unit, res)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+async def _collect(args):
+    fetcher = CandleFetcher()
+    collector = ArchiveCollector(CandleArchive(args.root), fetcher,
+                                 lambda: [(m, tf) for m in args.markets for tf in args.tf], backfill=args.backfill)
+    try:
+        for (market, unit), res in (await collector.sync_all()).items():
+            if isinstance(res, Exception):
+                logger.error("캔들 보관 오류 %s %s: %s", market, unit, res)
+            else:
+                logger.info("캔들 보관 %s %s: %s봉 추가", market, unit, res, extra={"market": market, "tf": unit})
+    finally:
+        await fetcher.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="로컬 캔들 보관소 채우기")
+    parser.add_argument("--root", default=os.getenv("candle_archive_dir", "data/candles"))
+    parser.add_argument("--markets", nargs="+", required=True)
+    parser.add_argument("--tf", nargs="+", default=["1m"])
+    parser.add_argument("--backfill", type=int, default=1000)
+    setup_logging(fmt=os.getenv("log_format", "text"))
+    asyncio.run(_collect(parser.parse_args()))
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import random
+import time
+from typing import Dict, Iterable, List, Tuple
+
+import aiohttp
+
+from aiTrader.metrics import upbit_trace_config
+from aiTrader.upbitconf import api_base
+
+# 캔들 단위 변환
+CANDLE_MAP = {
+    '1d': ('days', ''),
+    '4h': ('minutes', 240),
+    '1h': ('minutes', 60),
+    '30m': ('minutes', 30),
+    '15m': ('minutes', 15),
+    '10m': ('minutes', 10),
+    '5m': ('minutes', 5),
+    '3m': ('minutes', 3),
+    '1m': ('minutes', 1),
+}
+
+
+def candle_path(candle_unit: str) -> str:
+    if candle_unit not in CANDLE_MAP:
+        raise ValueError(f"지원하지 않는 단위입니다: {candle_unit}")
+    api_type, minute = CANDLE_MAP[candle_unit]
+    if api_type == 'days':
+        return "/v1/candles/days"
+    return f"/v1/candles/minutes/{minute}"
+
+
+class TokenBucket:
+    """초당 rate 개의 토큰을 채우는 비동기 토큰 버킷 (업비트 캔들 API 초당 요청 제한용)."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class RateLimited(Exception):
+    pass
+
+
+class CandleFetcher:
+    """공유 aiohttp 세션과 토큰 버킷으로 캔들을 동시에 가져온다. 429 는 지터를 둔 백오프로 재시도한다."""
+
+    def __init__(self, base_url: str = None, rate: float = None, concurrency: int = 10,
+                 max_retries: int = 5, timeout: float = 10.0):
+        self.base_url = base_url or api_base()
+        self.bucket = TokenBucket(float(rate if rate is not None else os.getenv("candle_rate_per_sec", "9")))
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.max_retries = max_retries
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=self.timeout, headers={"Accept": "application/json"},
+                                                  trace_configs=[upbit_trace_config()])
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def _get(self, path: str, params: dict):
+        async with self.semaphore:
+            await self.bucket.acquire()
+            async with self.session.get(self.base_url + path, params=params) as resp:
+                if resp.status == 429:
+                    raise RateLimited(f"API 요청 제한: {resp.status}")
+                if resp.status != 200:
+                    raise Exception(f"API 요청 실패: {resp.status}")
+                return await resp.json()
+
+    async def get_json(self, path: str, params: dict):
+        backoff = 0.2
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self._get(path, params)
+            except RateLimited:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(backoff * random.uniform(0.5, 1.5))
+                backoff = min(backoff * 2, 5.0)
+
+    async def fetch(self, ticker: str, candle_unit: str, count: int = 200, to: str = None) -> List[dict]:
+        params = {"market": ticker, "count": count}
+        if to:
+            params["to"] = to
+        data = await self.get_json(candle_path(candle_unit), params)
+        if not data:
+            raise Exception("데이터가 비어있습니다")
+        return data
+
+    async def fetch_many(self, jobs: Iterable[Tuple[str, str, int]]) -> Dict[Tuple[str, str], object]:
+        # (ticker, candle_unit, count) 목록을 동시에 받는다. 실패한 항목은 예외 객체가 값으로 들어간다
+        jobs = list(jobs)
+        results = await asyncio.gather(*(self.fetch(ticker, unit, count) for ticker, unit, count in jobs),
+                                       return_exceptions=True)
+        return {(ticker, unit): res for (ticker, unit, _), res in zip(jobs, results)}
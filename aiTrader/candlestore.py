@@ -0,0 +1,162 @@
+import os
+import time
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+
+from aiTrader.candlefetch import CANDLE_MAP
+
+KST_OFFSET = 9 * 3600
+UPBIT_MAX_COUNT = 200
+
+
+def candle_seconds(candle_unit: str) -> int:
+    api_type, minute = CANDLE_MAP[candle_unit]
+    if api_type == 'days':
+        return 86400
+    return minute * 60
+
+
+def kst_to_epoch(values) -> np.ndarray:
+    # 'YYYY-MM-DDTHH:MM:SS' (KST, tz 없음) -> int64 초. pd.to_datetime 과 같은 값이 되도록 naive 로 취급한다
+    return np.asarray(values, dtype='datetime64[s]').astype(np.int64)
+
+
+class CandleRing:
+    """고정 용량 배열 기반 캔들 링버퍼 (timestamp int64, open/high/low/close/volume float64)."""
+
+    FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.ts = np.zeros(capacity, dtype=np.int64)
+        self.cols = {name: np.zeros(capacity, dtype=np.float64) for name in self.FIELDS}
+        self.head = 0  # 다음에 쓸 위치
+        self.size = 0
+
+    @property
+    def last_ts(self):
+        if not self.size:
+            return None
+        return int(self.ts[(self.head - 1) % self.capacity])
+
+    def _write(self, pos, ts, row):
+        self.ts[pos] = ts
+        for name, value in zip(self.FIELDS, row):
+            self.cols[name][pos] = value
+
+    def merge(self, ts: np.ndarray, rows: np.ndarray) -> int:
+        # ts 오름차순. 마지막 봉(아직 만들어지는 중)은 덮어쓰고 그 이후 봉만 추가한다
+        added = 0
+        last = self.last_ts
+        for t, row in zip(ts, rows):
+            if last is not None and t < last:
+                continue
+            if last is not None and t == last:
+                self._write((self.head - 1) % self.capacity, t, row)
+                continue
+            self._write(self.head, t, row)
+            self.head = (self.head + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+            last = int(t)
+            added += 1
+        return added
+
+    def _ordered(self, arr: np.ndarray) -> np.ndarray:
+        if self.size < self.capacity:
+            return arr[:self.size].copy()
+        return np.concatenate((arr[self.head:], arr[:self.head]))
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        out = {'timestamp': self._ordered(self.ts)}
+        for name in self.FIELDS:
+            out[name] = self._ordered(self.cols[name])
+        return out
+
+
+def candles_to_arrays(data) -> Tuple[np.ndarray, np.ndarray]:
+    # 업비트 캔들 응답(최신순) -> 오름차순 (ts, [open, high, low, close, volume])
+    data = data[::-1]
+    ts = kst_to_epoch([c['candle_date_time_kst'] for c in data])
+    rows = np.array([(c['opening_price'], c['high_price'], c['low_price'], c['trade_price'],
+                      c['candle_acc_trade_volume']) for c in data], dtype=np.float64)
+    order = np.argsort(ts, kind='stable')
+    return ts[order], rows[order]
+
+
+class CandleStore:
+    """(market, timeframe) 별 롤링 캔들 저장소.
+
+    처음엔 capacity 만큼 받고, 이후에는 마지막 봉 이후 경과한 봉 수만큼만 받아 병합한다.
+    같은 (market, timeframe) 은 refresh_sec(기본 60초) 보다 자주 다시 받지 않는다.
+    봉 길이와 상관없는 절대 간격이라 만들어지는 중인 1d/4h 봉도 트렌드 주기마다 최신값을 반영한다.
+    """
+
+    def __init__(self, fetcher, capacity: int = 150, refresh_sec: float = None, archive=None):
+        self.fetcher = fetcher
+        self.archive = archive  # CandleArchive. 있으면 빈 링을 로컬 봉으로 먼저 채운다
+        self.capacity = capacity
+        self.refresh_sec = float(refresh_sec if refresh_sec is not None
+                                 else os.getenv("candle_refresh_sec", "60"))
+        self.rings: Dict[Tuple[str, str], CandleRing] = {}
+        self.fetched_at: Dict[Tuple[str, str], float] = {}
+        self.requests_made = 0
+        self.bars_fetched = 0
+
+    def ring(self, market: str, candle_unit: str) -> CandleRing:
+        key = (market, candle_unit)
+        if key not in self.rings:
+            ring = CandleRing(self.capacity)
+            if self.archive is not None and self.archive.exists(market, candle_unit):
+                cols = self.archive.series(market, candle_unit).tail(self.capacity)
+                ring.merge(cols['timestamp'], np.column_stack([cols[name] for name in CandleRing.FIELDS]))
+            self.rings[key] = ring
+        return self.rings[key]
+
+    def fetch_count(self, market: str, candle_unit: str, now: float = None, force: bool = False) -> int:
+        # 0 이면 이번 주기에는 받을 필요 없음
+        key = (market, candle_unit)
+        ring = self.ring(market, candle_unit)
+        if ring.last_ts is None:
+            return min(self.capacity, UPBIT_MAX_COUNT)
+        now = time.time() if now is None else now
+        tf_sec = candle_seconds(candle_unit)
+        if not force and time.monotonic() - self.fetched_at.get(key, 0.0) < self.refresh_sec:
+            return 0
+        elapsed_bars = int((now + KST_OFFSET - ring.last_ts) // tf_sec) + 1
+        if elapsed_bars > self.capacity:
+            return min(self.capacity, UPBIT_MAX_COUNT)
+        return max(1, min(elapsed_bars, UPBIT_MAX_COUNT))
+
+    async def refresh_many(self, pairs: Iterable[Tuple[str, str]],
+                           force: bool = False) -> Dict[Tuple[str, str], object]:
+        # 실패한 항목은 예외 객체, 나머지는 갱신된 CandleRing 을 값으로 돌려준다.
+        # force 이면 최근에 받았더라도 다시 받는다 (봉 마감 직후 확정값이 필요할 때)
+        pairs = list(pairs)
+        jobs = []
+        for market, unit in pairs:
+            count = self.fetch_count(market, unit, force=force)
+            if count:
+                jobs.append((market, unit, count))
+        fetched = await self.fetcher.fetch_many(jobs)
+        self.requests_made += len(jobs)
+        result = {}
+        for market, unit in pairs:
+            key = (market, unit)
+            data = fetched.get(key)
+            if isinstance(data, Exception):
+                result[key] = data
+                continue
+            if data is not None:
+                ts, rows = candles_to_arrays(data)
+                self.ring(market, unit).merge(ts, rows)
+                self.fetched_at[key] = time.monotonic()
+                self.bars_fetched += len(ts)
+            result[key] = self.ring(market, unit)
+        return result
+
+    async def refresh(self, market: str, candle_unit: str) -> CandleRing:
+        res = (await self.refresh_many([(market, candle_unit)]))[(market, candle_unit)]
+        if isinstance(res, Exception):
+            raise res
+        return res
@@ -2,6 +2,8 @@ import pandas as pd
 import numpy as np
 import requests
 
+from aiTrader.upbitconf import api_url
+
 def weighted_moving_average(series, window):
     weights = np.arange(1, window + 1)
     return series.rolling(window).apply(lambda prices: np.dot(prices, weights) / weights.sum(), raw=True)
@@ -31,7 +33,7 @@ def get_signal(df):
 
 
 def get_upbit_candles(market="KRW-DOGE", minutes=1, count=200):
-    url = f"https://api.upbit.com/v1/candles/minutes/{minutes}"
+    url = api_url(f"/v1/candles/minutes/{minutes}")
     params = {"market": market, "count": count}
     headers = {"Accept": "application/json"}
     response = requests.get(url, params=params, headers=headers)
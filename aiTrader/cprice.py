@@ -1,10 +1,14 @@
+import logging
 import requests
 from datetime import datetime, timezone
 
+from aiTrader.upbitconf import api_url
+
+logger = logging.getLogger(__name__)
+
 def all_cprice():
-    server_url = "https://api.upbit.com"
     params = {"quote_currencies": "KRW"}
-    res = requests.get(server_url + "/v1/ticker/all", params=params)
+    res = requests.get(api_url("/v1/ticker/all"), params=params)
     data = res.json()
     result = []
     for item in data:
@@ -18,7 +22,7 @@ def all_cprice():
 
 
 def get_upbit_orderbooks(market="KRW-BTC"):
-    url = "https://api.upbit.com/v1/orderbook"
+    url = api_url("/v1/orderbook")
     params = {"markets": market}
     try:
         response = requests.get(url, params=params)
@@ -26,12 +30,12 @@ def get_upbit_orderbooks(market="KRW-BTC"):
         data = response.json()
         return data
     except requests.exceptions.RequestException as e:
-        print("Error:", e)
+        logger.warning("호가 조회 오류: %s", e)
         return None
 
 
 def get_krw_tickers():
-    url = "https://api.upbit.com/v1/market/all"
+    url = api_url("/v1/market/all")
     data = requests.get(url).json()
     krw_tickers = [item['market'] for item in data if item['market'].startswith('KRW-')]
     return krw_tickers
@@ -0,0 +1,54 @@
+import logging
+import os
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+# 비동기 DB 엔진 설정. 모두 env 로 조정한다.
+#   db_pool_size(10) db_max_overflow(20) db_pool_timeout(30초) db_pool_recycle(1800초) db_pool_pre_ping(Y)
+#   db_statement_timeout_ms(0=끔, MySQL/MariaDB SELECT 실행 시간 제한) db_echo(N) db_query_cache_size(1000)
+# db_echo=Y 는 create_engine(echo=True) 대신 sqlalchemy.engine 로거를 INFO 로 올려 로그 파이프라인(logpipe)으로 보낸다.
+# 고정 쿼리는 모듈 상수 text() 로 두어 SQLAlchemy 컴파일 캐시를 재사용한다 (aiTrader/queries.py 등).
+
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).upper() in ("Y", "YES", "TRUE", "1")
+
+
+def _set_statement_timeout(engine: AsyncEngine, timeout_ms: int):
+    if engine.dialect.name == "mariadb":
+        statement = f"SET SESSION max_statement_time = {timeout_ms / 1000:.3f}"
+    else:
+        statement = f"SET SESSION max_execution_time = {timeout_ms}"
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(statement)
+        cursor.close()
+
+
+def make_engine(url: str = None, **overrides) -> AsyncEngine:
+    url = url or os.getenv("dburl")
+    options = {
+        "pool_pre_ping": _env_bool("db_pool_pre_ping", "Y"),
+        "pool_recycle": int(os.getenv("db_pool_recycle", "1800")),
+        "query_cache_size": int(os.getenv("db_query_cache_size", "1000")),
+    }
+    if not url.startswith("sqlite"):
+        # SQLite 는 풀 크기 설정을 받지 않는다 (부하 테스트 대용 DB)
+        options.update(pool_size=int(os.getenv("db_pool_size", "10")),
+                       max_overflow=int(os.getenv("db_max_overflow", "20")),
+                       pool_timeout=float(os.getenv("db_pool_timeout", "30")))
+    options.update(overrides)
+    if _env_bool("db_echo", "N"):
+        logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
+    engine = create_async_engine(url, **options)
+    timeout_ms = int(os.getenv("db_statement_timeout_ms", "0"))
+    if timeout_ms > 0 and engine.dialect.name in ("mysql", "mariadb"):
+        _set_statement_timeout(engine, timeout_ms)
+    return engine
+
+
+def make_sessionmaker(engine: AsyncEngine) -> async_sessionmaker:
+    return async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
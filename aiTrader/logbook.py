@@ -0,0 +1,111 @@
+import json
+import os
+from datetime import datetime
+from decimal import Decimal
+from functools import lru_cache
+from typing import AsyncIterator, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# 거래 로그(trWallet 원장) 조회.
+# (regDate, 키 컬럼) 키셋 페이지네이션: 다음 페이지는 마지막 행 뒤부터 LIMIT 만큼만 읽으므로
+# 이력이 길어져도 페이지 하나의 비용이 일정하다. 인덱스 ix_trWallet_logbook (userNo, linkNo, currency, regDate, 키 컬럼).
+# 전체가 필요하면 stream_rows 로 NDJSON 한 줄씩 흘려보낸다 (서버 측 커서, 메모리 일정).
+# 키 컬럼은 같은 regDate 의 행을 가르는 trWallet 의 유일한 증가 컬럼(AUTO_INCREMENT 기본키).
+# 앱의 다른 쿼리는 이 컬럼 이름을 쓰지 않으므로 tools/schema.sql 의 walletNo 를 기본으로 두고
+# 운영 DB 의 이름이 다르면 env logbook_key_column 으로 바꾼다.
+
+PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+INDEX_NAME = "ix_trWallet_logbook"
+
+LOGBOOK_WHERE = "userNo = :uno and currency = :coinn and linkNo = :seckey"
+
+SELECT_LOGBOOK_INDEX = text(
+    "SELECT COUNT(*) FROM information_schema.statistics "
+    "WHERE table_schema = DATABASE() and table_name = 'trWallet' and index_name = :name")
+
+
+def key_column() -> str:
+    name = os.getenv("logbook_key_column", "walletNo")
+    if not name.isidentifier():
+        raise RuntimeError(f"logbook_key_column 이 컬럼 이름이 아닙니다: {name!r}")
+    return name
+
+
+@lru_cache(maxsize=None)
+def _queries(key: str) -> dict:
+    # dotenv 를 읽은 뒤 처음 쓸 때 키 컬럼 이름으로 만든다
+    columns = f"{key}, changeType, currency, unitPrice, inAmt, outAmt, remainAmt, regDate"
+    return {
+        "first": text(f"SELECT {columns} FROM trWallet WHERE {LOGBOOK_WHERE} "
+                      f"ORDER BY regDate, {key} LIMIT :lim"),
+        "after": text(f"SELECT {columns} FROM trWallet WHERE {LOGBOOK_WHERE} "
+                      f"and (regDate > :cdate or (regDate = :cdate and {key} > :cno)) "
+                      f"ORDER BY regDate, {key} LIMIT :lim"),
+        "all": text(f"SELECT {columns} FROM trWallet WHERE {LOGBOOK_WHERE} ORDER BY regDate, {key}"),
+        "create_index": text(f"CREATE INDEX {INDEX_NAME} ON trWallet (userNo, linkNo, currency, regDate, {key})"),
+    }
+
+
+def query(name: str):
+    return _queries(key_column())[name]
+
+
+def encode_cursor(row) -> str:
+    # 마지막 행의 (regDate, 키) -> '2025-01-01T09:00:00_1234'
+    # datetime 으로 받은 값은 isoformat('T' 구분), 문자열로 받은 값(SQLite)은 저장된 그대로 담는다.
+    # 다음 페이지에서 같은 형태로 바인딩해야 regDate = :cdate 비교가 맞는다
+    reg = row.regDate.isoformat() if isinstance(row.regDate, datetime) else str(row.regDate)
+    return f"{reg}_{row._mapping[key_column()]}"
+
+
+def decode_cursor(cursor: str) -> Tuple[object, int]:
+    reg, _, no = cursor.rpartition("_")
+    parsed = datetime.fromisoformat(reg)  # 형식 검사 (잘못되면 ValueError)
+    return (parsed if "T" in reg else reg), int(no)
+
+
+def logbook_row(row) -> dict:
+    # DECIMAL 컬럼은 float, DATETIME 은 isoformat 으로 바꿔 json 으로 바로 내보낼 수 있게 한다
+    data = dict(row._mapping)
+    for name, value in data.items():
+        if isinstance(value, Decimal):
+            data[name] = float(value)
+        elif isinstance(value, datetime):
+            data[name] = value.isoformat()
+    return data
+
+
+async def fetch_page(db: AsyncSession, uno, seckey, coinn: str, limit: int = PAGE_SIZE,
+                     cursor: str = None) -> Tuple[List[dict], Optional[str]]:
+    """한 페이지와 다음 커서. 더 읽을 행이 없으면 커서는 None. 잘못된 커서는 ValueError."""
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    params = {"uno": uno, "coinn": coinn, "seckey": seckey, "lim": limit + 1}
+    if cursor:
+        params["cdate"], params["cno"] = decode_cursor(cursor)
+        result = await db.execute(query("after"), params)
+    else:
+        result = await db.execute(query("first"), params)
+    rows = result.fetchall()
+    # 한 행 더 읽어 다음 페이지 존재 여부를 판단한다 (빈 마지막 요청을 없앤다)
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return [logbook_row(r) for r in rows[:limit]], next_cursor
+
+
+async def stream_rows(session_factory, uno, seckey, coinn: str, chunk: int = 500) -> AsyncIterator[bytes]:
+    """NDJSON 줄 단위로 원장 전체를 흘려보낸다. 세션은 스트림이 끝날 때까지 여기서 연다."""
+    async with session_factory() as db:
+        result = await db.stream(query("all").execution_options(yield_per=chunk),
+                                 {"uno": uno, "coinn": coinn, "seckey": seckey})
+        async for rows in result.partitions(chunk):
+            yield "".join(json.dumps(logbook_row(r), ensure_ascii=False) + "\n" for r in rows).encode()
+
+
+async def ensure_logbook_index(db: AsyncSession) -> bool:
+    # MySQL 은 CREATE INDEX IF NOT EXISTS 가 없으므로 information_schema 로 확인한다. 만들었으면 True
+    if (await db.execute(SELECT_LOGBOOK_INDEX, {"name": INDEX_NAME})).scalar():
+        return False
+    await db.execute(query("create_index"))
+    return True
@@ -0,0 +1,151 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+# 비동기 로그 파이프라인. 이벤트 루프에서는 레코드를 큐에 넣기만 하고 직렬화/출력은 백그라운드 스레드가 한다.
+#   log_level(INFO)   루트 레벨. 요청마다 찍던 디버그 덤프(mysets, mylogs, myavgp ...)는 DEBUG 라 기본으로 꺼져 있다
+#   log_levels        로거별 레벨 'aiTrader.vwmatrend=DEBUG,sqlalchemy.engine=INFO'
+#   log_format(json)  json 한 줄 레코드 / text
+#   log_sample_per_sec(20)  같은 위치(로거+메시지 템플릿)의 레코드를 초당 이 개수까지만 통과, 나머지는 건너뛴 수만 센다
+#   log_queue_size(10000)   큐가 차면 레코드를 버리고 수를 센다 (이벤트 루프를 막지 않음)
+
+STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in STANDARD_ATTRS and not key.startswith("_"):
+                data[key] = value
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extra = {k: v for k, v in vars(record).items() if k not in STANDARD_ATTRS and not k.startswith("_")}
+        return f"{line} {extra}" if extra else line
+
+
+class SamplingFilter(logging.Filter):
+    """(로거, 메시지 템플릿) 별로 1초에 limit 개까지만 통과시킨다. 건너뛴 수는 다음에 통과하는 레코드의 suppressed 에 붙인다."""
+
+    def __init__(self, limit: int):
+        super().__init__()
+        self.limit = limit
+        self.windows = {}  # key -> [창 시작(초), 통과 수, 건너뛴 수]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.limit <= 0:
+            return True
+        key = (record.name, record.msg if isinstance(record.msg, str) else type(record.msg))
+        now = int(time.monotonic())
+        window = self.windows.get(key)
+        if window is None or window[0] != now:
+            suppressed = window[2] if window is not None else 0
+            if window is None and len(self.windows) > 10000:
+                self.windows.clear()
+            window = self.windows[key] = [now, 0, 0]
+            if suppressed:
+                record.suppressed = suppressed
+        if window[1] >= self.limit:
+            window[2] += 1
+            return False
+        window[1] += 1
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """큐가 차면 기다리지 않고 버린다. 메시지 포매팅은 하되 직렬화는 리스너 스레드로 미룬다."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 인자(args)는 다른 스레드에서 바뀔 수 있으므로 메시지만 여기서 확정하고, 예외는 문자열로 바꿔 넘긴다
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _parse_levels(spec: str) -> dict:
+    levels = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+_listener = None
+
+
+def setup_logging(level: str = None, fmt: str = None, sample_per_sec: int = None,
+                  queue_size: int = None, stream=None) -> QueueListener:
+    """루트 로거에 큐 핸들러를 달고 출력 스레드를 시작한다. 두 번째 호출부터는 기존 리스너를 돌려준다."""
+    global _listener
+    if _listener is not None:
+        return _listener
+    level = (level or os.getenv("log_level", "INFO")).upper()
+    fmt = fmt or os.getenv("log_format", "json")
+    sample_per_sec = int(sample_per_sec if sample_per_sec is not None else os.getenv("log_sample_per_sec", "20"))
+    queue_size = int(queue_size if queue_size is not None else os.getenv("log_queue_size", "10000"))
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    log_queue = queue.Queue(queue_size)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(sample_per_sec))
+
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+    for name, lvl in _parse_levels(os.getenv("log_levels", "")).items():
+        logging.getLogger(name).setLevel(lvl)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    # 큐에 남은 레코드를 모두 쓰고 스레드를 끝낸다
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped_records() -> int:
+    handlers = [h for h in logging.getLogger().handlers if isinstance(h, NonBlockingQueueHandler)]
+    return sum(h.dropped for h in handlers)
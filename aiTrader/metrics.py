@@ -0,0 +1,269 @@
+import logging
+import re
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, Tuple
+
+import aiohttp
+from sqlalchemy import event
+
+# 프로세스 내 Prometheus 지표. 외부 패키지 없이 text format(0.0.4) 으로 /metrics 에 내보낸다.
+# 카운터/게이지/히스토그램은 이벤트 루프 스레드에서만 갱신하므로 락을 두지 않는다.
+#   http_request_duration_seconds{method,route,status}  라우트 템플릿(/balance/{uno}) 기준
+#   db_query_duration_seconds{statement}, db_query_errors_total{statement}  statement = 'SELECT trBalance' 형태
+#   upbit_request_duration_seconds{path,status}  aiohttp TraceConfig 로 재는 업비트 REST 호출
+#   ws_subscribers{channel}, trend_refresh_seconds{timeframe}, trend_cycle_seconds, trend_candle_errors_total{timeframe}
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CYCLE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+
+    def key(self, labels: dict) -> Tuple:
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+
+class _Sampled(Metric):
+    """값을 직접 갱신하거나, 수집 시점에 callback() -> {라벨값 튜플: 값} 을 호출해 채운다."""
+
+    def __init__(self, name, help_text, labelnames=(), callback: Callable[[], Dict[Tuple, float]] = None):
+        super().__init__(name, help_text, labelnames)
+        self.values: Dict[Tuple, float] = {}
+        self.callback = callback
+
+    def render(self) -> list:
+        values = dict(self.values)
+        if self.callback is not None:
+            try:
+                values.update(self.callback())
+            except Exception as e:
+                logger.warning("%s 수집 오류: %s", self.name, e)
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}"
+                                for k, v in values.items()]
+
+
+class Counter(_Sampled):
+    # callback 을 쓰면 다른 곳에서 세는 누적값(줄어들지 않는 값)을 그대로 내보낸다
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self.key(labels)
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+
+class Gauge(_Sampled):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        self.values[self.key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 라벨 조합마다 [구간별 개수..., +Inf 개수, 합계]
+        self.values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self.key(labels)
+        row = self.values.get(key)
+        if row is None:
+            row = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        row[bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def render(self) -> list:
+        lines = self.header()
+        for key, row in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), row[:-1]):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(row[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+http_duration = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "HTTP 요청 처리 시간 (라우트 템플릿별)", ("method", "route", "status")))
+db_duration = REGISTRY.register(Histogram(
+    "db_query_duration_seconds", "DB 쿼리 실행 시간", ("statement",)))
+db_errors = REGISTRY.register(Counter(
+    "db_query_errors_total", "DB 쿼리 오류 수", ("statement",)))
+upbit_duration = REGISTRY.register(Histogram(
+    "upbit_request_duration_seconds", "업비트 REST 호출 시간과 응답 코드", ("path", "status")))
+trend_refresh = REGISTRY.register(Histogram(
+    "trend_refresh_seconds", "트렌드 갱신의 타임프레임별 계산 시간 (전 코인 일괄)", ("timeframe",), CYCLE_BUCKETS))
+trend_cycle = REGISTRY.register(Histogram(
+    "trend_cycle_seconds", "트렌드 갱신 한 주기 전체 시간 (캔들 갱신 포함)", (), CYCLE_BUCKETS))
+trend_candle_errors = REGISTRY.register(Counter(
+    "trend_candle_errors_total", "트렌드 갱신 중 캔들을 받지 못한 코인 수", ("timeframe",)))
+# 값은 main.py 가 callback 으로 허브/브로드캐스터 구독자 수를 넘겨 수집 시점에 읽는다
+ws_subscribers = REGISTRY.register(Gauge(
+    "ws_subscribers", "웹소켓 구독자 수", ("channel",)))
+
+
+class MetricsMiddleware:
+    """요청 처리 시간을 라우트 템플릿 단위로 기록하는 ASGI 미들웨어 (경로 파라미터별로 시계열이 늘지 않게)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            if route is not None:
+                path = route.path
+            elif scope["path"].startswith("/static/"):
+                path = "/static"
+            else:
+                path = "unmatched"
+            http_duration.observe(time.perf_counter() - started, method=scope["method"], route=path,
+                                  status=status[0])
+
+
+SQL_VERB = re.compile(r"^\s*(\w+)")
+SQL_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|JOIN)\s+`?(\w+)", re.I)
+_statement_labels: Dict[str, str] = {}
+
+
+def statement_label(statement: str) -> str:
+    # 'SELECT trBalance' 처럼 동사 + 첫 테이블. 쿼리는 대부분 모듈 상수라 결과를 캐시한다
+    label = _statement_labels.get(statement)
+    if label is None:
+        verb = SQL_VERB.match(statement)
+        table = SQL_TABLE.search(statement)
+        label = " ".join(p for p in ((verb.group(1).upper() if verb else "?"), table.group(1) if table else "") if p)
+        if len(_statement_labels) < 1000:
+            _statement_labels[statement] = label
+    return label
+
+
+def instrument_engine(engine):
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        db_duration.observe(time.perf_counter() - started, statement=statement_label(statement))
+
+    @event.listens_for(sync_engine, "handle_error")
+    def on_error(context):
+        stack = context.connection.info.get("query_started") if context.connection is not None else None
+        if stack:
+            stack.pop()
+        db_errors.inc(statement=statement_label(context.statement or ""))
+
+
+def _upbit_path(url) -> str:
+    # /v1/candles/minutes/3 는 그대로 둔다 (단위 수가 정해져 있음). 쿼리스트링은 버린다
+    return url.path
+
+
+async def _on_request_start(session, ctx, params):
+    ctx.started = time.perf_counter()
+
+
+async def _on_request_end(session, ctx, params):
+    upbit_duration.observe(time.perf_counter() - ctx.started, path=_upbit_path(params.url),
+                           status=params.response.status)
+
+
+async def _on_request_exception(session, ctx, params):
+    upbit_duration.observe(time.perf_counter() - ctx.started, path=_upbit_path(params.url),
+                           status=type(params.exception).__name__)
+
+
+def upbit_trace_config() -> aiohttp.TraceConfig:
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(_on_request_start)
+    trace.on_request_end.append(_on_request_end)
+    trace.on_request_exception.append(_on_request_exception)
+    return trace
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,65 @@
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from aiTrader.walletstore import LOCK_BALANCES, UPSERT_ORDER_BALANCES, add_order_avg_cost
+
+FEE_RATE = 0.0005  # 매수/매도 수수료 0.05%
+
+# 주문 한 건 = 트랜잭션 한 번.
+# trBalance 의 KRW/코인 잔고 행을 FOR UPDATE 로 잠그고, 원장의 열린 행 마감(UPDATE 1회)과 새 원장 행 2개(INSERT 1회),
+# trBalance 갱신(upsert 1회), trAvgCost 누적을 한 번에 커밋한다.
+# 같은 사용자의 동시 주문은 KRW 행 잠금에서 직렬화된다. 시세 조회는 하지 않는다 (가격은 주문 요청에 포함).
+# max_amt 를 주면 매수 후 코인 평가액(잠근 잔고 기준)이 그 한도를 넘는 주문은 넣지 않는다.
+
+# 이전 주문이 남긴 열린 행(KRW, 코인 각 1개)만 마감한다. 이미 마감된 과거 행은 다시 쓰지 않는다
+CLOSE_BALANCES = text(
+    "UPDATE trWallet set attrib = :xxxup "
+    "WHERE userNo = :uno and currency in ('KRW', :coinn) and attrib not like :attxx")
+INSERT_BALANCES = text(
+    "INSERT INTO trWallet (userNo,changeType,currency,unitPrice,inAmt,outAmt,remainAmt,linkNo) values "
+    "(:uno, :ctype, 'KRW', 1, :krwin, :krwout, :remkrw, :seckey), "
+    "(:uno, :ctype, :coinn, :uprice, :coinin, :coinout, :remcoin, :seckey)")
+
+
+def order_amounts(side: str, price: float, volum: float):
+    # (KRW 변동액, 수수료 반영 금액) 매수는 수수료를 더해 나가고 매도는 수수료를 빼고 들어온다
+    costkrw = volum * price
+    costfee = costkrw * FEE_RATE
+    if side == "BUY":
+        return costkrw + costfee
+    return costkrw - costfee
+
+
+async def execute_order(db: AsyncSession, uno, seckey, coinn: str, side: str, price: float, volum: float,
+                        max_amt: Optional[float] = None) -> bool:
+    totalcost = order_amounts(side, price, volum)
+    try:
+        result = await db.execute(LOCK_BALANCES, {"uno": uno, "seckey": seckey, "coinn": coinn})
+        balances = {row.currency: float(row.remainAmt or 0) for row in result.fetchall()}
+        walletkrw = balances.get("KRW", 0.0)
+        walletvolum = balances.get(coinn, 0.0)
+        if side == "BUY":
+            if walletkrw < totalcost or (max_amt is not None and (walletvolum + volum) * price > max_amt):
+                await db.rollback()
+                return False
+            params = {"krwin": None, "krwout": totalcost, "remkrw": walletkrw - totalcost,
+                      "coinin": volum, "coinout": None, "remcoin": walletvolum + volum}
+        else:
+            if walletvolum < volum:
+                await db.rollback()
+                return False
+            params = {"krwin": totalcost, "krwout": None, "remkrw": walletkrw + totalcost,
+                      "coinin": None, "coinout": volum, "remcoin": walletvolum - volum}
+        await db.execute(CLOSE_BALANCES, {"xxxup": "XXXUPXXXUP", "uno": uno, "coinn": coinn, "attxx": "%XXX%"})
+        await db.execute(INSERT_BALANCES, {"uno": uno, "ctype": f"{side}-{coinn}", "coinn": coinn, "uprice": price,
+                                           "seckey": seckey, **params})
+        await db.execute(UPSERT_ORDER_BALANCES, {"uno": uno, "seckey": seckey, "coinn": coinn,
+                                                 "remkrw": params["remkrw"], "remcoin": params["remcoin"]})
+        await add_order_avg_cost(db, uno, seckey, coinn, side, price, volum, params["remcoin"])
+        await db.commit()
+        return True
+    except Exception:
+        await db.rollback()
+        raise
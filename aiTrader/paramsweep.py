@@ -0,0 +1,164 @@
+import argparse
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Sequence, Tuple
+
+import pandas as pd
+
+from aiTrader.backtest import (STAKE_KRW, PriceSums, cross_state, cross_state_signals, load_market, peak_signals,
+                               simulate)
+
+
+# VWMA 전략 파라미터 (short, long, threshold, close_threshold, tf) 탐색.
+# 작업 단위는 (market, tf) 하나의 조합 묶음: 캔들을 읽고 누적합(PriceSums)을 만든 뒤 묶음 안의 조합을 평가한다.
+# 마켓이 적어도 워커가 놀지 않도록 (market, tf) 마다 조합을 (short, long) 순으로 정렬해 여러 묶음으로 나눈다.
+# 묶음 안에서는 VWMA 를 창 길이별로, 크로스 구조를 (short, long) 별로 한 번만 계산해 threshold 조합끼리 공유한다.
+# python -m aiTrader.paramsweep --data DIR --markets KRW-BTC KRW-ETH --tf 1m 3m --short 1:5 --long 20:60:5 \
+#     --threshold 0.01,0.02,0.03 --close-threshold 0.0005,0.001 [--samples 500] --out sweep.csv
+
+PARAM_KEYS = ("tf", "short_window", "long_window", "threshold", "close_threshold")
+CHUNKS_PER_WORKER = 4  # 워커당 묶음 수 (묶음마다 걸리는 시간이 달라도 고르게 나뉘도록)
+MIN_CHUNK = 16  # 이보다 작게 나누면 캔들 읽기/누적합 비용이 평가보다 커진다
+
+
+def parse_values(spec: str, cast=float) -> List:
+    # "1,3,5" 또는 "start:stop[:step]" (stop 포함)
+    if ":" in spec:
+        parts = [cast(x) for x in spec.split(":")]
+        start, stop = parts[0], parts[1]
+        step = parts[2] if len(parts) > 2 else cast(1)
+        values = []
+        v = start
+        while v <= stop + (step * 1e-9 if cast is float else 0):
+            values.append(round(v, 10) if cast is float else v)
+            v += step
+        return values
+    return [cast(x) for x in spec.split(",") if x]
+
+
+def build_params(tfs, shorts, longs, thresholds, close_thresholds, samples: int = None, seed: int = 0,
+                 strategy: str = "cross") -> List[Tuple]:
+    if strategy == "peak":
+        # peak 전략은 단기 VWMA 만 쓴다
+        longs, thresholds, close_thresholds = [0], [0.0], [0.0]
+    grid = [p for p in itertools.product(tfs, shorts, longs, thresholds, close_thresholds)
+            if strategy == "peak" or p[1] < p[2]]
+    if samples and samples < len(grid):
+        grid = random.Random(seed).sample(grid, samples)
+    return grid
+
+
+def evaluate_market(data_dir: str, market: str, tf: str, params: Sequence[Tuple], strategy: str = "cross",
+                    count: int = 200, stake: float = STAKE_KRW) -> List[dict]:
+    bars = load_market(data_dir, market, tf)
+    sums = PriceSums(bars.close, bars.volume)
+    vwma_cache: Dict[int, object] = {}
+    state_cache = {}
+
+    def vwma(window):
+        if window not in vwma_cache:
+            vwma_cache[window] = sums.vwma(window)
+        return vwma_cache[window]
+
+    rows = []
+    for p in sorted(params, key=lambda p: (p[1], p[2])):
+        _, short_window, long_window, threshold, close_threshold = p
+        if strategy == "peak":
+            buy, sell = peak_signals(bars.close, vwma(short_window))
+        else:
+            key = (short_window, long_window)
+            if key not in state_cache:
+                # (short, long) 순으로 정렬해 두었으므로 이전 조합의 상태는 더 쓰지 않는다
+                state_cache.clear()
+                state_cache[key] = cross_state(bars.close, vwma(short_window), vwma(long_window), count)
+            buy, sell = cross_state_signals(state_cache[key], threshold, close_threshold)
+        r = simulate(market, tf, bars, buy, sell, stake)
+        rows.append(dict(zip(PARAM_KEYS, p), market=market, trades=len(r.trades), pnl=r.pnl,
+                         pnl_pct=r.pnl_pct, max_drawdown=r.max_drawdown))
+    return rows
+
+
+def split_params(params: Sequence[Tuple], chunks: int) -> List[List[Tuple]]:
+    # (short, long) 순으로 이어지게 나눠 같은 크로스 구조를 쓰는 조합이 대부분 한 묶음에 들어가게 한다
+    ordered = sorted(params, key=lambda p: (p[1], p[2]))
+    size = max(MIN_CHUNK, -(-len(ordered) // max(1, chunks)))
+    return [ordered[i:i + size] for i in range(0, len(ordered), size)]
+
+
+def rank_results(rows: List[dict], rank_by: str = "pnl_pct") -> pd.DataFrame:
+    # 조합별로 마켓 결과를 모아 순위를 매긴다 (pnl_pct 는 마켓 평균, max_drawdown 은 가장 나쁜 마켓)
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return df
+    table = df.groupby(list(PARAM_KEYS), as_index=False).agg(
+        markets=("market", "count"), trades=("trades", "sum"), pnl=("pnl", "sum"), pnl_pct=("pnl_pct", "mean"),
+        max_drawdown=("max_drawdown", "min"), win_markets=("pnl", lambda x: int((x > 0).sum())))
+    table["pnl_pct"] *= 100
+    table["max_drawdown"] *= 100
+    table = table.rename(columns={"pnl_pct": "pnl_pct_mean", "max_drawdown": "max_drawdown_pct"})
+    col = {"pnl_pct": "pnl_pct_mean", "max_drawdown": "max_drawdown_pct"}.get(rank_by, rank_by)
+    table = table.sort_values(col, ascending=False, kind="stable").reset_index(drop=True)
+    table.insert(0, "rank", range(1, len(table) + 1))
+    return table
+
+
+def run_sweep(data_dir: str, markets: Sequence[str], params: Sequence[Tuple], strategy: str = "cross",
+              workers: int = None, count: int = 200, stake: float = STAKE_KRW, rank_by: str = "pnl_pct"):
+    by_tf: Dict[str, List[Tuple]] = {}
+    for p in params:
+        by_tf.setdefault(p[0], []).append(p)
+    pairs = [(market, tf) for tf in by_tf for market in markets]
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    chunks = -(-workers * CHUNKS_PER_WORKER // max(1, len(pairs)))
+    jobs = [(market, tf, chunk) for market, tf in pairs for chunk in split_params(by_tf[tf], chunks)]
+    rows, skipped = [], set()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(evaluate_market, data_dir, market, tf, chunk, strategy, count, stake):
+                   (market, tf) for market, tf, chunk in jobs}
+        for future in as_completed(futures):
+            market, tf = futures[future]
+            try:
+                rows.extend(future.result())
+            except FileNotFoundError as e:
+                if (market, tf) not in skipped:
+                    skipped.add((market, tf))
+                    print(f"건너뜀 {market} {tf}: {e}")
+    return rank_results(rows, rank_by)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VWMA 전략 파라미터 탐색")
+    parser.add_argument("--data", required=True, help="캔들 파일 디렉터리")
+    parser.add_argument("--markets", nargs="+", required=True)
+    parser.add_argument("--tf", nargs="+", default=["3m"])
+    parser.add_argument("--strategy", choices=["cross", "peak"], default="cross")
+    parser.add_argument("--short", default="1:5")
+    parser.add_argument("--long", default="20:60:5")
+    parser.add_argument("--threshold", default="0.01,0.02,0.03")
+    parser.add_argument("--close-threshold", default="0.0005,0.001")
+    parser.add_argument("--samples", type=int, help="전체 격자 대신 무작위로 뽑을 조합 수")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--stake", type=float, default=STAKE_KRW)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--rank-by", default="pnl_pct", choices=["pnl_pct", "pnl", "max_drawdown", "win_markets"])
+    parser.add_argument("--out", default="sweep.csv")
+    args = parser.parse_args()
+
+    params = build_params(args.tf, parse_values(args.short, int), parse_values(args.long, int),
+                          parse_values(args.threshold), parse_values(args.close_threshold),
+                          args.samples, args.seed, args.strategy)
+    started = time.perf_counter()
+    table = run_sweep(args.data, args.markets, params, args.strategy, args.workers, args.count, args.stake,
+                      args.rank_by)
+    table.to_csv(args.out, index=False)
+    print(f"{len(params)} 조합 x {len(args.markets)} 마켓, {time.perf_counter() - started:.1f}s -> {args.out}")
+    if not table.empty:
+        print(table.head(10).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@ import numpy as np
 import time
 from scipy.signal import find_peaks
 
+from aiTrader.upbitconf import api_url
+
 def peak_trade_core(
         ticker='KRW-BTC',
         short_window=3,
@@ -31,9 +33,9 @@ def peak_trade_core(
 
     api_type, minute = candle_map[candle_unit]
     if api_type == 'days':
-        url = f'https://api.upbit.com/v1/candles/days?market={ticker}&count={count}'
+        url = api_url(f'/v1/candles/days?market={ticker}&count={count}')
     else:
-        url = f'https://api.upbit.com/v1/candles/minutes/{minute}?market={ticker}&count={count}'
+        url = api_url(f'/v1/candles/minutes/{minute}?market={ticker}&count={count}')
 
     response = requests.get(url)
     data = response.json()
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Tuple
+
+import aiohttp
+
+from aiTrader.metrics import upbit_trace_config
+from aiTrader.upbitconf import api_url
+
+TICKER_ALL_PATH = "/v1/ticker/all"
+
+logger = logging.getLogger(__name__)
+
+
+class TickerCache:
+    """프로세스 공용 현재가 스냅샷 저장소.
+
+    백그라운드 태스크 하나가 /v1/ticker/all 을 주기적으로 받아 메모리 dict 를 통째로 교체하고,
+    읽는 쪽은 네트워크 없이 snapshot() 으로 가격과 stale 여부를 함께 받는다.
+    """
+
+    def __init__(self, refresh_sec: float = None, stale_sec: float = None):
+        self.refresh_sec = float(refresh_sec if refresh_sec is not None else os.getenv("price_refresh_sec", "2"))
+        self.stale_sec = float(stale_sec if stale_sec is not None else os.getenv("price_stale_sec", "15"))
+        self.prices: Dict[str, float] = {}
+        self.updated_at = 0.0  # time.monotonic() 기준, 0 이면 아직 한 번도 받지 못함
+        self._ready = asyncio.Event()
+        self._task = None
+
+    async def refresh(self, session: aiohttp.ClientSession):
+        params = {"quote_currencies": "KRW"}
+        async with session.get(api_url(TICKER_ALL_PATH), params=params) as resp:
+            resp.raise_for_status()
+            data = await resp.json()
+        prices = {}
+        for item in data:
+            market = item.get("market")
+            trade_price = item.get("trade_price")
+            if market and trade_price:
+                prices[market] = trade_price
+        # dict 를 새로 만들어 교체하므로 읽는 쪽은 락 없이 항상 완성된 스냅샷을 본다
+        self.prices = prices
+        self.updated_at = time.monotonic()
+        self._ready.set()
+
+    async def run(self):
+        timeout = aiohttp.ClientTimeout(total=max(self.refresh_sec * 2, 5))
+        async with aiohttp.ClientSession(timeout=timeout, trace_configs=[upbit_trace_config()]) as session:
+            while True:
+                try:
+                    await self.refresh(session)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning("시세 스냅샷 갱신 오류: %s", e)
+                await asyncio.sleep(self.refresh_sec)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def wait_ready(self, timeout: float = 3.0) -> bool:
+        # 기동 직후 첫 스냅샷이 올 때까지만 잠깐 기다린다
+        if self._ready.is_set():
+            return True
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def age(self) -> float:
+        if not self.updated_at:
+            return float("inf")
+        return time.monotonic() - self.updated_at
+
+    def is_stale(self) -> bool:
+        return self.age() > self.stale_sec
+
+    def snapshot(self) -> Tuple[Dict[str, float], bool]:
+        return self.prices, self.is_stale()
@@ -0,0 +1,138 @@
+import asyncio
+import os
+import time
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+
+class PriceHistory:
+    """여러 마켓의 최근 가격 이력. (마켓 x capacity) float64 배열 하나를 열 단위 링버퍼로 쓴다.
+
+    샘플 한 번 = 열 하나. advance() 가 새 열을 열면서 직전 가격을 이어 받고,
+    그 뒤 틱은 update() 로 해당 칸에 한 번 쓰기만 한다. 없는 값은 NaN.
+    """
+
+    def __init__(self, capacity: int = None, markets=()):
+        self.capacity = int(capacity if capacity is not None else os.getenv("price_history_size", "360"))
+        self.index: Dict[str, int] = {}
+        self.markets: List[str] = []
+        self.data = np.full((max(len(markets), 16), self.capacity), np.nan)
+        self.sample_ts = np.zeros(self.capacity, dtype=np.float64)  # 열마다 샘플 시각 (epoch 초)
+        self.head = 0  # 다음에 열 위치
+        self.size = 0
+        for market in markets:
+            self.row(market)
+
+    def row(self, market: str) -> int:
+        row = self.index.get(market)
+        if row is None:
+            row = len(self.markets)
+            if row == self.data.shape[0]:
+                grown = np.full((row * 2, self.capacity), np.nan)
+                grown[:row] = self.data
+                self.data = grown
+            self.index[market] = row
+            self.markets.append(market)
+        return row
+
+    @property
+    def current(self) -> int:
+        return (self.head - 1) % self.capacity
+
+    def advance(self, ts: float = None):
+        col = self.head
+        if self.size:
+            self.data[:, col] = self.data[:, self.current]
+        else:
+            self.data[:, col] = np.nan
+        self.sample_ts[col] = time.time() if ts is None else ts
+        self.head = (col + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def update(self, market: str, price: float):
+        if self.size:
+            self.data[self.row(market), self.current] = price
+
+    def record(self, prices: Dict[str, float], ts: float = None):
+        # 스냅샷 하나를 새 샘플로 기록
+        for market in prices:
+            if market not in self.index:
+                self.row(market)
+        self.advance(ts)
+        rows = np.fromiter((self.index[m] for m in prices), dtype=np.intp, count=len(prices))
+        self.data[rows, self.current] = np.fromiter(prices.values(), dtype=np.float64, count=len(prices))
+
+    def _col(self, back: int) -> int:
+        return (self.current - back) % self.capacity
+
+    def change(self, k: int) -> np.ndarray:
+        # 최근 k 샘플 동안의 변화율(%) — 마켓 순서는 self.markets
+        n = len(self.markets)
+        if k < 1 or k >= self.size:
+            return np.full(n, np.nan)
+        now = self.data[:n, self.current]
+        before = self.data[:n, self._col(k)]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return (now - before) / before * 100
+
+    def span(self, k: int) -> float:
+        if k < 1 or k >= self.size:
+            return 0.0
+        return float(self.sample_ts[self.current] - self.sample_ts[self._col(k)])
+
+    def top_movers(self, k: int, n: int = 10) -> Tuple[List[dict], List[dict]]:
+        # (상승 상위 n, 하락 상위 n)
+        change = self.change(k)
+        valid = np.flatnonzero(~np.isnan(change))
+        if not len(valid):
+            return [], []
+        values = change[valid]
+        m = min(n, len(valid))
+        up = valid[np.argpartition(-values, m - 1)[:m]] if m < len(valid) else valid
+        down = valid[np.argpartition(values, m - 1)[:m]] if m < len(valid) else valid
+        up = up[np.argsort(-change[up], kind="stable")]
+        down = down[np.argsort(change[down], kind="stable")]
+        price = self.data[:, self.current]
+
+        def rows(idx):
+            return [{"market": self.markets[i], "price": float(price[i]), "change": float(change[i])} for i in idx]
+
+        return rows(up), rows(down)
+
+    def frame(self, k: int = None) -> np.ndarray:
+        # 최근 k 샘플 (마켓 x k, 오래된 것 -> 최신)
+        k = self.size if k is None else min(k, self.size)
+        cols = (self.current - np.arange(k - 1, -1, -1)) % self.capacity
+        return self.data[:len(self.markets)][:, cols]
+
+
+class PriceSampler:
+    """snapshot 함수({market: price})를 interval 초마다 PriceHistory 에 기록한다."""
+
+    def __init__(self, history: PriceHistory, snapshot: Callable[[], Dict[str, float]], interval: float = None):
+        self.history = history
+        self.snapshot = snapshot
+        self.interval = float(interval if interval is not None else os.getenv("price_history_interval", "10"))
+        self._task = None
+
+    async def run(self):
+        while True:
+            prices = self.snapshot()
+            if prices:
+                self.history.record(prices)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
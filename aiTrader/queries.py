@@ -0,0 +1,29 @@
+from sqlalchemy import text
+
+# main.py 에서 쓰는 고정 쿼리. 요청마다 text() 를 새로 만들지 않고 모듈 상수를 재사용해
+# SQLAlchemy 컴파일 캐시가 그대로 맞도록 한다. 지갑/주문 쿼리는 walletstore, orderexec, 거래 로그는 logbook 에 있다.
+
+SELECT_TREND_COINS = text("SELECT distinct (coinName) FROM polarisSets WHERE attrib not like :attxxx")
+
+SELECT_SETUPS = text("SELECT * FROM polarisSets where userNo = :uno and attrib not like :attxx")
+
+SELECT_LOGIN = text(
+    "SELECT userNo, userName, userRole, setupKey FROM trUser WHERE userId = :username AND userPasswd = password(:password)")
+
+UPDATE_LAST_LOGIN = text("UPDATE trUser SET lastLogin = now() WHERE userId = :username")
+
+SELECT_OPEN_WALLET = text("SELECT * FROM trWallet WHERE userNo = :uno and attrib not like :attxx")
+
+CLOSE_WALLET = text("UPDATE trWallet set attrib = :attset WHERE userNo = :uno")
+
+INSERT_INIT_AMOUNT = text(
+    "INSERT INTO trWallet (userNo,changeType,currency,unitPrice,inAmt, remainAmt, linkNo) "
+    "values (:uno, 'INITAMT','KRW', '1.0', :inamt, :inamt1, :seckey)")
+
+UPDATE_SETUP_KEY = text("UPDATE trUser set setupKey = :seckey WHERE userNo = :uno and attrib not like :attxx")
+
+UPDATE_SETUP_USE = text("UPDATE polarisSets SET useYN = :onoff WHERE setupNo = :setupno")
+
+DELETE_SETUP = text("UPDATE polarisSets set attrib = :attx WHERE setupNo = :setupno")
+
+INSERT_SETUP = text("INSERT INTO polarisSets (userNo,coinName,stepAmt,maxAmt) values (:uno, :coinn ,:setamt, :maxamt)")
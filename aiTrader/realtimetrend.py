@@ -2,12 +2,12 @@ import requests
 from datetime import datetime, timezone
 import time
 import pandas as pd
-from collections import deque, defaultdict
+from aiTrader.pricehistory import PriceHistory
+from aiTrader.upbitconf import api_url
 
 def all_cprice():
-    server_url = "https://api.upbit.com"
     params = {"quote_currencies": "KRW"}
-    res = requests.get(server_url + "/v1/ticker/all", params=params)
+    res = requests.get(api_url("/v1/ticker/all"), params=params)
     data = res.json()
     result = []
     for item in data:
@@ -20,27 +20,20 @@ def all_cprice():
     return result
 
 max_records = 10
-coin_price_history = defaultdict(lambda: deque(maxlen=max_records))
+history = PriceHistory(capacity=max_records)
 
 # 시간 컬럼명 생성
 time_columns = ['now'] + [f'now-{i*10}s' for i in range(1, max_records)]
 
 while True:
-    price_list = all_cprice()
-    for item in price_list:
-        market = item['market']
-        price = item['trade_price']
-        coin_price_history[market].appendleft(price)  # 최신값을 맨 앞에
+    history.record({item['market']: item['trade_price'] for item in all_cprice()})
 
-    # 데이터프레임 만들기
-    data = []
-    for market, prices in coin_price_history.items():
-        # 부족한 데이터는 None으로 채움
-        row = [market] + list(prices) + [None] * (max_records - len(prices))
-        row = row[:max_records+1]  # market + 10개 데이터
-        data.append(row)
-    columns = ['market'] + time_columns
-    df = pd.DataFrame(data, columns=columns)
+    # 출력용 데이터프레임만 만든다 (최신값이 맨 앞, 부족한 데이터는 NaN)
+    df = pd.DataFrame(history.frame(max_records)[:, ::-1], index=history.markets,
+                      columns=time_columns[:history.size])
+    df.index.name = 'market'
     print(df.head())
+    movers, _ = history.top_movers(min(history.size - 1, max_records - 1), 5)
+    print(movers)
 
     time.sleep(10)
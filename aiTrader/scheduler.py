@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Dict, List, NamedTuple
+
+import numpy as np
+from sqlalchemy import text
+
+from aiTrader.backtest import PriceSums, cross_signals, peak_signals
+from aiTrader.candlestore import KST_OFFSET, CandleStore, candle_seconds
+from aiTrader.orderexec import execute_order
+from aiTrader.walletstore import SELECT_COIN_BALANCE
+
+# 사용 중(useYN='Y')인 polarisSets 설정을 봉 마감마다 평가해 모의 주문을 넣는다.
+# env auto_trade=Y 일 때만 main.py 가 시작한다 (기본 꺼짐).
+# 타임프레임마다 타이머 태스크 하나, 봉이 닫히면 그 타임프레임의 코인 캔들을 한 번에 갱신하고
+# 코인마다 신호를 한 번만 계산해 같은 코인의 모든 설정에 나눠준다 (설정 수와 무관하게 코인 수만큼만 계산).
+# 신호는 백테스트와 같은 함수(backtest.peak_signals / cross_signals)를 마감된 봉에 적용한다.
+# 매수: stepAmt 원어치, 보유 평가액 + stepAmt 가 maxAmt 를 넘으면 건너뜀 (execute_order 의 잠금 안에서 검사). 매도: 보유 수량 전량.
+
+logger = logging.getLogger(__name__)
+
+SELECT_ACTIVE_SETUPS = text(
+    "SELECT p.setupNo, p.userNo, u.setupKey, p.coinName, p.stepAmt, p.maxAmt FROM polarisSets p "
+    "JOIN trUser u ON u.userNo = p.userNo "
+    "WHERE p.useYN = 'Y' and p.attrib not like :attxx and u.setupKey is not null")
+
+
+class ActiveSetup(NamedTuple):
+    setupNo: int
+    userNo: int
+    setupKey: str
+    coinName: str
+    stepAmt: float
+    maxAmt: float
+
+
+class StrategyScheduler:
+    def __init__(self, session_factory, candle_store: CandleStore, prices: Callable[[], Dict[str, float]],
+                 timeframes=None, strategy: str = None, short_window: int = None, long_window: int = None,
+                 settle_sec: float = 2.0, concurrency: int = 20):
+        self.session_factory = session_factory
+        self.candle_store = candle_store
+        self.prices = prices  # 현재가 스냅샷 {market: price}
+        self.timeframes = list(timeframes or os.getenv("auto_trade_tfs", "3m").split(","))
+        self.strategy = strategy or os.getenv("auto_trade_strategy", "peak")
+        self.short_window = int(short_window or os.getenv("auto_trade_short", "3"))
+        self.long_window = int(long_window or os.getenv("auto_trade_long", "35"))
+        self.settle_sec = settle_sec  # 봉 마감 직후 거래소 집계를 기다리는 시간
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.orders = {"BUY": 0, "SELL": 0, "skipped": 0, "failed": 0}
+        self.last_close: Dict[str, int] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    async def load_setups(self) -> List[ActiveSetup]:
+        async with self.session_factory() as db:
+            result = await db.execute(SELECT_ACTIVE_SETUPS, {"attxx": "%XXX%"})
+            return [ActiveSetup(r.setupNo, r.userNo, r.setupKey, r.coinName, float(r.stepAmt or 0),
+                                float(r.maxAmt or 0)) for r in result.fetchall()]
+
+    def signal(self, arrays: Dict[str, np.ndarray], boundary: int):
+        # 마감된 봉(시각 < boundary)만으로 마지막 봉의 신호. 'BUY' / 'SELL' / None
+        closed = arrays['timestamp'] < boundary
+        close, volume = arrays['close'][closed], arrays['volume'][closed]
+        if len(close) < max(self.short_window, self.long_window if self.strategy == "cross" else 0) + 3:
+            return None
+        sums = PriceSums(close, volume)
+        if self.strategy == "cross":
+            buy, sell = cross_signals(close, sums.vwma(self.short_window), sums.vwma(self.long_window))
+        else:
+            buy, sell = peak_signals(close, sums.vwma(self.short_window))
+        if buy[-1] and not sell[-1]:
+            return "BUY"
+        if sell[-1] and not buy[-1]:
+            return "SELL"
+        return None
+
+    async def place(self, setup: ActiveSetup, side: str, price: float):
+        async with self.semaphore:
+            async with self.session_factory() as db:
+                try:
+                    max_amt = None
+                    if side == "BUY":
+                        if setup.stepAmt <= 0:
+                            self.orders["skipped"] += 1
+                            return
+                        volum = setup.stepAmt / price
+                        # maxAmt 한도는 execute_order 가 잠근 잔고로 검사한다 (동시 주문이 한도를 함께 넘지 않게)
+                        max_amt = setup.maxAmt
+                    else:
+                        # 매도는 보유 전량. 그 사이 잔고가 줄었으면 execute_order 가 잠근 잔고로 거절한다
+                        row = (await db.execute(SELECT_COIN_BALANCE, {"uno": setup.userNo, "seckey": setup.setupKey,
+                                                                      "coinn": setup.coinName})).fetchone()
+                        holding = float(row.remainAmt) if row is not None else 0.0
+                        # 잔고 조회 트랜잭션을 닫고 주문은 execute_order 가 잠금부터 새로 연다
+                        await db.rollback()
+                        if holding <= 0:
+                            self.orders["skipped"] += 1
+                            return
+                        volum = holding
+                    if await execute_order(db, setup.userNo, setup.setupKey, setup.coinName, side, price, volum,
+                                           max_amt=max_amt):
+                        self.orders[side] += 1
+                        logger.info("[자동매매] setup %s %s %s %.8f @ %s", setup.setupNo, side, setup.coinName, volum, price)
+                    else:
+                        self.orders["skipped"] += 1
+                except Exception as e:
+                    self.orders["failed"] += 1
+                    logger.exception("[자동매매] setup %s 주문 오류: %s", setup.setupNo, e)
+
+    async def on_bar_close(self, candle_unit: str, boundary: int):
+        setups = await self.load_setups()
+        by_coin: Dict[str, List[ActiveSetup]] = {}
+        for setup in setups:
+            by_coin.setdefault(setup.coinName, []).append(setup)
+        if not by_coin:
+            return
+        rings = await self.candle_store.refresh_many(((coin, candle_unit) for coin in by_coin), force=True)
+        prices = self.prices()
+        orders = []
+        for coin, coin_setups in by_coin.items():
+            ring = rings.get((coin, candle_unit))
+            if ring is None or isinstance(ring, Exception):
+                logger.warning("[자동매매] 캔들 갱신 실패 %s %s: %s", coin, candle_unit, ring)
+                continue
+            arrays = ring.arrays()
+            side = self.signal(arrays, boundary)
+            if side is None:
+                continue
+            price = prices.get(coin) or float(arrays['close'][-1])
+            orders.extend(self.place(setup, side, price) for setup in coin_setups)
+        if orders:
+            await asyncio.gather(*orders)
+        self.last_close[candle_unit] = boundary
+
+    async def run_timeframe(self, candle_unit: str):
+        tf_sec = candle_seconds(candle_unit)
+        while True:
+            # 다음 봉 경계(업비트 기준 UTC 정렬)까지 잠든다
+            now = time.time()
+            start = (now // tf_sec + 1) * tf_sec
+            await asyncio.sleep(start - now + self.settle_sec)
+            try:
+                await self.on_bar_close(candle_unit, int(start) + KST_OFFSET)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("[자동매매] %s 평가 오류: %s", candle_unit, e)
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self.run_timeframe(tf)) for tf in self.timeframes]
+        return self._tasks
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    def status(self) -> dict:
+        return {"strategy": self.strategy, "timeframes": self.timeframes, "short_window": self.short_window,
+                "long_window": self.long_window, "orders": dict(self.orders), "last_close": dict(self.last_close)}
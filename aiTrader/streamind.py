@@ -0,0 +1,170 @@
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+def _sign(x: float) -> int:
+    # NaN 은 0 (pandas 버전의 apply(lambda ...) 와 동일)
+    return 1 if x > 0 else (-1 if x < 0 else 0)
+
+
+class StreamingVwma:
+    """VWMA 단기/장기, MA, VWMA 변화율, 반전 지점, 마지막 반전 이후 기울기를 봉 하나당 O(1) 로 갱신한다.
+
+    결과는 vwma_ma_cross_and_diff_noimage 가 최근 count 개 봉으로 계산한 값과 같다.
+    (pandas 버전처럼 창 맨 앞 long_window 개 구간은 변화율이 NaN 인 것으로 취급한다)
+    ts 는 KST 기준 epoch 초(CandleStore 와 같은 기준)이다.
+    """
+
+    RESYNC_EVERY = 1000  # 누적합 오차가 쌓이지 않도록 주기적으로 창 전체를 다시 더한다
+
+    def __init__(self, short_window=3, long_window=20, count=180):
+        self.short_window = short_window
+        self.long_window = long_window
+        self.count = count
+        size = max(short_window, long_window)
+        self.size = size
+        self.prices = np.zeros(size, dtype=np.float64)
+        self.volumes = np.zeros(size, dtype=np.float64)
+        self.n = 0  # 지금까지 들어온 봉 수
+        self.last_ts = None
+        self.sum_pv_short = self.sum_v_short = self.sum_p_short = 0.0
+        self.sum_pv_long = self.sum_v_long = self.sum_p_long = 0.0
+        self.rate = math.nan
+        self.prev_rate = math.nan
+        self.reversals = deque()  # (봉 번호, ts, 변화율)
+
+    # ---- 누적합 관리 ----
+    def _add(self, price, volume, sign):
+        pv = price * volume
+        self.sum_pv_short += sign * pv
+        self.sum_v_short += sign * volume
+        self.sum_p_short += sign * price
+        self.sum_pv_long += sign * pv
+        self.sum_v_long += sign * volume
+        self.sum_p_long += sign * price
+
+    def _expire(self, idx, short):
+        # 봉 번호 idx 가 창 밖으로 나갈 때 해당 창(short/long) 누적합에서 뺀다
+        if idx < 0:
+            return
+        pos = idx % self.size
+        price, volume = self.prices[pos], self.volumes[pos]
+        if short:
+            self.sum_pv_short -= price * volume
+            self.sum_v_short -= volume
+            self.sum_p_short -= price
+        else:
+            self.sum_pv_long -= price * volume
+            self.sum_v_long -= volume
+            self.sum_p_long -= price
+
+    def _resync(self):
+        def window_sums(window):
+            idx = np.arange(self.n - min(window, self.n), self.n) % self.size
+            p, v = self.prices[idx], self.volumes[idx]
+            return float(np.sum(p * v)), float(np.sum(v)), float(np.sum(p))
+        self.sum_pv_short, self.sum_v_short, self.sum_p_short = window_sums(self.short_window)
+        self.sum_pv_long, self.sum_v_long, self.sum_p_long = window_sums(self.long_window)
+
+    # ---- 지표 값 ----
+    @property
+    def vwma_short(self):
+        if self.n < self.short_window or self.sum_v_short == 0:
+            return math.nan
+        return self.sum_pv_short / self.sum_v_short
+
+    @property
+    def vwma_long(self):
+        if self.n < self.long_window or self.sum_v_long == 0:
+            return math.nan
+        return self.sum_pv_long / self.sum_v_long
+
+    @property
+    def ma_short(self):
+        return self.sum_p_short / self.short_window if self.n >= self.short_window else math.nan
+
+    @property
+    def ma_long(self):
+        return self.sum_p_long / self.long_window if self.n >= self.long_window else math.nan
+
+    def _diff_rate(self):
+        short, long = self.vwma_short, self.vwma_long
+        if math.isnan(short) or math.isnan(long) or long == 0:
+            return math.nan
+        return (short - long) / long * 100
+
+    def _track_reversal(self, ts):
+        if self.reversals and self.reversals[-1][0] == self.n - 1:
+            self.reversals.pop()
+        if _sign(self.rate) * _sign(self.prev_rate) == -1:
+            self.reversals.append((self.n - 1, ts, self.rate))
+        # 창 시작 + long_window 이전의 반전은 다시 유효해지지 않으므로 버린다
+        first_valid = max(0, self.n - self.count) + self.long_window
+        while self.reversals and self.reversals[0][0] < first_valid:
+            self.reversals.popleft()
+
+    # ---- 갱신 ----
+    def update(self, ts, price, volume):
+        ts = int(ts)
+        if self.last_ts is not None and ts == self.last_ts:
+            return self.replace_last(price, volume)
+        if self.last_ts is not None and ts < self.last_ts:
+            return self
+        self._expire(self.n - self.short_window, True)
+        self._expire(self.n - self.long_window, False)
+        pos = self.n % self.size
+        self.prices[pos], self.volumes[pos] = price, volume
+        self._add(price, volume, 1)
+        self.n += 1
+        if self.n % self.RESYNC_EVERY == 0:
+            self._resync()
+        self.prev_rate = self.rate
+        self.last_ts = ts
+        self.rate = self._diff_rate()
+        self._track_reversal(ts)
+        return self
+
+    def replace_last(self, price, volume):
+        # 아직 만들어지는 중인 마지막 봉 갱신
+        pos = (self.n - 1) % self.size
+        self._add(self.prices[pos], self.volumes[pos], -1)
+        self.prices[pos], self.volumes[pos] = price, volume
+        self._add(price, volume, 1)
+        self.rate = self._diff_rate()
+        self._track_reversal(self.last_ts)
+        return self
+
+    # ---- 결과 ----
+    def _valid_reversals(self):
+        first_valid = max(0, self.n - self.count) + self.long_window
+        return [r for r in self.reversals if r[0] >= first_valid]
+
+    def result(self):
+        # vwma_ma_cross_and_diff_noimage 와 같은 순서의 튜플. 첫 값은 DataFrame 대신 마지막 봉의 지표 dict
+        reversals = self._valid_reversals()
+        reversal_indices = [pd.Timestamp(ts, unit='s') for _, ts, _ in reversals]
+        reversal_distances = [(reversals[i][1] - reversals[i - 1][1]) / 60 for i in range(1, len(reversals))]
+        if reversals:
+            _, x1, y1 = reversals[-1]
+            delta_x = (self.last_ts - x1) / 60
+            if delta_x != 0:
+                slope = (self.rate - y1) / delta_x
+                angle_deg = np.degrees(np.arctan(slope))
+            else:
+                slope = float('inf')
+                angle_deg = 90.0
+        else:
+            slope = None
+            angle_deg = None
+            delta_x = None
+        last = {
+            f'VWMA_{self.short_window}': self.vwma_short,
+            f'VWMA_{self.long_window}': self.vwma_long,
+            f'MA_{self.short_window}': self.ma_short,
+            f'MA_{self.long_window}': self.ma_long,
+            'VWMA_diff_rate': self.rate,
+        }
+        return last, reversal_indices, reversal_distances, slope, angle_deg, delta_x
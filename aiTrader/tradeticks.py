@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import os
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from aiTrader.wshub import UpbitWsHub
+
+BID, ASK = 1, -1
+
+logger = logging.getLogger(__name__)
+
+
+class TradeTickRing:
+    """마켓 하나의 체결 틱 링버퍼 (timestamp ms int64, price/volume float64, side int8).
+
+    틱마다 매수/매도 거래량 누적합을 같이 저장해 두어, 최근 w 틱의 매수/매도 거래량은
+    두 누적합의 차 한 번으로 구한다 (w <= capacity 인 어떤 창이든 O(1)).
+    누적합은 capacity 틱마다 가장 오래된 값 기준으로 다시 맞춰 값이 끝없이 커지지 않게 한다.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self.ts = np.zeros(capacity, dtype=np.int64)
+        self.price = np.zeros(capacity, dtype=np.float64)
+        self.volume = np.zeros(capacity, dtype=np.float64)
+        self.side = np.zeros(capacity, dtype=np.int8)
+        self.cum_bid = np.zeros(capacity, dtype=np.float64)  # 해당 틱까지 포함한 누적
+        self.cum_ask = np.zeros(capacity, dtype=np.float64)
+        self.base_bid = 0.0  # 남아 있는 가장 오래된 틱 직전의 누적
+        self.base_ask = 0.0
+        self.head = 0
+        self.size = 0
+        self.pushed = 0
+
+    def push(self, ts: int, price: float, volume: float, side: int):
+        last = (self.head - 1) % self.capacity
+        bid = self.cum_bid[last] if self.size else self.base_bid
+        ask = self.cum_ask[last] if self.size else self.base_ask
+        if side == BID:
+            bid += volume
+        else:
+            ask += volume
+        pos = self.head
+        if self.size == self.capacity:
+            # 덮어쓰는 틱의 누적이 새 기준이 된다
+            self.base_bid = self.cum_bid[pos]
+            self.base_ask = self.cum_ask[pos]
+        self.ts[pos] = ts
+        self.price[pos] = price
+        self.volume[pos] = volume
+        self.side[pos] = side
+        self.cum_bid[pos] = bid
+        self.cum_ask[pos] = ask
+        self.head = (pos + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self.pushed += 1
+        if self.pushed % self.capacity == 0:
+            self._rebase()
+
+    def _rebase(self):
+        self.cum_bid -= self.base_bid
+        self.cum_ask -= self.base_ask
+        self.base_bid = 0.0
+        self.base_ask = 0.0
+
+    def volumes(self, window: int):
+        # 최근 window 틱 (틱이 모자라면 있는 만큼)의 (매수 거래량, 매도 거래량, 틱 수)
+        n = min(window, self.size)
+        if n == 0:
+            return 0.0, 0.0, 0
+        last = (self.head - 1) % self.capacity
+        if n == self.size:
+            start_bid, start_ask = self.base_bid, self.base_ask
+        else:
+            before = (last - n) % self.capacity
+            start_bid, start_ask = self.cum_bid[before], self.cum_ask[before]
+        return float(self.cum_bid[last] - start_bid), float(self.cum_ask[last] - start_ask), n
+
+    def strength(self, window: int) -> dict:
+        # trendcollect.get_upbit_trade_strength 와 같은 값: 매수 비율(%), 첫/마지막 틱 시간차(초)
+        bid, ask, n = self.volumes(window)
+        total = bid + ask
+        result = {"window": window, "ticks": n, "bid_volume": bid, "ask_volume": ask,
+                  "strength": bid / total * 100 if total > 0 else 0.0, "time_diff": 0.0,
+                  "start_ts": None, "end_ts": None}
+        if n:
+            last = (self.head - 1) % self.capacity
+            first = (last - n + 1) % self.capacity
+            result["start_ts"] = int(self.ts[first])
+            result["end_ts"] = int(self.ts[last])
+            if n >= 2:
+                result["time_diff"] = abs(result["end_ts"] - result["start_ts"]) / 1000
+        return result
+
+
+class TradeTickCollector:
+    """업비트 trade 채널을 구독해 마켓별 TradeTickRing 에 쌓는다."""
+
+    def __init__(self, hub: UpbitWsHub, capacity: int = None, queue_size: int = None, price_history=None):
+        self.hub = hub
+        self.price_history = price_history  # PriceHistory. 있으면 체결가로 현재 샘플을 갱신한다
+        self.capacity = int(capacity if capacity is not None else os.getenv("trade_tick_capacity", "1000"))
+        self.queue_size = int(queue_size if queue_size is not None else os.getenv("trade_tick_queue", "10000"))
+        self.rings: Dict[str, TradeTickRing] = {}
+        self._sub = None
+        self._task = None
+
+    @property
+    def dropped(self) -> int:
+        return self._sub.dropped if self._sub is not None else 0
+
+    def ring(self, market: str) -> Optional[TradeTickRing]:
+        return self.rings.get(market)
+
+    def ingest(self, msg: dict):
+        code = msg.get("code")
+        ring = self.rings.get(code)
+        if ring is None:
+            ring = self.rings[code] = TradeTickRing(self.capacity)
+        ring.push(msg.get("trade_timestamp") or msg.get("timestamp") or 0, msg["trade_price"],
+                  msg["trade_volume"], BID if msg.get("ask_bid") == "BID" else ASK)
+        if self.price_history is not None:
+            self.price_history.update(code, msg["trade_price"])
+
+    async def run(self):
+        async for msg in self._sub:
+            try:
+                self.ingest(msg)
+            except (KeyError, TypeError) as e:
+                logger.warning("체결 틱 형식 오류: %s", e)
+
+    def start(self, markets: Iterable[str]):
+        markets = sorted(markets)
+        if self._sub is not None and self._sub.codes == set(markets):
+            return self._task
+        if self._sub is not None:
+            self._sub.close()
+        self._sub = self.hub.subscribe(markets, self.queue_size)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        else:
+            # run() 이 새 구독을 읽도록 다시 시작
+            self._task.cancel()
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._sub is not None:
+            self._sub.close()
+            self._sub = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.hub.stop()
@@ -1,9 +1,11 @@
 import requests
 from datetime import datetime, timezone
 
+from aiTrader.upbitconf import api_url
+
 def get_upbit_trade_strength(market="KRW-BTC", count=100):
     # 1. API 요청 (한 번만 실행)
-    url = f"https://api.upbit.com/v1/trades/ticks?market={market}&count={count}"
+    url = api_url(f"/v1/trades/ticks?market={market}&count={count}")
     headers = {"Accept": "application/json"}
     response = requests.get(url, headers=headers)
 
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import math
+from typing import Dict, NamedTuple, Tuple
+
+TF_ORDER = ['1d', '4h', '1h', '30m', '3m', '1m']
+
+SIGNAL_STYLE = """
+    <style>
+    .signal-bulb {
+    display: inline-block;
+    width: 15px;
+    height: 15px;
+    border-radius: 50%;
+    margin: 0 2px;
+    text-align: center;
+    line-height: 15px;   /* 폰트와 동일하게 */
+    font-weight: bold;
+    font-size: 15px;     /* 폰트와 동일하게 */
+    vertical-align: middle;
+    position: relative;
+    }
+    .signal-bulb .tf-label {
+    display: block;
+    font-size: 9px;
+    color: #333;
+    font-weight: normal;
+    line-height: 12px;
+    margin-top: -4px;
+    }
+    .signal-bulb.black { background: #222; color: #fff;}
+    .signal-bulb.red { background: #e7505a; }
+    .signal-bulb.orange { background: #f7ca18; color: #333;}
+    .signal-bulb.green { background: #26c281; }
+    </style>
+    """
+
+
+def get_signal_class(slope: float) -> dict:
+    if slope < -44.9:
+        return {'cls': 'black', 'label': '⚫'}
+    elif slope > 45:
+        return {'cls': 'black', 'label': '⚫'}
+    elif slope < 0:
+        return {'cls': 'red', 'label': '🔴'}
+    elif slope < 0.2:
+        return {'cls': 'orange', 'label': '🟠'}
+    else:
+        return {'cls': 'green', 'label': '🟢'}
+
+
+def make_signal_bulbs(tfs: dict) -> str:
+    bulbs = ""
+    for tf in TF_ORDER:
+        if tf in tfs:
+            slope = tfs[tf]['slope']
+            sig = get_signal_class(slope)
+            bulbs += f'<span class="signal-bulb {sig["cls"]}" title="{tf}"></span>'
+    return bulbs
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+
+
+def _json_safe(value):
+    # JSON 에 NaN/inf 를 넣을 수 없으므로 null 로 바꾼다
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {k: _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    return value
+
+
+class TrendSnapshot(NamedTuple):
+    """한 번의 트렌드 갱신 결과. 발행된 뒤에는 수정하지 않는다 (새 주기는 새 스냅샷으로 교체)."""
+    version: int
+    data: Dict[str, Dict[str, dict]]
+    json_bytes: bytes
+    etag: str
+    bulbs: Dict[str, Tuple[bytes, str]]  # coin -> (신호등 HTML, ETag)
+
+
+def build_snapshot(data: Dict[str, Dict[str, dict]], version: int) -> TrendSnapshot:
+    data = _json_safe(data)
+    json_bytes = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    bulbs = {}
+    for coin, tfs in data.items():
+        html = (SIGNAL_STYLE + make_signal_bulbs(tfs)).encode("utf-8")
+        bulbs[coin] = (html, _etag(html))
+    return TrendSnapshot(version, data, json_bytes, _etag(json_bytes), bulbs)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in tags or f"W/{etag}" in tags
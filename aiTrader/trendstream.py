@@ -0,0 +1,72 @@
+import asyncio
+import json
+from typing import Dict, Set
+
+from aiTrader.trendsnapshot import TrendSnapshot
+
+
+# 트렌드 스냅샷이 새로 발행될 때 접속 중인 클라이언트에게 바뀐 코인/타임프레임만 보낸다.
+# 구독자 큐가 가득 찬(느린) 클라이언트는 끊어서 다른 클라이언트와 발행 주기가 밀리지 않게 한다.
+
+def trend_delta(old: Dict[str, Dict[str, dict]], new: Dict[str, Dict[str, dict]]) -> dict:
+    changed = {}
+    removed = {}
+    for coin, tfs in new.items():
+        old_tfs = old.get(coin, {})
+        diff = {tf: entry for tf, entry in tfs.items() if old_tfs.get(tf) != entry}
+        if diff:
+            changed[coin] = diff
+        gone = [tf for tf in old_tfs if tf not in tfs]
+        if gone:
+            removed[coin] = gone
+    for coin in old:
+        if coin not in new:
+            removed[coin] = None  # 코인 전체 삭제
+    return {"changed": changed, "removed": removed}
+
+
+def snapshot_message(snap: TrendSnapshot) -> str:
+    # 스냅샷 JSON 은 이미 직렬화되어 있으므로 감싸기만 한다
+    return f'{{"type":"snapshot","version":{snap.version},"data":{snap.json_bytes.decode("utf-8")}}}'
+
+
+class TrendSubscriber:
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.dropped = False
+
+    async def get(self):
+        # 느려서 끊긴 경우 None
+        if self.dropped:
+            return None
+        return await self.queue.get()
+
+
+class TrendBroadcaster:
+    def __init__(self, queue_size: int = 4):
+        self.queue_size = queue_size
+        self.subscribers: Set[TrendSubscriber] = set()
+
+    def subscribe(self) -> TrendSubscriber:
+        sub = TrendSubscriber(self.queue_size)
+        self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: TrendSubscriber):
+        self.subscribers.discard(sub)
+
+    def publish(self, old: TrendSnapshot, new: TrendSnapshot):
+        if not self.subscribers:
+            return
+        delta = trend_delta(old.data, new.data)
+        if not delta["changed"] and not delta["removed"]:
+            return
+        message = json.dumps({"type": "delta", "base": old.version, "version": new.version, **delta},
+                             ensure_ascii=False, separators=(",", ":"))
+        for sub in tuple(self.subscribers):
+            if sub.queue.full():
+                # 큐가 찼다는 것은 get() 대기 중이 아니라는 뜻이므로 다음 get() 에서 None 을 받는다
+                sub.dropped = True
+                self.subscribers.discard(sub)
+                continue
+            sub.queue.put_nowait(message)
@@ -0,0 +1,21 @@
+import os
+
+# 업비트 접속 주소. env upbit_api_url / upbit_ws_url 로 바꾸면 모든 REST/웹소켓 호출이 그쪽으로 간다
+# (오프라인 부하 테스트: python tools/fakeupbit.py 후 upbit_api_url=http://127.0.0.1:8765,
+#  upbit_ws_url=ws://127.0.0.1:8765/websocket/v1).
+# main.py 는 import 뒤에 .env 를 읽으므로 모듈 상수가 아니라 호출 시점에 env 를 본다.
+
+DEFAULT_API_URL = "https://api.upbit.com"
+DEFAULT_WS_URL = "wss://api.upbit.com/websocket/v1"
+
+
+def api_base() -> str:
+    return os.getenv("upbit_api_url", DEFAULT_API_URL).rstrip("/")
+
+
+def api_url(path: str) -> str:
+    return api_base() + path
+
+
+def ws_url() -> str:
+    return os.getenv("upbit_ws_url", DEFAULT_WS_URL)
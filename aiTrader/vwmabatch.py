@@ -0,0 +1,97 @@
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+
+# 한 타임프레임의 여러 마켓을 (마켓 x 봉) 행렬로 쌓아 VWMA 단기/장기, 변화율, 반전 지점, 기울기를 한 번에 계산한다.
+# 결과는 마켓별로 tradetrend[coin][tf] 에 그대로 넣을 수 있는 dict 이다.
+
+def rolling_sum_2d(x: np.ndarray, valid: np.ndarray, window: int) -> np.ndarray:
+    # pandas rolling(window).sum() 과 같이 창 안에 값이 window 개 모두 있어야 유효하다
+    m, n = x.shape
+    out = np.full((m, n), np.nan)
+    if window > n:
+        return out
+    csum = np.zeros((m, n + 1))
+    np.cumsum(np.where(valid, x, 0.0), axis=1, out=csum[:, 1:])
+    ccount = np.zeros((m, n + 1), dtype=np.int64)
+    np.cumsum(valid, axis=1, out=ccount[:, 1:])
+    sums = csum[:, window:] - csum[:, :-window]
+    counts = ccount[:, window:] - ccount[:, :-window]
+    out[:, window - 1:] = np.where(counts == window, sums, np.nan)
+    return out
+
+
+def stack_bars(bars: Dict[str, Dict[str, np.ndarray]], length: int = None):
+    # {market: {'timestamp', 'close', 'volume'}} -> (markets, ts, price, volume). 짧은 마켓은 앞쪽을 NaN 으로 채운다
+    markets = list(bars)
+    n = length or max((len(b['timestamp']) for b in bars.values()), default=0)
+    ts = np.zeros((len(markets), n), dtype=np.int64)
+    price = np.full((len(markets), n), np.nan)
+    volume = np.full((len(markets), n), np.nan)
+    for row, market in enumerate(markets):
+        b = bars[market]
+        k = min(n, len(b['timestamp']))
+        if k:
+            ts[row, n - k:] = b['timestamp'][-k:]
+            price[row, n - k:] = b['close'][-k:]
+            volume[row, n - k:] = b['volume'][-k:]
+    return markets, ts, price, volume
+
+
+def vwma_batch(markets: Sequence[str], ts: np.ndarray, price: np.ndarray, volume: np.ndarray,
+               short_window=3, long_window=20) -> Dict[str, dict]:
+    # ts 는 epoch 초 (마켓마다 봉 시각이 다를 수 있어 2차원)
+    price = np.asarray(price, dtype=np.float64)
+    volume = np.asarray(volume, dtype=np.float64)
+    valid = ~(np.isnan(price) | np.isnan(volume))
+    pv = price * volume
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vwma_short = rolling_sum_2d(pv, valid, short_window) / rolling_sum_2d(volume, valid, short_window)
+        vwma_long = rolling_sum_2d(pv, valid, long_window) / rolling_sum_2d(volume, valid, long_window)
+        rate = (vwma_short - vwma_long) / vwma_long * 100
+
+    # 부호 변화(음↔양) 반전 지점. NaN 은 0 으로 취급
+    sign = (rate > 0).astype(np.int8) - (rate < 0).astype(np.int8)
+    rev = np.zeros(rate.shape, dtype=bool)
+    rev[:, 1:] = sign[:, 1:] * sign[:, :-1] == -1
+
+    counts = rev.sum(axis=1)
+    has_rev = counts > 0
+    n = rate.shape[1]
+    last = n - 1 - np.argmax(rev[:, ::-1], axis=1)
+    rows = np.arange(len(markets))
+    delta_x = (ts[:, -1] - ts[rows, last]) / 60
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (rate[:, -1] - rate[rows, last]) / delta_x
+    slope = np.where(delta_x == 0, np.inf, slope)
+    angle_deg = np.where(delta_x == 0, 90.0, np.degrees(np.arctan(slope)))
+
+    # 반전 간 거리(분): 반전 위치를 행 순서대로 모아 한 번에 diff 하고 마켓별로 자른다
+    rev_rows, rev_cols = np.nonzero(rev)
+    gaps = np.diff(ts[rev_rows, rev_cols]) / 60
+    bounds = np.cumsum(counts)
+    distances: List[np.ndarray] = []
+    start = 0
+    for end in bounds:
+        distances.append(gaps[start:end - 1] if end - start > 1 else gaps[:0])
+        start = end
+
+    result: Dict[str, dict] = {}
+    for i, market in enumerate(markets):
+        if not has_rev[i]:
+            # 반전 지점이 없으면 기울기를 계산할 수 없다 (기존 로직에서도 해당 타임프레임은 빠진다)
+            result[market] = None
+            continue
+        s = float(slope[i])
+        if np.isinf(s):
+            s = 1e10 if s > 0 else -1e10
+        result[market] = {
+            "slope": s,
+            "angle_deg": float(angle_deg[i]),
+            "reversal_count": int(counts[i]),
+            "reversal_distances": distances[i].tolist(),
+            "deltax": float(delta_x[i]),
+        }
+    return result
@@ -1,7 +1,36 @@
+import logging
 import requests
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
+from aiTrader.candlefetch import CANDLE_MAP, candle_path
+from aiTrader.upbitconf import api_url
+
+logger = logging.getLogger(__name__)
+
+
+def reversal_kernel(rate, ts_ns):
+    # VWMA 변화율(float64) 과 봉 시각(int64, ns) 배열만으로 반전 지점을 찾는다.
+    # 반환: (반전 위치 배열, 반전 간 거리(분), 마지막 반전~현재 기울기, 각도, 경과 분)
+    rate = np.asarray(rate, dtype=np.float64)
+    ts_ns = np.asarray(ts_ns, dtype=np.int64)
+    # NaN 은 비교가 모두 False 라서 0 이 된다 (기존 apply(lambda ...) 와 동일)
+    sign = (rate > 0).astype(np.int8) - (rate < 0).astype(np.int8)
+    # 부호가 음↔양으로 바뀐 곳이 반전
+    rev_idx = np.flatnonzero(sign[1:] * sign[:-1] == -1) + 1
+    distances = np.diff(ts_ns[rev_idx]) / 1e9 / 60
+    if rev_idx.size == 0:
+        return rev_idx, distances, None, None, None
+    last = rev_idx[-1]
+    delta_x = (ts_ns[-1] - ts_ns[last]) / 1e9 / 60
+    if delta_x != 0:
+        slope = (rate[-1] - rate[last]) / delta_x
+        angle_deg = np.degrees(np.arctan(slope))
+    else:
+        slope = float('inf')
+        angle_deg = 90.0
+    return rev_idx, distances, slope, angle_deg, delta_x
+
 
 def vwma_ma_cross_and_diff(
         ticker='KRW-BTC',
@@ -27,9 +56,9 @@ def vwma_ma_cross_and_diff(
 
     api_type, minute = candle_map[candle_unit]
     if api_type == 'days':
-        url = f'https://api.upbit.com/v1/candles/days?market={ticker}&count={count}'
+        url = api_url(f'/v1/candles/days?market={ticker}&count={count}')
     else:
-        url = f'https://api.upbit.com/v1/candles/minutes/{minute}?market={ticker}&count={count}'
+        url = api_url(f'/v1/candles/minutes/{minute}?market={ticker}&count={count}')
 
     # 1. 데이터 가져오기
     response = requests.get(url)
@@ -85,22 +114,15 @@ def vwma_ma_cross_and_diff(
     ax1.legend()
 
     # 6. 변화율 반전 지점 찾기
-    df['sign'] = df['VWMA_diff_rate'].apply(lambda x: 1 if x > 0 else (-1 if x < 0 else 0))
-    df['sign_change'] = df['sign'] * df['sign'].shift(1)
-    # sign_change가 -1인 곳이 반전(음↔양)
-    reversal_points = df[df['sign_change'] == -1]
-    reversal_indices = reversal_points.index.to_list()
-
-    # 반전 간 거리 계산 (인덱스 기준)
-    reversal_distances = []
-    for i in range(1, len(reversal_indices)):
-        prev = reversal_indices[i-1]
-        curr = reversal_indices[i]
-        distance = (curr - prev).total_seconds() / 60  # 분 단위 거리
-        reversal_distances.append(distance)
+    rate = df['VWMA_diff_rate'].to_numpy(dtype=np.float64)
+    ts_ns = df.index.as_unit('ns').asi8
+    rev_idx, distances, slope, angle_deg, delta_x = reversal_kernel(rate, ts_ns)
+    reversal_indices = df.index[rev_idx].to_list()
+    # 반전 간 거리 (분 단위)
+    reversal_distances = distances.tolist()
 
     # 반전 지점 표시 (그래프에)
-    ax2.scatter(reversal_points.index, reversal_points['VWMA_diff_rate'], color='purple', marker='o', s=100, label='Reversal')
+    ax2.scatter(df.index[rev_idx], rate[rev_idx], color='purple', marker='o', s=100, label='Reversal')
     ax2.plot(df.index, df['VWMA_diff_rate'], label=f'VWMA {short_window}-{long_window} Diff Rate (%)', color='orange')
     ax2.axhline(0, color='gray', linestyle='--', linewidth=1)
     ax2.set_title(f'{ticker} VWMA {short_window}-{long_window} Diff Rate (%) ({candle_unit})')
@@ -112,28 +134,11 @@ def vwma_ma_cross_and_diff(
     plt.tight_layout()
     plt.show()
 
-    # 7. 마지막 반전 지점에서 현재까지의 기울기 계산
-    if len(reversal_points.index) > 0:
-        last_reversal_idx = reversal_points.index[-1]
-        x1 = last_reversal_idx
-        x2 = df.index[-1]
-        y1 = df.loc[x1, 'VWMA_diff_rate']
-        y2 = df.iloc[-1]['VWMA_diff_rate']
-        # 시간 차이 (분)
-        delta_x = (x2 - x1).total_seconds() / 60
-        # 기울기 계산
-        if delta_x != 0:
-            slope = (y2 - y1) / delta_x
-            # 각도(도)로 변환
-            angle_deg = np.degrees(np.arctan(slope))
-        else:
-            slope = float('inf')
-            angle_deg = 90.0
-        print(f"마지막 반전({x1})~현재({x2}) VWMA 변화율 연결선 기울기: {slope:.4f} (%/분)")
+    # 7. 마지막 반전 지점에서 현재까지의 기울기
+    if rev_idx.size > 0:
+        print(f"마지막 반전({df.index[rev_idx[-1]]})~현재({df.index[-1]}) VWMA 변화율 연결선 기울기: {slope:.4f} (%/분)")
         print(f"기울기의 각도: {angle_deg:.2f}°")
     else:
-        slope = None
-        angle_deg = None
         print("반전 지점이 없습니다.")
 
     return df, reversal_indices, reversal_distances, slope, angle_deg
@@ -147,32 +152,22 @@ def vwma_ma_cross_and_diff_noimage(
         candle_unit='1h'
 ):
     # 0. 캔들 단위 변환
-    global delta_x
-    candle_map = {
-        '1d': ('days', ''),
-        '4h': ('minutes', 240),
-        '1h': ('minutes', 60),
-        '30m': ('minutes', 30),
-        '15m': ('minutes', 15),
-        '10m': ('minutes', 10),
-        '5m': ('minutes', 5),
-        '3m': ('minutes', 3),
-        '1m': ('minutes', 1),
-    }
-    if candle_unit not in candle_map:
+    if candle_unit not in CANDLE_MAP:
         raise ValueError(f"지원하지 않는 단위입니다: {candle_unit}")
-
-    api_type, minute = candle_map[candle_unit]
-    if api_type == 'days':
-        url = f'https://api.upbit.com/v1/candles/days?market={ticker}&count={count}'
-    else:
-        url = f'https://api.upbit.com/v1/candles/minutes/{minute}?market={ticker}&count={count}'
+    url = api_url(f'{candle_path(candle_unit)}?market={ticker}&count={count}')
 
     # 1. 데이터 가져오기
     response = requests.get(url)
     if response.status_code != 200:
         raise Exception(f"API 요청 실패: {response.status_code}")
     data = response.json()
+    if not data:
+        raise Exception("데이터가 비어있습니다")
+    return vwma_diff_from_candles(data, short_window, long_window)
+
+
+def vwma_diff_from_candles(data, short_window=3, long_window=20):
+    # 이미 받아온 업비트 캔들 목록으로 계산 (CandleFetcher 와 함께 사용)
     if not data:
         raise Exception("데이터가 비어있습니다")
     df = pd.DataFrame(data)
@@ -180,7 +175,10 @@ def vwma_ma_cross_and_diff_noimage(
     df.set_index('candle_date_time_kst', inplace=True)
     df = df.sort_index(ascending=True)
     df = df[['trade_price', 'candle_acc_trade_volume']]
+    return _vwma_diff_df(df, short_window, long_window)
 
+
+def _vwma_diff_df(df, short_window, long_window):
     # 2. VWMA 및 MA 계산
     df[f'VWMA_{short_window}'] = (
             (df['trade_price'] * df['candle_acc_trade_volume'])
@@ -212,43 +210,17 @@ def vwma_ma_cross_and_diff_noimage(
     # 5. 그래프 그리기
 
     # 6. 변화율 반전 지점 찾기
-    df['sign'] = df['VWMA_diff_rate'].apply(lambda x: 1 if x > 0 else (-1 if x < 0 else 0))
-    df['sign_change'] = df['sign'] * df['sign'].shift(1)
-    # sign_change가 -1인 곳이 반전(음↔양)
-    reversal_points = df[df['sign_change'] == -1]
-    reversal_indices = reversal_points.index.to_list()
-
-    # 반전 간 거리 계산 (인덱스 기준)
-    reversal_distances = []
-    for i in range(1, len(reversal_indices)):
-        prev = reversal_indices[i-1]
-        curr = reversal_indices[i]
-        distance = (curr - prev).total_seconds() / 60  # 분 단위 거리
-        reversal_distances.append(distance)
-
-    # 7. 마지막 반전 지점에서 현재까지의 기울기 계산
-    if len(reversal_points.index) > 0:
-        last_reversal_idx = reversal_points.index[-1]
-        x1 = last_reversal_idx
-        x2 = df.index[-1]
-        y1 = df.loc[x1, 'VWMA_diff_rate']
-        y2 = df.iloc[-1]['VWMA_diff_rate']
-        # 시간 차이 (분)
-        delta_x = (x2 - x1).total_seconds() / 60
-        # 기울기 계산
-        if delta_x != 0:
-            slope = (y2 - y1) / delta_x
-            # 각도(도)로 변환
-            angle_deg = np.degrees(np.arctan(slope))
-        else:
-            slope = float('inf')
-            angle_deg = 90.0
-        print(f"마지막 반전({x1})~현재({x2}) VWMA 변화율 연결선 기울기: {slope:.4f} (%/분)")
-        print(f"기울기의 각도: {angle_deg:.2f}°")
-        print(f"마지막 반전 시간 : {delta_x} 분전" )
+    rate = df['VWMA_diff_rate'].to_numpy(dtype=np.float64)
+    rev_idx, distances, slope, angle_deg, delta_x = reversal_kernel(rate, df.index.as_unit('ns').asi8)
+    reversal_indices = df.index[rev_idx].to_list()
+    # 반전 간 거리 (분 단위)
+    reversal_distances = distances.tolist()
+
+    # 7. 마지막 반전 지점에서 현재까지의 기울기
+    if rev_idx.size > 0:
+        logger.debug("마지막 반전(%s)~현재(%s) VWMA 변화율 연결선 기울기: %.4f (%%/분), 각도 %.2f°, %s 분전",
+                     df.index[rev_idx[-1]], df.index[-1], slope, angle_deg, delta_x)
     else:
-        slope = None
-        angle_deg = None
-        print("반전 지점이 없습니다.")
+        logger.debug("반전 지점이 없습니다.")
 
-    return df, reversal_indices, reversal_distances, slope, angle_deg, delta_x
\ No newline at end of file
+    return df, reversal_indices, reversal_distances, slope, angle_deg, delta_x
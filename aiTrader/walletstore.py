@@ -0,0 +1,175 @@
+import argparse
+import asyncio
+import os
+
+import dotenv
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from aiTrader.logbook import INDEX_NAME, ensure_logbook_index
+
+# 현재 잔고 테이블 trBalance.
+# trWallet 은 거래마다 행이 쌓이는 원장이고, 현재 잔고는 (userNo, linkNo, currency) 당 한 행으로 따로 유지한다.
+# 원장 INSERT 와 같은 트랜잭션에서 upsert 하므로 둘은 항상 일치한다.
+
+CREATE_BALANCE_TABLE = text(
+    "CREATE TABLE IF NOT EXISTS trBalance ("
+    " userNo INT NOT NULL,"
+    " linkNo VARCHAR(20) NOT NULL,"
+    " currency VARCHAR(20) NOT NULL,"
+    " remainAmt DOUBLE NOT NULL DEFAULT 0,"
+    " updDate DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,"
+    " PRIMARY KEY (userNo, linkNo, currency))")
+
+SELECT_BALANCES = text(
+    "SELECT b.userNo, b.linkNo, b.currency, b.remainAmt, b.updDate FROM trBalance b "
+    "JOIN trUser u ON u.userNo = b.userNo and u.setupKey = b.linkNo "
+    "WHERE b.userNo = :uno order by b.currency")
+
+LOCK_BALANCES = text(
+    "SELECT currency, remainAmt FROM trBalance "
+    "WHERE userNo = :uno and linkNo = :seckey and currency in ('KRW', :coinn) FOR UPDATE")
+
+SELECT_COIN_BALANCE = text(
+    "SELECT remainAmt FROM trBalance WHERE userNo = :uno and linkNo = :seckey and currency = :coinn")
+
+UPSERT_BALANCE = text(
+    "INSERT INTO trBalance (userNo, linkNo, currency, remainAmt) values (:uno, :seckey, :coinn, :remamt) "
+    "ON DUPLICATE KEY UPDATE remainAmt = VALUES(remainAmt)")
+
+UPSERT_ORDER_BALANCES = text(
+    "INSERT INTO trBalance (userNo, linkNo, currency, remainAmt) values "
+    "(:uno, :seckey, 'KRW', :remkrw), (:uno, :seckey, :coinn, :remcoin) "
+    "ON DUPLICATE KEY UPDATE remainAmt = VALUES(remainAmt)")
+
+CLEAR_BALANCES = text("DELETE FROM trBalance WHERE (:uno is null or userNo = :uno)")
+
+# 원장의 살아있는 행(attrib 에 XXX 없음)으로 다시 채운다. 같은 키가 여럿이면 regDate 가 늦은 행이 남는다
+REBUILD_BALANCES = text(
+    "INSERT INTO trBalance (userNo, linkNo, currency, remainAmt) "
+    "SELECT userNo, linkNo, currency, IFNULL(remainAmt, 0) FROM trWallet "
+    "WHERE attrib not like :attxx and (:uno is null or userNo = :uno) order by regDate "
+    "ON DUPLICATE KEY UPDATE remainAmt = VALUES(remainAmt)")
+
+# 평균 매수단가 테이블 trAvgCost.
+# (userNo, linkNo, currency, sessionNo) 마다 누적 매수금액/수량을 주문 시점에 더해 둔다.
+# 세션은 잔고가 0 이 되는 매도에서 끝나고 다음 번호로 넘어간다 (원장 윈도 함수 쿼리의 session_id 와 같은 규칙).
+# 평균단가 = buyAmt / buyQty, KRW 는 기록하지 않는다 (평균단가 0).
+
+CREATE_AVG_COST_TABLE = text(
+    "CREATE TABLE IF NOT EXISTS trAvgCost ("
+    " userNo INT NOT NULL,"
+    " linkNo VARCHAR(20) NOT NULL,"
+    " currency VARCHAR(20) NOT NULL,"
+    " sessionNo INT NOT NULL,"
+    " buyAmt DOUBLE NOT NULL DEFAULT 0,"
+    " buyQty DOUBLE NOT NULL DEFAULT 0,"
+    " updDate DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,"
+    " PRIMARY KEY (userNo, linkNo, currency, sessionNo))")
+
+SELECT_AVG_SESSION = text(
+    "SELECT IFNULL(MAX(sessionNo), 0) FROM trAvgCost WHERE userNo = :uno and linkNo = :seckey and currency = :coinn")
+
+ADD_AVG_COST = text(
+    "INSERT INTO trAvgCost (userNo, linkNo, currency, sessionNo, buyAmt, buyQty) "
+    "values (:uno, :seckey, :coinn, :sessno, :buyamt, :buyqty) "
+    "ON DUPLICATE KEY UPDATE buyAmt = buyAmt + VALUES(buyAmt), buyQty = buyQty + VALUES(buyQty)")
+
+SELECT_AVG_BY_COIN = text(
+    "SELECT a.currency, IFNULL(a.buyAmt / NULLIF(a.buyQty, 0), 0) AS avg_price, a.buyAmt, a.buyQty, a.sessionNo "
+    "FROM trAvgCost a WHERE a.userNo = :uno and a.linkNo = :seckey and a.sessionNo = "
+    "(SELECT MAX(b.sessionNo) FROM trAvgCost b "
+    "WHERE b.userNo = a.userNo and b.linkNo = a.linkNo and b.currency = a.currency)")
+
+SELECT_AVG_PRICE = text(
+    "SELECT currency, IFNULL(buyAmt / NULLIF(buyQty, 0), 0) AS avg_price, buyAmt, buyQty, sessionNo "
+    "FROM trAvgCost WHERE userNo = :uno and linkNo = :seckey and currency = :coinn "
+    "ORDER BY sessionNo DESC LIMIT 1")
+
+SELECT_LEDGER_FOR_AVG = text(
+    "SELECT userNo, linkNo, currency, changeType, unitPrice, inAmt, remainAmt FROM trWallet "
+    "WHERE currency <> 'KRW' and (:uno is null or userNo = :uno) ORDER BY userNo, linkNo, currency, regDate")
+
+CLEAR_AVG_COST = text("DELETE FROM trAvgCost WHERE (:uno is null or userNo = :uno)")
+
+INSERT_AVG_COST = text(
+    "INSERT INTO trAvgCost (userNo, linkNo, currency, sessionNo, buyAmt, buyQty) "
+    "values (:uno, :seckey, :coinn, :sessno, :buyamt, :buyqty)")
+
+
+async def add_order_avg_cost(db: AsyncSession, uno, seckey, coinn: str, side: str, price: float, volum: float,
+                             remcoin: float):
+    # execute_order 트랜잭션 안에서 호출. 잔고 행 잠금으로 같은 사용자 주문은 이미 직렬화되어 있다
+    sessno = (await db.execute(SELECT_AVG_SESSION, {"uno": uno, "seckey": seckey, "coinn": coinn})).scalar()
+    if side == "BUY":
+        buyamt, buyqty = price * volum, volum
+    elif remcoin == 0:
+        sessno, buyamt, buyqty = sessno + 1, 0.0, 0.0  # 전량 매도 → 새 세션
+    else:
+        return
+    await db.execute(ADD_AVG_COST, {"uno": uno, "seckey": seckey, "coinn": coinn, "sessno": sessno,
+                                    "buyamt": buyamt, "buyqty": buyqty})
+
+
+def replay_avg_cost(rows):
+    # 원장 행(userNo, linkNo, currency, regDate 순)을 다시 돌려 {(uno, linkNo, currency): {sessionNo: [buyAmt, buyQty]}}
+    sessions = {}
+    for row in rows:
+        key = (row.userNo, row.linkNo, row.currency)
+        entry = sessions.setdefault(key, {0: [0.0, 0.0]})
+        sessno = max(entry)
+        if row.remainAmt is not None and float(row.remainAmt) == 0:
+            sessno += 1
+            entry[sessno] = [0.0, 0.0]
+        if (row.changeType or "").startswith("BUY") and row.inAmt is not None:
+            entry[sessno][0] += float(row.unitPrice) * float(row.inAmt)
+            entry[sessno][1] += float(row.inAmt)
+    return sessions
+
+
+async def rebuild_avg_cost(db: AsyncSession, uno=None) -> int:
+    await db.execute(CREATE_AVG_COST_TABLE)
+    rows = (await db.execute(SELECT_LEDGER_FOR_AVG, {"uno": uno})).fetchall()
+    params = [{"uno": key[0], "seckey": key[1], "coinn": key[2], "sessno": sessno, "buyamt": amt, "buyqty": qty}
+              for key, entry in replay_avg_cost(rows).items() for sessno, (amt, qty) in entry.items()]
+    await db.execute(CLEAR_AVG_COST, {"uno": uno})
+    if params:
+        await db.execute(INSERT_AVG_COST, params)
+    await db.commit()
+    return len(params)
+
+
+async def rebuild_balances(db: AsyncSession, uno=None) -> int:
+    await db.execute(CREATE_BALANCE_TABLE)
+    await db.execute(CLEAR_BALANCES, {"uno": uno})
+    result = await db.execute(REBUILD_BALANCES, {"attxx": "%XXX%", "uno": uno})
+    await db.commit()
+    return result.rowcount
+
+
+async def _main(args):
+    engine = create_async_engine(os.getenv("dburl"))
+    try:
+        async with AsyncSession(engine) as db:
+            if args.command == "init":
+                await db.execute(CREATE_BALANCE_TABLE)
+                await db.execute(CREATE_AVG_COST_TABLE)
+                created = await ensure_logbook_index(db)
+                await db.commit()
+                print("trBalance, trAvgCost 테이블 생성 완료")
+                print(f"거래 로그 인덱스 {INDEX_NAME}: {'생성' if created else '이미 있음'}")
+            elif args.command == "rebuild":
+                count = await rebuild_balances(db, args.uno)
+                print(f"trBalance 재구성 완료: {count} rows")
+                count = await rebuild_avg_cost(db, args.uno)
+                print(f"trAvgCost 재구성 완료: {count} rows")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    dotenv.load_dotenv()
+    parser = argparse.ArgumentParser(description="현재 잔고/평균단가 테이블(trBalance, trAvgCost)과 거래 로그 인덱스 관리")
+    parser.add_argument("command", choices=["init", "rebuild"])
+    parser.add_argument("--uno", type=int, help="특정 사용자만 재구성")
+    asyncio.run(_main(parser.parse_args()))
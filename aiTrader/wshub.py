@@ -0,0 +1,164 @@
+import asyncio
+import json
+import logging
+import random
+import uuid
+from typing import Dict, Iterable, Set
+
+import websockets
+
+from aiTrader.upbitconf import ws_url
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """허브에서 받은 체결 틱을 한 구독자에게 전달하는 bounded 큐.
+
+    큐가 가득 차면 가장 오래된 틱을 버린다. 시세는 최신값만 의미가 있으므로
+    느린 구독자가 허브 전체를 막지 않도록 한다.
+    """
+
+    def __init__(self, hub, codes: Iterable[str], maxsize: int):
+        self.hub = hub
+        self.codes = set(codes)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def put(self, msg: dict):
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+            self.dropped += 1
+        self.queue.put_nowait(msg)
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        return await self.queue.get()
+
+
+class UpbitWsHub:
+    """업비트 웹소켓 업스트림 연결 하나를 여러 로컬 구독자가 공유하는 허브.
+
+    구독 중인 코드의 합집합으로 업스트림을 구독하고, 코드가 바뀌면 같은 연결에서 구독 메시지를 다시 보낸다.
+    연결이 끊기면 지수 백오프(+지터)로 재접속한다.
+    """
+
+    def __init__(self, uri: str = None, stream_type: str = "ticker", queue_size: int = 100,
+                 max_backoff: float = 30.0):
+        self.uri = uri or ws_url()
+        self.stream_type = stream_type
+        self.queue_size = queue_size
+        self.max_backoff = max_backoff
+        self._subs: Dict[str, Set[Subscription]] = {}
+        self._changed = asyncio.Event()
+        self._task = None
+
+    @property
+    def codes(self):
+        return sorted(self._subs)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len({sub for subs in self._subs.values() for sub in subs})
+
+    def subscribe(self, codes: Iterable[str], maxsize: int = None) -> Subscription:
+        sub = Subscription(self, codes, maxsize or self.queue_size)
+        new_code = False
+        for code in sub.codes:
+            if code not in self._subs:
+                self._subs[code] = set()
+                new_code = True
+            self._subs[code].add(sub)
+        if new_code:
+            self._changed.set()
+        self.start()
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        removed = False
+        for code in sub.codes:
+            subs = self._subs.get(code)
+            if subs is None:
+                continue
+            subs.discard(sub)
+            if not subs:
+                del self._subs[code]
+                removed = True
+        if removed:
+            self._changed.set()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _subscribe_message(self) -> str:
+        return json.dumps([
+            {"ticket": str(uuid.uuid4())},
+            {"type": self.stream_type, "codes": self.codes, "isOnlyRealtime": True},
+        ])
+
+    def _dispatch(self, msg: dict):
+        subs = self._subs.get(msg.get("code"))
+        if subs:
+            for sub in tuple(subs):
+                sub.put(msg)
+
+    async def _sender(self, ws):
+        # 구독 코드가 바뀔 때마다 같은 연결에서 합집합으로 다시 구독한다
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            if not self._subs:
+                await ws.close()
+                return
+            await ws.send(self._subscribe_message())
+
+    async def run(self):
+        backoff = 1.0
+        while True:
+            if not self._subs:
+                # 백오프 중 마지막 구독자가 나가면 이벤트가 set 된 채 남으므로 비우고 다시 기다린다 (바쁜 루프 방지)
+                await self._changed.wait()
+                self._changed.clear()
+                continue
+            self._changed.set()
+            sender = None
+            try:
+                async with websockets.connect(self.uri, ping_interval=60) as ws:
+                    sender = asyncio.create_task(self._sender(ws))
+                    async for data in ws:
+                        backoff = 1.0
+                        self._dispatch(json.loads(data))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("업비트 웹소켓 허브 연결 오류: %s (%.1f초 후 재접속)", e, backoff)
+            finally:
+                if sender is not None:
+                    sender.cancel()
+            if not self._subs:
+                continue
+            # 구독자가 남아 있는데 연결이 끊긴 경우에만 백오프 후 재접속
+            await asyncio.sleep(backoff + random.uniform(0, backoff / 2))
+            backoff = min(backoff * 2, self.max_backoff)
@@ -1,35 +1,53 @@
 import asyncio
 import time
 from typing import Dict
-import math
 import aiohttp
 from fastapi import FastAPI, Depends, Request, Form, Response, HTTPException, status, File, UploadFile
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.middleware.sessions import SessionMiddleware
 from fastapi.staticfiles import StaticFiles
 from starlette.exceptions import HTTPException as StarletteHTTPException
-from sqlalchemy import text
 import dotenv
 import os
-import requests
 import jinja2
 from datetime import datetime
-from aiTrader.vwmatrend import vwma_ma_cross_and_diff_noimage
+from aiTrader.vwmabatch import vwma_batch, stack_bars
+from aiTrader.analyticspool import AnalyticsExecutor
+from aiTrader.trendsnapshot import TrendSnapshot, build_snapshot, etag_matches
+from aiTrader.trendstream import TrendBroadcaster, snapshot_message
+from aiTrader.orderexec import execute_order
+from aiTrader.dbengine import make_engine, make_sessionmaker
+from aiTrader.queries import (SELECT_TREND_COINS, SELECT_SETUPS, SELECT_LOGIN, UPDATE_LAST_LOGIN,
+                              SELECT_OPEN_WALLET, CLOSE_WALLET, INSERT_INIT_AMOUNT, UPDATE_SETUP_KEY,
+                              UPDATE_SETUP_USE, DELETE_SETUP, INSERT_SETUP)
+from aiTrader.scheduler import StrategyScheduler
+from aiTrader import logbook
+from aiTrader.walletstore import SELECT_BALANCES, UPSERT_BALANCE, SELECT_AVG_BY_COIN, SELECT_AVG_PRICE
+from aiTrader.candlefetch import CandleFetcher
+from aiTrader.candlestore import CandleStore
+from aiTrader.candlearchive import CandleArchive, ArchiveCollector
 from aiTrader.cprice import all_cprice
+from aiTrader.pricecache import TickerCache
+from aiTrader.wshub import UpbitWsHub
+from aiTrader.upbitconf import api_base, api_url
+from aiTrader import metrics
+from aiTrader.tradeticks import TradeTickCollector
+from aiTrader.pricehistory import PriceHistory, PriceSampler
 from fastapi import WebSocket, WebSocketDisconnect
 import httpx
-import websockets
-import json
+import logging
+from aiTrader.logpipe import setup_logging, stop_logging, dropped_records
 
 dotenv.load_dotenv()
+setup_logging()
+logger = logging.getLogger("main")
 DATABASE_URL = os.getenv("dburl")
-engine = create_async_engine(DATABASE_URL, echo=True)
-async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+engine = make_engine(DATABASE_URL)
+metrics.instrument_engine(engine)
+async_session = make_sessionmaker(engine)
 
 app = FastAPI()
 
@@ -41,10 +59,30 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
 templates = Jinja2Templates(directory="templates")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-tradetrend: Dict = {}
+trend_snapshot: TrendSnapshot = build_snapshot({}, 0)
+trend_broadcaster = TrendBroadcaster()
+price_cache = TickerCache()
+price_hub = UpbitWsHub()
+price_history = PriceHistory()
+trade_ticks = TradeTickCollector(UpbitWsHub(stream_type="trade"), price_history=price_history)
+candle_fetcher = CandleFetcher()
+# 캔들 보관소는 candle_archive_dir 이 설정된 경우에만 쓴다 (트렌드 코인 x candle_archive_tfs 를 주기적으로 저장)
+candle_archive = CandleArchive(os.getenv("candle_archive_dir")) if os.getenv("candle_archive_dir") else None
+candle_store = CandleStore(candle_fetcher, capacity=150, archive=candle_archive)
+archive_collector = None
+if candle_archive is not None:
+    archive_collector = ArchiveCollector(
+        candle_archive, candle_fetcher,
+        lambda: [(market, tf) for market in sorted({m for m, _ in candle_store.rings})
+                 for tf in os.getenv("candle_archive_tfs", "1m").split(",")],
+        interval=float(os.getenv("candle_archive_interval", "60")))
+analytics = AnalyticsExecutor()
+trend_task = None
+trade_tick_task = None
 
 
 def format_currency(value):
@@ -54,6 +92,8 @@ def format_currency(value):
 
 
 templates.env.filters['currency'] = format_currency
+# 화면의 현재가 조회도 upbit_api_url 설정을 따른다
+templates.env.globals['upbit_api'] = api_base()
 
 
 # 데이터베이스 세션 생성
@@ -63,207 +103,141 @@ async def get_db():
 
 
 async def get_current_price():
-    server_url = "https://api.upbit.com"
-    params = {"quote_currencies": "KRW"}
-    res = requests.get(server_url + "/v1/ticker/all", params=params)
-    data = res.json()
-    result = []
-    for item in data:
-        market = item.get("market")
-        trade_price = item.get("trade_price")
-        if market and trade_price:
-            result.append({"market": market, "trade_price": trade_price})
-    return result
+    # 거래소를 직접 호출하지 않고 백그라운드에서 갱신되는 스냅샷을 읽는다
+    await price_cache.wait_ready()
+    prices, stale = price_cache.snapshot()
+    if stale:
+        logger.warning("현재가 스냅샷이 오래되었습니다: %.1f초 경과", price_cache.age())
+    return prices, stale
+
+
+def fresh_prices():
+    # 오래된 스냅샷은 가격 이력에 넣지 않는다
+    prices, stale = price_cache.snapshot()
+    return {} if stale else prices
+
+
+price_sampler = PriceSampler(price_history, fresh_prices)
+auto_trader = StrategyScheduler(async_session, candle_store, fresh_prices)
+metrics.ws_subscribers.callback = lambda: {
+    ("coinprice",): price_hub.subscriber_count,
+    ("tradetrend",): len(trend_broadcaster.subscribers),
+}
+metrics.REGISTRY.register(metrics.Counter("log_records_dropped_total", "로그 큐가 가득 차 버린 레코드 수",
+                                          callback=lambda: {(): dropped_records()}))
 
 
 async def get_krw_tickers():
-    url = "https://api.upbit.com/v1/market/all"
-    async with aiohttp.ClientSession() as session:
+    url = api_url("/v1/market/all")
+    async with aiohttp.ClientSession(trace_configs=[metrics.upbit_trace_config()]) as session:
         async with session.get(url) as resp:
             data = await resp.json()
             krw_tickers = [item for item in data if item['market'].startswith('KRW-')]
             return krw_tickers
 
 
+async def track_trade_ticks():
+    # 현재가 스냅샷의 KRW 마켓 전체를 trade 채널로 구독한다. 마켓 목록이 바뀌면 다시 구독
+    while True:
+        if await price_cache.wait_ready(timeout=30):
+            prices, _ = price_cache.snapshot()
+            if prices:
+                trade_ticks.start(prices)
+        await asyncio.sleep(600)
+
+
 async def update_tradetrend():
-    global tradetrend
+    global trend_snapshot
     while True:
         async for db in get_db():
+            cycle_started = time.perf_counter()
             try:
-                query = text("SELECT distinct (coinName) FROM polarisSets WHERE attrib not like :attxxx")
-                coinlist = await db.execute(query, {"attxxx": "%XXX%"})
+                coinlist = await db.execute(SELECT_TREND_COINS, {"attxxx": "%XXX%"})
                 coinlist = coinlist.fetchall()
-                now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 timeframes = ['1d', '4h', '1h', '30m', '3m', '1m']
                 result: Dict[str, Dict[str, dict]] = {}
 
+                # 코인 x 타임프레임 캔들 중 새로 생긴 봉만 요청 제한 안에서 동시에 받아 병합한다
+                rings = await candle_store.refresh_many(
+                    (coin[0], tf) for coin in coinlist for tf in timeframes)
                 for coin in coinlist:
+                    result[coin[0]] = {}
+                # 타임프레임별로 모든 코인을 (코인 x 봉) 행렬로 쌓아 한 번에 계산한다
+                for tf in timeframes:
+                    bars = {}
+                    for coin in coinlist:
+                        ring = rings[(coin[0], tf)]
+                        if isinstance(ring, Exception):
+                            metrics.trend_candle_errors.inc(timeframe=tf)
+                            logger.warning("코인트렌드 캔들 갱신 오류 %s %s: %s", tf, coin[0], ring)
+                            continue
+                        bars[coin[0]] = ring.arrays()
+                    if not bars:
+                        continue
                     try:
-                        result[coin[0]] = {}
-                        for tf in timeframes:
-                            try:
-                                df, reversal_points, reversal_distances, slope, angle_deg, delta_x = vwma_ma_cross_and_diff_noimage(
-                                    coin[0], 3, 35, 150, tf)
-                                if math.isinf(slope):
-                                    if slope > 0:
-                                        slope = 1e10
-                                    else:
-                                        slope = -1e10
-                                result[coin[0]][tf] = {
-                                    "slope": slope,
-                                    "angle_deg": angle_deg,
-                                    "reversal_count": len(reversal_points),
-                                    "reversal_distances": reversal_distances,
-                                    "deltax": delta_x
-                                }
-                                time.sleep(0.15)
-                            except Exception as e:
-                                print(f"코인트렌드 타임프레임 처리 중 오류 발생 {tf} for {coin[0]}: {str(e)}")
-                                continue
+                        with metrics.trend_refresh.time(timeframe=tf):
+                            markets, ts, price, volume = stack_bars(bars)
+                            # 계산은 프로세스 풀에서, 배열은 공유 메모리로 넘긴다
+                            trends = await analytics.run(vwma_batch, {"ts": ts, "price": price, "volume": volume},
+                                                         markets, short_window=3, long_window=35)
                     except Exception as e:
-                        print(f"코인트렌드 처리 중 오류 발생 {coin[0]}: {str(e)}")
+                        logger.error("코인트렌드 타임프레임 처리 중 오류 발생 %s: %s", tf, e)
                         continue
-
-                tradetrend = result
-                print(f"[{now}] tradetrend updated")
+                    for coin, trend in trends.items():
+                        if trend is not None:
+                            result[coin][tf] = trend
+
+                # 직렬화/신호등 HTML 은 발행 시 한 번만 만든다
+                old_snapshot = trend_snapshot
+                trend_snapshot = build_snapshot(result, old_snapshot.version + 1)
+                trend_broadcaster.publish(old_snapshot, trend_snapshot)
+                metrics.trend_cycle.observe(time.perf_counter() - cycle_started)
+                logger.info("tradetrend updated", extra={"version": trend_snapshot.version, "coins": len(result),
+                                                         "cycle_sec": round(time.perf_counter() - cycle_started, 3)})
             except Exception as e:
-                print(f"update_tradetrend 오류 발생: {str(e)}")
+                logger.exception("update_tradetrend 오류 발생: %s", e)
             finally:
                 await db.close()
         await asyncio.sleep(90)
 
 
-def get_signal_class(slope: float) -> dict:
-    if slope < -44.9:
-        return {'cls': 'black', 'label': '⚫'}
-    elif slope > 45:
-        return {'cls': 'black', 'label': '⚫'}
-    elif slope < 0:
-        return {'cls': 'red', 'label': '🔴'}
-    elif slope < 0.2:
-        return {'cls': 'orange', 'label': '🟠'}
-    else:
-        return {'cls': 'green', 'label': '🟢'}
-
-
-def make_signal_bulbs(tfs: dict) -> str:
-    bulbs = ""
-    tf_order = ['1d', '4h', '1h', '30m', '3m', '1m']
-    tf_label = {'1d': '1D', '4h': '4H', '1h': '1H', '30m': '30', '3m': '3', '1m': '1'}
-    for tf in tf_order:
-        if tf in tfs:
-            slope = tfs[tf]['slope']
-            sig = get_signal_class(slope)
-            bulbs += f'<span class="signal-bulb {sig["cls"]}" title="{tf}"></span>'
-    return bulbs
-
-
 async def buy_crypto(request, uno, coinn, price, volum, db: AsyncSession = Depends(get_db)):
-    global walletkrw, walletvolum
     try:
-        walletvolum = 0.0
-        costkrw = volum * price
-        costfee = costkrw * 0.0005
-        totalcost = costkrw + costfee
-        seckey = request.session.get("setupKey")
-        wallets = await get_current_balance(uno, db)
-        for wallet in wallets[0]:
-            if wallet[5] == "KRW":
-                walletkrw = wallet[9]
-            elif wallet[5] == coinn:
-                walletvolum = wallet[9]
-        if walletkrw < totalcost:
-            return False
-        else:
-            walletkrw = walletkrw - totalcost
-            sumvolum = walletvolum + volum
-            ctype = "BUY-" + coinn
-            query = text("UPDATE trWallet set attrib = :xxxup WHERE userNo = :uno and currency = :coin")
-            await db.execute(query, {"xxxup": 'XXXUPXXXUP', "uno": uno, "coin": "KRW"})
-            await db.commit()
-            query2 = text("INSERT INTO trWallet (userNo,changeType,currency,unitPrice,outAmt, remainAmt, linkNo) "
-                          "values (:uno, :ctype ,'KRW', 1 , :costkrw, :remkrw, :seckey)")
-            await db.execute(query2,
-                             {"uno": uno, "ctype": ctype, "costkrw": totalcost, "remkrw": walletkrw, "seckey": seckey})
-            await db.commit()
-            query4 = text("UPDATE trWallet set attrib = :xxxup WHERE userNo = :uno and currency = :coin")
-            await db.execute(query4, {"xxxup": 'XXXUPXXXUP', "uno": uno, "coin": coinn})
-            await db.commit()
-            query3 = text("INSERT INTO trWallet (userNo,changeType,currency,unitPrice,inAmt, remainAmt, linkNo) "
-                          "values (:uno, :ctype ,:coinn, :uprice, :inamt, :remamt, :seckey)")
-            await db.execute(query3, {"uno": uno, "ctype": ctype, "coinn": coinn, "uprice": price, "inamt": volum,
-                                      "remamt": sumvolum, "seckey": seckey})
-            await db.commit()
+        return await execute_order(db, uno, request.session.get("setupKey"), coinn, "BUY", price, volum)
     except Exception as e:
-        print("Error!!", e)
-    return True
+        logger.exception("매수 주문 오류: %s", e)
+        return False
 
 
 async def sell_crypto(request, uno, coinn, price, volum, db: AsyncSession = Depends(get_db)):
-    global walletkrw, walletvolum
     try:
-        walletvolum = 0.0
-        costkrw = volum * price
-        costfee = costkrw * 0.0005
-        totalcost = costkrw - costfee
-        seckey = request.session.get("setupKey")
-        wallets = await get_current_balance(uno, db)
-        for wallet in wallets[0]:
-            if wallet[5] == "KRW":
-                walletkrw = wallet[9]
-            elif wallet[5] == coinn:
-                walletvolum = wallet[9]
-        if walletvolum < volum:
-            return False
-        else:
-            walletkrw = walletkrw + totalcost
-            sumvolum = walletvolum - volum
-            ctype = "SELL-" + coinn
-            query = text("UPDATE trWallet set attrib = :xxxup WHERE userNo = :uno and currency = :coin")
-            await db.execute(query, {"xxxup": 'XXXUPXXXUP', "uno": uno, "coin": "KRW"})
-            await db.commit()
-            query2 = text("INSERT INTO trWallet (userNo,changeType,currency,unitPrice,inAmt, remainAmt, linkNo) "
-                          "values (:uno, :ctype ,'KRW', 1 , :costkrw, :remkrw, :seckey)")
-            await db.execute(query2,
-                             {"uno": uno, "ctype": ctype, "costkrw": totalcost, "remkrw": walletkrw, "seckey": seckey})
-            await db.commit()
-            query4 = text("UPDATE trWallet set attrib = :xxxup WHERE userNo = :uno and currency = :coin")
-            await db.execute(query4, {"xxxup": 'XXXUPXXXUP', "uno": uno, "coin": coinn})
-            await db.commit()
-            query3 = text("INSERT INTO trWallet (userNo,changeType,currency,unitPrice,outAmt, remainAmt, linkNo) "
-                          "values (:uno, :ctype ,:coinn, :uprice, :inamt, :remamt, :seckey)")
-            await db.execute(query3, {"uno": uno, "ctype": ctype, "coinn": coinn, "uprice": price, "inamt": volum,
-                                      "remamt": sumvolum, "seckey": seckey})
-            await db.commit()
+        return await execute_order(db, uno, request.session.get("setupKey"), coinn, "SELL", price, volum)
     except Exception as e:
-        print("Error!!", e)
-    return True
+        logger.exception("매도 주문 오류: %s", e)
+        return False
 
 
 async def get_current_balance(uno, db: AsyncSession = Depends(get_db)):
+    mycoins, coinprice, pricestale = [], {}, True
     try:
-        query = text("SELECT * FROM trWallet where userNo = :uno and attrib not like :attxx order by currency ")
-        result = await db.execute(query, {"uno": uno, "attxx": "%XXX%"})
+        result = await db.execute(SELECT_BALANCES, {"uno": uno})
         mycoins = result.fetchall()
-        coinprice = {}
-        gcprice = await get_current_price()
-        price_dict = {item['market']: item['trade_price'] for item in gcprice}
+        price_dict, pricestale = await get_current_price()
         for coin in mycoins:
-            if coin[5] != "KRW":
-                cprice = price_dict.get(coin[5], None)
+            if coin.currency != "KRW":
+                cprice = price_dict.get(coin.currency, None)
             else:
                 cprice = 1.0
-            coinprice[coin[5]] = cprice
+            coinprice[coin.currency] = cprice
     except Exception as e:
-        print("Error!!", e)
+        logger.exception("잔고 조회 오류 uno=%s: %s", uno, e)
     finally:
-        return mycoins, coinprice
+        return mycoins, coinprice, pricestale
 
 
 async def get_trsetups(uno, db: AsyncSession = Depends(get_db)):
     try:
-        query = text("SELECT * FROM polarisSets where userNo = :uno and attrib not like :attxx")
-        result = await db.execute(query, {"uno": uno, "attxx": "%XXX%"})
+        result = await db.execute(SELECT_SETUPS, {"uno": uno, "attxx": "%XXX%"})
         mysetups = result.fetchall()
         mysets = []
         for setup in mysetups:
@@ -276,51 +250,34 @@ async def get_trsetups(uno, db: AsyncSession = Depends(get_db)):
                 "useYN": setup[6],
             })
     except Exception as e:
-        print("Get Setup Error!!", e)
+        logger.exception("설정 조회 오류 uno=%s: %s", uno, e)
         raise HTTPException(status_code=500, detail="Internal Server Error")
-    finally:
-        print(mysets)
+    logger.debug("setups uno=%s %s", uno, mysets)
     return mysets
 
 
-async def get_logbook(request, uno, coinn, db: AsyncSession = Depends(get_db)):
-    global mylogs
-    try:
-        query = text(
-            "SELECT changeType, currency,unitPrice,inAmt,outAmt,remainAmt,regDate FROM trWallet where userNo = :uno and currency = :coinn and linkNo = :seckey order by regDate ")
-        result = await db.execute(query, {"uno": uno, "coinn": coinn, "seckey": request.session.get("setupKey")})
-        rows = result.fetchall()
-        columns = result.keys()
-        data = [dict(zip(columns, row)) for row in rows]
-        return jsonable_encoder(data)
-    except Exception as e:
-        print("Error!!", e)
+async def get_logbook(request, uno, coinn, limit, cursor, db: AsyncSession = Depends(get_db)):
+    # 한 페이지와 다음 커서 (aiTrader/logbook.py)
+    return await logbook.fetch_page(db, uno, request.session.get("setupKey"), coinn, limit, cursor)
 
 
 async def get_avg_price(uno, setkey, coinn, db: AsyncSession = Depends(get_db)):
     try:
-        query = text(
-            "SELECT linkNo, regDate, changeType, currency, unitPrice, inAmt, outAmt, remainAmt, session_id, IFNULL(누적매수금액 / NULLIF(누적매수수량,0), 0) AS 매수평균단가 FROM "
-            "(SELECT *,SUM(CASE WHEN changeType LIKE 'BUY%' THEN unitPrice * inAmt ELSE 0 END) OVER (PARTITION BY session_id ORDER BY regDate, linkNo ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS 누적매수금액,SUM(CASE WHEN changeType LIKE 'BUY%' THEN inAmt ELSE 0 END) OVER (PARTITION BY session_id ORDER BY regDate, linkNo ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS 누적매수수량 "
-            "FROM ( SELECT *, SUM(is_zero) OVER (ORDER BY regDate, linkNo ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS session_id "
-            "FROM ( SELECT *, CASE WHEN remainAmt = 0 THEN 1 ELSE 0 END AS is_zero FROM trWallet WHERE currency = :coinn and userNo = :uno ORDER BY regDate, linkNo ) t1 ) t2 ) t3 WHERE linkNo = :linkno ORDER BY regDate DESC, linkNo DESC LIMIT 1")
-        result = await db.execute(query, {"coinn": coinn, "linkno": setkey, "uno": uno})
+        result = await db.execute(SELECT_AVG_PRICE, {"uno": uno, "seckey": setkey, "coinn": coinn})
         mycoin = result.fetchone()
         return mycoin
     except Exception as e:
-        print("Error!!", e)
+        logger.exception("평균단가 조회 오류 uno=%s: %s", uno, e)
         return None
 
 
 async def get_avg_by_coin(uno, setkey, db: AsyncSession = Depends(get_db)):
     try:
-        query = text(
-            "SELECT currency,IFNULL(누적매수금액 / NULLIF(누적매수수량,0), 0) AS avg_price FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY currency ORDER BY regDate DESC, linkNo DESC) AS rn,SUM(CASE WHEN changeType LIKE 'BUY%' THEN unitPrice * inAmt ELSE 0 END) OVER (PARTITION BY currency, session_id ORDER BY regDate, linkNo ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS 누적매수금액, SUM(CASE WHEN changeType LIKE 'BUY%' THEN inAmt ELSE 0 END)                OVER (PARTITION BY currency, session_id ORDER BY regDate, linkNo ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS 누적매수수량    FROM (        SELECT *,               SUM(is_zero) OVER (PARTITION BY currency ORDER BY regDate, linkNo ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS session_id FROM ( SELECT *, CASE WHEN remainAmt = 0 THEN 1 ELSE 0 END AS is_zero FROM trWallet WHERE userNo = :uno and linkNo = :linkno ORDER BY regDate, linkNo ) t1 ) t2) t3 WHERE rn = 1")
-        result = await db.execute(query, {"uno": uno, "linkno": setkey})
+        result = await db.execute(SELECT_AVG_BY_COIN, {"uno": uno, "seckey": setkey})
         rows = result.fetchall()
         return {row.currency: round(float(row.avg_price), 2) for row in rows}
     except Exception as e:
-        print(e)
+        logger.exception("코인별 평균단가 조회 오류 uno=%s: %s", uno, e)
         return {}
 
 
@@ -342,10 +299,37 @@ async def private_page(request: Request, user_session: int = Depends(require_log
 
 @app.on_event("startup")
 async def startup_event():
-    # asyncio.create_task(update_tradetrend())
+    global trend_task, trade_tick_task
+    price_cache.start()
+    price_sampler.start()
+    # 자동매매는 운영자가 auto_trade=Y 로 켠 경우에만 (기본으로 켜면 배포 즉시 모든 사용 중 설정에 주문이 나간다)
+    if os.getenv("auto_trade", "N") == "Y":
+        auto_trader.start()
+    trend_task = asyncio.create_task(update_tradetrend())
+    trade_tick_task = asyncio.create_task(track_trade_ticks())
+    if archive_collector is not None:
+        archive_collector.start()
     return True
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await price_cache.stop()
+    await price_sampler.stop()
+    await auto_trader.stop()
+    await price_hub.stop()
+    if trend_task is not None:
+        trend_task.cancel()
+    if trade_tick_task is not None:
+        trade_tick_task.cancel()
+    await trade_ticks.stop()
+    if archive_collector is not None:
+        await archive_collector.stop()
+    await candle_fetcher.close()
+    await asyncio.to_thread(analytics.shutdown)
+    stop_logging()
+
+
 @app.get("/")
 async def login_form(request: Request):
     if request.session.get("user_No"):
@@ -367,15 +351,12 @@ async def initrade(request: Request, uno: int, user_session: int = Depends(requi
 @app.post("/loginchk")
 async def login(request: Request, response: Response, uid: str = Form(...), upw: str = Form(...),
                 db: AsyncSession = Depends(get_db)):
-    query = text(
-        "SELECT userNo, userName, userRole, setupKey FROM trUser WHERE userId = :username AND userPasswd = password(:password)")
-    result = await db.execute(query, {"username": uid, "password": upw})
+    result = await db.execute(SELECT_LOGIN, {"username": uid, "password": upw})
     user = result.fetchone()
     if user is None:
         return templates.TemplateResponse("login/login.html", {"request": request, "error": "Invalid credentials"})
     else:
-        queryu = text("UPDATE trUser SET lastLogin = now() WHERE userId = :username")
-        await db.execute(queryu, {"username": uid})
+        await db.execute(UPDATE_LAST_LOGIN, {"username": uid})
         await db.commit()
     # 서버 세션에 사용자 ID 저장
     request.session["user_No"] = user[0]
@@ -399,18 +380,13 @@ async def init_balance(request: Request, uno: int, iniamt: float, db: AsyncSessi
         "success": False,
     }
     try:
-        query0 = text(f"SELECT * FROM trWallet WHERE userNo = :uno and attrib not like :attxx")
-        selres = await db.execute(query0, {"uno": uno, "attxx": "%XXX%"})
+        selres = await db.execute(SELECT_OPEN_WALLET, {"uno": uno, "attxx": "%XXX%"})
         if selres.rowcount > 0:
-            query = text(f"UPDATE trWallet set attrib = :attset WHERE userNo = :uno")
-            await db.execute(query, {"attset": "XXXUPXXXUP", "uno": uno})
+            await db.execute(CLOSE_WALLET, {"attset": "XXXUPXXXUP", "uno": uno})
         seckey = datetime.now().strftime("%Y%m%d%H%M%S")
-        query2 = text(f"INSERT INTO trWallet (userNo,changeType,currency,unitPrice,inAmt, remainAmt, linkNo) "
-                      "values (:uno, 'INITAMT','KRW', '1.0', :inamt, :inamt1, :seckey)")
-        await db.execute(query2, {"uno": uno, "inamt": iniamt, "inamt1": iniamt, "seckey": seckey})
-        await db.commit()
-        query3 = text(f"UPDATE trUser set setupKey = :seckey WHERE userNo = :uno and attrib not like :attxx")
-        await db.execute(query3, {"seckey": seckey, "uno": uno, "attxx": '%XXX%'})
+        await db.execute(INSERT_INIT_AMOUNT, {"uno": uno, "inamt": iniamt, "inamt1": iniamt, "seckey": seckey})
+        await db.execute(UPSERT_BALANCE, {"uno": uno, "seckey": seckey, "coinn": "KRW", "remamt": iniamt})
+        await db.execute(UPDATE_SETUP_KEY, {"seckey": seckey, "uno": uno, "attxx": '%XXX%'})
         await db.commit()
         mycoins = await get_current_balance(uno, db)
         result = {
@@ -420,7 +396,7 @@ async def init_balance(request: Request, uno: int, iniamt: float, db: AsyncSessi
             "user_Name": request.session.get("user_Name"),
         }
     except Exception as e:
-        print("Init Error !!", e)
+        logger.exception("잔고 초기화 오류 uno=%s: %s", uno, e)
         mycoins = ([], {})
         result = {
             "success": False,
@@ -441,15 +417,15 @@ async def my_balance(request: Request, uno: int, user_session: int = Depends(req
     try:
         mycoins = await get_current_balance(uno, db)
         myavgp = await get_avg_by_coin(uno, request.session.get("setupKey"), db)
-        print(myavgp)
+        logger.debug("avg prices uno=%s %s", uno, myavgp)
     except Exception as e:
-        print("Init Error !!", e)
+        logger.exception("잔고 화면 오류 uno=%s: %s", uno, e)
         mycoins = None
     usern = request.session.get("user_Name")
     return templates.TemplateResponse("wallet/mywallet.html",
                                       {"request": request, "userNo": uno, "user_Name": usern, "mycoins": mycoins[0],
                                        "myavgp": myavgp,
-                                       "coinprice": mycoins[1]})
+                                       "coinprice": mycoins[1], "pricestale": mycoins[2]})
 
 
 @app.get("/balancecrypto/{uno}/{coinn}")
@@ -462,11 +438,11 @@ async def my_balance(request: Request, uno: int, coinn: str, user_session: int =
         mycoins = await get_current_balance(uno, db)
         myavgp = await get_avg_by_coin(uno, request.session.get("setupKey"), db)
         for coin in mycoins[0]:
-            if coin[5] == coinn:
-                mycoin[coin[5]] = coin[9]
-                mycoin["avgPrice"] = myavgp.get(coin[5], 0)
+            if coin.currency == coinn:
+                mycoin[coin.currency] = coin.remainAmt
+                mycoin["avgPrice"] = myavgp.get(coin.currency, 0)
     except Exception as e:
-        print("Init Error !!", e)
+        logger.exception("코인 잔고 조회 오류 uno=%s: %s", uno, e)
         mycoin = None
     return mycoin
 
@@ -482,7 +458,7 @@ async def tradecenter(request: Request, uno: int, user_session: int = Depends(re
         mycoins = await get_current_balance(uno, db)
         coinlist = await get_krw_tickers()
     except Exception as e:
-        print("Init Error !!", e)
+        logger.exception("거래 화면 오류 uno=%s: %s", uno, e)
     usern = request.session.get("user_Name")
     setkey = request.session.get("setupKey")
     return templates.TemplateResponse("trade/mytrade.html",
@@ -511,7 +487,7 @@ async def tradebuymarket(
             # 거래 실패
             return JSONResponse({"success": False, "message": "거래 실패", "redirect": "/tradecenter"})
     except Exception as e:
-        print("Error!!", e)
+        logger.exception("매수 처리 오류 uno=%s: %s", uno, e)
         return JSONResponse({"success": False, "message": "서버 오류", "redirect": "/tradecenter"})
 
 
@@ -529,7 +505,7 @@ async def tradesellmarket(request: Request, uno: int, coinn: str, cprice: float,
             # 거래 실패
             return JSONResponse({"success": False, "message": "거래 실패", "redirect": "/tradecenter"})
     except Exception as e:
-        print("Error!!", e)
+        logger.exception("매도 처리 오류 uno=%s: %s", uno, e)
         return JSONResponse({"success": False, "message": "서버 오류", "redirect": "/tradecenter"})
 
 
@@ -542,7 +518,7 @@ async def tradelogbook(request: Request, uno: int, user_session: int = Depends(r
     try:
         mycoins = await get_current_balance(uno, db)
     except Exception as e:
-        print("Init Error !!", e)
+        logger.exception("거래 로그 화면 오류 uno=%s: %s", uno, e)
     usern = request.session.get("user_Name")
     setkey = request.session.get("setupKey")
     return templates.TemplateResponse("trade/tradelog.html",
@@ -551,17 +527,29 @@ async def tradelogbook(request: Request, uno: int, user_session: int = Depends(r
 
 
 @app.get("/gettradelog/{uno}/{coinn}")
-async def gettradelog(request: Request, uno: int, coinn: str, user_session: int = Depends(require_login),
-                      db: AsyncSession = Depends(get_db)):
-    mylogs = None
+async def gettradelog(request: Request, uno: int, coinn: str, limit: int = logbook.PAGE_SIZE, cursor: str = None,
+                      user_session: int = Depends(require_login), db: AsyncSession = Depends(get_db)):
+    # (regDate, 키 컬럼) 키셋 페이지. next_cursor 를 cursor 로 넘기면 다음 페이지, null 이면 끝
     if uno != user_session:
         return RedirectResponse(url="/", status_code=303)
     try:
-        mylogs = await get_logbook(request, uno, coinn, db)
-        print(mylogs)
-        return JSONResponse({"success": True, "data": mylogs})
+        mylogs, next_cursor = await get_logbook(request, uno, coinn, limit, cursor, db)
+        logger.debug("trade logs uno=%s %s rows, next %s", uno, len(mylogs), next_cursor)
+        return JSONResponse({"success": True, "data": mylogs, "next_cursor": next_cursor})
+    except ValueError:
+        return JSONResponse({"success": False, "message": "잘못된 cursor"}, status_code=400)
     except Exception as e:
-        print("Get Log Error !!", e)
+        logger.exception("거래 로그 조회 오류 uno=%s: %s", uno, e)
+        return JSONResponse({"success": False, "message": "서버 오류"}, status_code=500)
+
+
+@app.get("/gettradelog/{uno}/{coinn}/stream")
+async def gettradelog_stream(request: Request, uno: int, coinn: str, user_session: int = Depends(require_login)):
+    # 전체 거래 로그를 NDJSON (한 줄에 한 행) 으로 흘려보낸다. 세션은 스트림 안에서 따로 연다
+    if uno != user_session:
+        return RedirectResponse(url="/", status_code=303)
+    return StreamingResponse(logbook.stream_rows(async_session, uno, request.session.get("setupKey"), coinn),
+                             media_type="application/x-ndjson")
 
 
 @app.get("/tradestatus/{uno}")
@@ -575,7 +563,7 @@ async def tradestatus(request: Request, uno: int, user_session: int = Depends(re
         mycoins = await get_current_balance(uno, db)
         coinlist = await get_krw_tickers()
     except Exception as e:
-        print("Init Error !!", e)
+        logger.exception("거래 현황 화면 오류 uno=%s: %s", uno, e)
     usern = request.session.get("user_Name")
     setkey = request.session.get("setupKey")
     return templates.TemplateResponse("trade/tradestat.html",
@@ -583,9 +571,20 @@ async def tradestatus(request: Request, uno: int, user_session: int = Depends(re
                                        "coinprice": mycoins[1], "setkey": setkey, "coinlist": coinlist})
 
 
+def snapshot_response(request: Request, body: bytes, etag: str, media_type: str, version: int = None) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if version is not None:
+        # /ws/tradetrend 의 delta base 와 맞춰 보도록 스냅샷 버전을 함께 준다
+        headers["X-Trend-Version"] = str(version)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
 @app.get("/tradetrend")
-async def get_tradetrend():
-    return tradetrend
+async def get_tradetrend(request: Request):
+    snap = trend_snapshot
+    return snapshot_response(request, snap.json_bytes, snap.etag, "application/json", snap.version)
 
 
 @app.get("/tradesignal")
@@ -598,69 +597,88 @@ async def get_tradesignal(request: Request):
 
 
 @app.get("/tsignal/{coinn}", response_class=HTMLResponse)
-async def tsignal(coinn: str):
+async def tsignal(request: Request, coinn: str):
     coin = coinn.upper()
-    if coin not in tradetrend:
+    bulbs = trend_snapshot.bulbs.get(coin)
+    if bulbs is None:
         raise HTTPException(status_code=404, detail="Coin not found")
-    bulbs_html = make_signal_bulbs(tradetrend[coin])
-    style = """
-    <style>
-    .signal-bulb {
-    display: inline-block;
-    width: 15px;
-    height: 15px;
-    border-radius: 50%;
-    margin: 0 2px;
-    text-align: center;
-    line-height: 15px;   /* 폰트와 동일하게 */
-    font-weight: bold;
-    font-size: 15px;     /* 폰트와 동일하게 */
-    vertical-align: middle;
-    position: relative;
-    }
-    .signal-bulb .tf-label {
-    display: block;
-    font-size: 9px;
-    color: #333;
-    font-weight: normal;
-    line-height: 12px;
-    margin-top: -4px;
-    }
-    .signal-bulb.black { background: #222; color: #fff;}
-    .signal-bulb.red { background: #e7505a; }
-    .signal-bulb.orange { background: #f7ca18; color: #333;}
-    .signal-bulb.green { background: #26c281; }
-    </style>
-    """
-    return style + bulbs_html
+    html, etag = bulbs
+    return snapshot_response(request, html, etag, "text/html; charset=utf-8")
+
+
+@app.websocket("/ws/tradetrend")
+async def tradetrend_ws(websocket: WebSocket):
+    await websocket.accept()
+    # 구독과 스냅샷 읽기 사이에 await 가 없으므로 이후 delta 는 모두 이 스냅샷 기준이다
+    sub = trend_broadcaster.subscribe()
+    snap = trend_snapshot
+    try:
+        await websocket.send_text(snapshot_message(snap))
+        while True:
+            message = await sub.get()
+            if message is None:
+                # 전송이 밀린 느린 클라이언트. 다시 접속하면 전체 스냅샷부터 받는다
+                await websocket.close(code=1013)
+                break
+            await websocket.send_text(message)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error("TradeTrend WebSocket 오류: %s", e)
+    finally:
+        trend_broadcaster.unsubscribe(sub)
+
+
+@app.get("/tradestrength/{coinn}")
+async def trade_strength(coinn: str, windows: str = "10,50,100"):
+    # 최근 체결 틱 기준 체결강도. 틱은 trade 채널에서 계속 쌓이므로 조회는 네트워크 없이 창마다 O(1)
+    ring = trade_ticks.ring(coinn)
+    if ring is None:
+        raise HTTPException(status_code=404, detail=f"체결 데이터 없음: {coinn}")
+    try:
+        sizes = [min(max(int(w), 1), ring.capacity) for w in windows.split(",") if w]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="windows 는 쉼표로 구분한 정수")
+    return {"market": coinn, "windows": [ring.strength(w) for w in sizes], "dropped": trade_ticks.dropped}
+
+
+@app.get("/autotrade")
+async def autotrade_status():
+    return auto_trader.status()
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/movers")
+async def movers(k: int = 6, n: int = 10):
+    # 최근 k 샘플(기본 10초 간격) 동안 변화율 상위/하위 마켓
+    k = max(1, min(k, price_history.size - 1))
+    gainers, losers = price_history.top_movers(k, max(1, n))
+    return {"k": k, "seconds": price_history.span(k), "gainers": gainers, "losers": losers}
 
 
 @app.websocket("/ws/coinprice/{coinn}")
 async def coin_price_ws(websocket: WebSocket, coinn: str, db: AsyncSession = Depends(get_db)):
     await websocket.accept()
+    sub = price_hub.subscribe([coinn])
     try:
-        async for current_price in upbit_ws_price_stream(coinn):
+        async for current_price in upbit_ws_price_stream(sub):
             await websocket.send_json({"coinn": coinn, "current_price": current_price})
     except WebSocketDisconnect:
-        print(f"WebSocket disconnected: coin {coinn}")
+        logger.info("WebSocket disconnected: coin %s", coinn)
     except Exception as e:
-        print("WebSocket Error:", e)
-
-async def upbit_ws_price_stream(market: str):
-    uri = "wss://api.upbit.com/websocket/v1"
-    subscribe_data = [{
-        "ticket": "test",
-    }, {
-        "type": "ticker",
-        "codes": [market],
-        "isOnlyRealtime": True
-    }]
-    async with websockets.connect(uri, ping_interval=60) as websocket:
-        await websocket.send(json.dumps(subscribe_data))
-        while True:
-            data = await websocket.recv()
-            parsed = json.loads(data)
-            yield parsed['trade_price']  # 실시간 체결가
+        logger.error("WebSocket 오류: %s", e)
+    finally:
+        sub.close()
+
+
+async def upbit_ws_price_stream(sub):
+    # 업스트림 연결은 price_hub 하나만 유지하고 구독 큐에서 틱을 꺼낸다
+    async for parsed in sub:
+        yield parsed['trade_price']  # 실시간 체결가
 
 
 @app.get("/tradesetup/{uno}")
@@ -687,7 +705,7 @@ async def get_tradesetup(request: Request, uno: int, user_session: int = Depends
             "setups": setups
         })
     except Exception as e:
-        print("Init Error !!", e)
+        logger.exception("설정 화면 오류 uno=%s: %s", uno, e)
         return templates.TemplateResponse(
             "trade/tradesetup.html",
             {
@@ -706,8 +724,7 @@ async def update_setuponoff(uno: int, setupno: int, onoff: str, user_session: in
                             db: AsyncSession = Depends(get_db)):
     if uno != user_session:
         return RedirectResponse(url="/", status_code=303)
-    query = text("UPDATE polarisSets SET useYN = :onoff WHERE setupNo = :setupno")
-    await db.execute(query, {"onoff": onoff, "setupno": setupno})
+    await db.execute(UPDATE_SETUP_USE, {"onoff": onoff, "setupno": setupno})
     await db.commit()
     return RedirectResponse(url=f"/tradesetup/{uno}", status_code=303)
 
@@ -716,8 +733,7 @@ async def update_setupdel(uno: int, setupno: int, user_session: int = Depends(re
                             db: AsyncSession = Depends(get_db)):
     if uno != user_session:
         return RedirectResponse(url="/", status_code=303)
-    query = text(f"UPDATE polarisSets set attrib = :attx WHERE setupNo = {setupno}")
-    await db.execute(query, {"attx": "XXXUPXXXUP"})
+    await db.execute(DELETE_SETUP, {"attx": "XXXUPXXXUP", "setupno": setupno})
     await db.commit()
     return RedirectResponse(url=f"/tradesetup/{uno}", status_code=303)
 
@@ -726,8 +742,6 @@ async def insert_setup(uno: int, coinn: str, setamont: float, user_session: int
                             db: AsyncSession = Depends(get_db)):
     if uno != user_session:
         return RedirectResponse(url="/", status_code=303)
-    query = text(f"INSERT INTO polarisSets (userNo,coinName,stepAmt,maxAmt) "
-                  "values (:uno, :coinn ,:setamt, :maxamt)")
-    await db.execute(query, {"uno": uno, "coinn": coinn, "setamt": setamont, "maxamt": setamont})
+    await db.execute(INSERT_SETUP, {"uno": uno, "coinn": coinn, "setamt": setamont, "maxamt": setamont})
     await db.commit()
     return RedirectResponse(url=f"/tradesetup/{uno}", status_code=303)
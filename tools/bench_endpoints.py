@@ -0,0 +1,320 @@
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+import uvicorn
+import websockets
+from sqlalchemy import event, text
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tools.fakeupbit import make_app, start_server
+from tools.loadtest_db import metadata, percentiles
+
+
+# FastAPI 엔드포인트 종단 간 벤치마크.
+# 가짜 업비트(tools/fakeupbit.py)와 로컬 DB 를 띄우고 main.app 을 uvicorn 으로 같은 프로세스에서 실행한 뒤
+# 로그인 -> 잔고/코인잔고 -> 매수/매도 -> 거래로그 -> /ws/coinprice 를 차례로 부하를 주고 JSON 으로 보고한다.
+# 엔드포인트마다 req/s, p50/p95/p99, 요청당 DB 쿼리 수 (before_cursor_execute 로 센다).
+#   python tools/bench_endpoints.py --users 20 --concurrency 16 --duration 5 --out bench.json
+# DB 는 기본이 임시 SQLite 파일이다. MySQL/MariaDB 로 재려면 --dburl mysql+asyncmy://... (빈 테이블에 사용자를 만든다)
+# SQLite 에서는 앱의 MySQL 구문(password(), now(), FOR UPDATE, ON DUPLICATE KEY UPDATE)을 실행 직전에 바꿔 준다.
+
+PASSWORD = "benchpw"
+COIN = "KRW-BTC"
+SELL_STOCK = 8000  # 매도 구간 전에 사용자마다 준비하는 매도 횟수분 코인 (1회 약 2,500원, 합계 약 2천만원)
+
+request_queries: contextvars.ContextVar = contextvars.ContextVar("request_queries", default=None)
+
+
+class QueryCounter:
+    """요청 하나에서 실행된 DB 쿼리 수를 경로 첫 구간(/balance, /tradebuymarket ...)별로 모으는 ASGI 래퍼."""
+
+    def __init__(self, app):
+        self.app = app
+        self.totals = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        box = [0]
+        token = request_queries.set(box)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_queries.reset(token)
+            key = "/" + scope["path"].split("/")[1]
+            total = self.totals.setdefault(key, [0, 0])
+            total[0] += 1
+            total[1] += box[0]
+
+    def reset(self):
+        self.totals = {}
+
+    def per_request(self, key: str):
+        requests, queries = self.totals.get(key, (0, 0))
+        return round(queries / requests, 2) if requests else None
+
+
+def count_queries(engine):
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        box = request_queries.get()
+        if box is not None:
+            box[0] += 1
+
+
+UPSERT = re.compile(r"ON DUPLICATE KEY UPDATE (.*)$", re.S)
+
+
+def mysql_to_sqlite(statement: str) -> str:
+    statement = statement.replace(" FOR UPDATE", "")
+    match = UPSERT.search(statement)
+    if match:
+        statement = (statement[:match.start()] + "ON CONFLICT DO UPDATE SET "
+                     + re.sub(r"VALUES\((\w+)\)", r"excluded.\1", match.group(1)))
+    return statement
+
+
+def sqlite_compat(engine):
+    @event.listens_for(engine.sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        dbapi_connection.create_function("password", 1, lambda value: value)
+        dbapi_connection.create_function("now", 0, lambda: datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout=10000")
+        cursor.close()
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute", retval=True)
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        return mysql_to_sqlite(statement), parameters
+
+
+async def seed_users(engine, users: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.create_all)
+        await conn.execute(text("DELETE FROM trUser WHERE userId like 'bench%'"))
+        for uno in range(1, users + 1):
+            await conn.execute(text("INSERT INTO trUser (userNo, userName, userRole, userId, userPasswd) "
+                                    "VALUES (:uno, :uid, 'user', :uid, password(:pw))"),
+                               {"uno": uno, "uid": f"bench{uno}", "pw": PASSWORD})
+
+
+class BenchUser:
+    def __init__(self, base_url: str, uno: int):
+        self.uno = uno
+        self.client = httpx.AsyncClient(base_url=base_url, follow_redirects=False, timeout=30)
+
+    async def login(self):
+        return await self.client.post("/loginchk", data={"uid": f"bench{self.uno}", "upw": PASSWORD})
+
+
+async def run_load(name, users, request, concurrency: int, duration: float, counter: QueryCounter, route: str):
+    # request(user) -> 성공 여부. 지정 시간 동안 concurrency 개 워커가 사용자들을 돌아가며 요청한다
+    latencies, failed, errors = [], 0, []
+    counter.reset()
+
+    async def worker(i):
+        nonlocal failed
+        user = users[i % len(users)]
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                ok = await request(user)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+                continue
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                failed += 1
+
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    report = {"requests": len(latencies), "failed": failed, "errors": len(errors),
+              "req_per_sec": round(len(latencies) / elapsed, 1), **percentiles(latencies),
+              "db_queries_per_request": counter.per_request(route)}
+    if errors:
+        report["first_error"] = errors[0]
+    print(f"[bench] {name}: {report['req_per_sec']} req/s p95 {report.get('p95_ms')} ms", file=sys.stderr)
+    return report
+
+
+async def run_ws(base_ws: str, clients: int, duration: float) -> dict:
+    # /ws/coinprice 구독자 clients 개. 첫 메시지까지 시간과 전체 수신 속도
+    first, counts = [], [0] * clients
+
+    async def client(i):
+        started = time.perf_counter()
+        async with websockets.connect(f"{base_ws}/ws/coinprice/{COIN}") as ws:
+            await ws.recv()
+            first.append(time.perf_counter() - started)
+            counts[i] += 1
+            try:
+                while True:
+                    await ws.recv()
+                    counts[i] += 1
+            except asyncio.CancelledError:
+                pass
+
+    tasks = [asyncio.create_task(client(i)) for i in range(clients)]
+    await asyncio.sleep(duration)
+    for task in tasks:
+        task.cancel()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    errors = [r for r in results if isinstance(r, Exception) and not isinstance(r, asyncio.CancelledError)]
+    report = {"clients": clients, "connected": len(first), "errors": len(errors),
+              "messages_per_sec": round(sum(counts) / duration, 1),
+              "first_message": percentiles(first)}
+    if errors:
+        report["first_error"] = repr(errors[0])
+    return report
+
+
+async def bench(args):
+    fake = make_app(ws_rate=args.ws_rate, seed=0, latency_ms=args.upbit_latency_ms)
+    fake_runner, fake_port = await start_server(fake)
+    os.environ["upbit_api_url"] = f"http://127.0.0.1:{fake_port}"
+    os.environ["upbit_ws_url"] = f"ws://127.0.0.1:{fake_port}/websocket/v1"
+    os.environ["auto_trade"] = "N"
+    tmpdir = None
+    if not args.dburl:
+        tmpdir = tempfile.mkdtemp(prefix="bench_")
+        args.dburl = f"sqlite+aiosqlite:///{tmpdir}/bench.db"
+    os.environ["dburl"] = args.dburl
+    os.chdir(ROOT)  # main.py 는 templates/, static/ 을 상대 경로로 연다
+
+    import main
+    if main.engine.dialect.name == "sqlite":
+        sqlite_compat(main.engine)
+    count_queries(main.engine)
+    await seed_users(main.engine, args.users)
+
+    counter = QueryCounter(main.app)
+    config = uvicorn.Config(counter, host="127.0.0.1", port=0, lifespan="on", log_level="warning",
+                            access_log=False, ws="websockets")
+    server = uvicorn.Server(config)
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    base = f"http://127.0.0.1:{port}"
+    users = [BenchUser(base, uno) for uno in range(1, args.users + 1)]
+    price = lambda: round(fake["market"].curve(COIN, time.time()), 4)
+    # 매수 1회 = 1만원어치, 매도 1회 = 그 1/4
+    buy_volum = lambda: round(10000 / price(), 8)
+    try:
+        await main.price_cache.wait_ready(timeout=10)
+        for user in users:
+            await user.login()
+            await user.client.post(f"/balanceinit/{user.uno}/{args.init_amount}")
+
+        async def login(user):
+            resp = await user.login()
+            return resp.status_code == 303 and resp.headers.get("location", "").startswith("/balance/")
+
+        async def balance(user):
+            resp = await user.client.get(f"/balance/{user.uno}")
+            return resp.status_code == 200
+
+        async def balancecrypto(user):
+            resp = await user.client.get(f"/balancecrypto/{user.uno}/KRW")
+            return resp.status_code == 200 and resp.json() is not None
+
+        async def buy(user):
+            resp = await user.client.post(f"/tradebuymarket/{user.uno}/{COIN}/{price()}/{buy_volum()}")
+            return resp.status_code == 200 and resp.json().get("success")
+
+        # 매도는 고정 수량. 매수 구간의 결과(사용자별 체결 수)에 따라 실패율이 달라지지 않도록
+        # 매도 구간 직전에 사용자마다 SELL_STOCK 회분의 코인을 한 번에 사 둔다
+        sell_volum = round(buy_volum() / 4, 8)
+
+        async def seed_holdings():
+            for user in users:
+                resp = await user.client.post(
+                    f"/tradebuymarket/{user.uno}/{COIN}/{price()}/{sell_volum * SELL_STOCK:.8f}")
+                if not (resp.status_code == 200 and resp.json().get("success")):
+                    raise RuntimeError(f"매도용 코인 준비 실패 user={user.uno}: {resp.status_code} {resp.text[:200]}")
+
+        async def sell(user):
+            resp = await user.client.post(f"/tradesellmarket/{user.uno}/{COIN}/{price()}/{sell_volum:.8f}")
+            return resp.status_code == 200 and resp.json().get("success")
+
+        async def tradelog(user):
+            resp = await user.client.get(f"/gettradelog/{user.uno}/{COIN}")
+            return resp.status_code == 200 and resp.json().get("success")
+
+        scenarios = [("loginchk", login, "/loginchk"), ("balance", balance, "/balance"),
+                     ("balancecrypto", balancecrypto, "/balancecrypto"), ("tradebuymarket", buy, "/tradebuymarket"),
+                     ("tradesellmarket", sell, "/tradesellmarket"), ("gettradelog", tradelog, "/gettradelog")]
+        endpoints = {}
+        for name, request, route in scenarios:
+            if args.only and name not in args.only:
+                continue
+            if name == "tradesellmarket":
+                await seed_holdings()
+            endpoints[name] = await run_load(name, users, request, args.concurrency, args.duration, counter, route)
+        if not args.only or "ws_coinprice" in args.only:
+            endpoints["ws_coinprice"] = await run_ws(f"ws://127.0.0.1:{port}", args.ws_clients, args.duration)
+        return {
+            "meta": {"dburl": main.engine.url.render_as_string(hide_password=True), "users": args.users,
+                     "concurrency": args.concurrency, "duration_sec": args.duration, "ws_rate": args.ws_rate,
+                     "upbit_latency_ms": args.upbit_latency_ms, "python": sys.version.split()[0],
+                     "started_at": datetime.now().isoformat(timespec="seconds")},
+            "endpoints": endpoints,
+            "upbit_requests": fake["stats"],
+        }
+    finally:
+        for user in users:
+            await user.client.aclose()
+        server.should_exit = True
+        await server_task
+        await main.engine.dispose()
+        await fake_runner.cleanup()
+        if tmpdir is not None:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="FastAPI 엔드포인트 벤치마크 (가짜 거래소 + 로컬 DB)")
+    parser.add_argument("--dburl", default=None, help="기본: 임시 SQLite 파일")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5.0, help="엔드포인트당 측정 시간(초)")
+    parser.add_argument("--init-amount", type=int, default=100_000_000)
+    parser.add_argument("--ws-clients", type=int, default=50)
+    parser.add_argument("--ws-rate", type=float, default=5.0, help="가짜 거래소 코드당 초당 틱 수")
+    parser.add_argument("--upbit-latency-ms", type=float, default=0.0)
+    parser.add_argument("--only", nargs="*", help="일부 엔드포인트만 (loginchk balance ... ws_coinprice)")
+    parser.add_argument("--out", default=None, help="JSON 보고서 파일 (기본: 표준출력)")
+    parser.add_argument("--verbose", action="store_true", help="앱의 print 출력을 그대로 둔다")
+    args = parser.parse_args()
+    stdout = sys.stdout
+    if not args.verbose:
+        # 앱이 요청마다 찍는 디버그 출력이 측정과 보고서를 가리지 않게 한다
+        sys.stdout = open(os.devnull, "w")
+    try:
+        report = asyncio.run(bench(args))
+    finally:
+        sys.stdout = stdout
+    body = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(body)
+    print(body)
+
+
+if __name__ == "__main__":
+    main_cli()
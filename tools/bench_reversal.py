@@ -0,0 +1,81 @@
+import argparse
+import json
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiTrader.vwmatrend import reversal_kernel
+
+
+# 반전 지점 계산 1회 비용: 기존 pandas apply + 파이썬 루프 방식 vs reversal_kernel
+# python tools/bench_reversal.py --sizes 150 10000
+
+def make_frame(n, seed=0, long_window=35):
+    rng = np.random.default_rng(seed)
+    rate = np.cumsum(rng.normal(0, 0.3, n))
+    rate[:long_window - 1] = np.nan
+    index = pd.date_range('2025-01-01', periods=n, freq='min', name='candle_date_time_kst')
+    return pd.DataFrame({'VWMA_diff_rate': rate}, index=index)
+
+
+def legacy(df):
+    # 이전 vwma_ma_cross_and_diff_noimage 6~7 단계
+    df = df.copy()
+    df['sign'] = df['VWMA_diff_rate'].apply(lambda x: 1 if x > 0 else (-1 if x < 0 else 0))
+    df['sign_change'] = df['sign'] * df['sign'].shift(1)
+    reversal_points = df[df['sign_change'] == -1]
+    reversal_indices = reversal_points.index.to_list()
+    reversal_distances = []
+    for i in range(1, len(reversal_indices)):
+        reversal_distances.append((reversal_indices[i] - reversal_indices[i - 1]).total_seconds() / 60)
+    slope = angle_deg = delta_x = None
+    if len(reversal_points.index) > 0:
+        x1 = reversal_points.index[-1]
+        x2 = df.index[-1]
+        delta_x = (x2 - x1).total_seconds() / 60
+        y1 = df.loc[x1, 'VWMA_diff_rate']
+        y2 = df.iloc[-1]['VWMA_diff_rate']
+        if delta_x != 0:
+            slope = (y2 - y1) / delta_x
+            angle_deg = np.degrees(np.arctan(slope))
+        else:
+            slope, angle_deg = float('inf'), 90.0
+    return reversal_indices, reversal_distances, slope, angle_deg, delta_x
+
+
+def kernel(df):
+    rev_idx, distances, slope, angle_deg, delta_x = reversal_kernel(
+        df['VWMA_diff_rate'].to_numpy(dtype=np.float64), df.index.as_unit('ns').asi8)
+    return df.index[rev_idx].to_list(), distances.tolist(), slope, angle_deg, delta_x
+
+
+def per_call_us(fn, df, repeat):
+    number = max(1, repeat)
+    return min(timeit.repeat(lambda: fn(df), number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="반전 지점 커널 마이크로 벤치마크")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[150, 10000])
+    args = parser.parse_args()
+    results = []
+    for n in args.sizes:
+        df = make_frame(n)
+        if legacy(df) != kernel(df):
+            raise SystemExit(f"결과 불일치: n={n}")
+        repeat = max(1, 20000 // n)
+        legacy_us = per_call_us(legacy, df, repeat)
+        kernel_us = per_call_us(lambda d: reversal_kernel(d['VWMA_diff_rate'].to_numpy(dtype=np.float64),
+                                                          d.index.as_unit('ns').asi8), df, repeat * 10)
+        results.append({"bars": n, "legacy_us": round(legacy_us, 1), "kernel_us": round(kernel_us, 1),
+                        "speedup": round(legacy_us / kernel_us, 1)})
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
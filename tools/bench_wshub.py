@@ -0,0 +1,71 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiTrader.wshub import UpbitWsHub
+from tools.fakeupbit import make_app, start_server
+
+
+# 가짜 거래소 하나에 허브 연결 하나를 붙이고 로컬 구독자 N 명에게 팬아웃되는 처리량을 잰다.
+# python tools/bench_wshub.py --subscribers 500 --codes 20 --ws-rate 50 --seconds 10
+
+async def consume(sub, counter, stop):
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(sub.get(), 0.5)
+        except asyncio.TimeoutError:
+            continue
+        counter[0] += 1
+
+
+async def run(args):
+    runner, port = await start_server(make_app(args.ws_rate))
+    hub = UpbitWsHub(f"ws://127.0.0.1:{port}/websocket/v1", queue_size=args.queue_size)
+    codes = [f"KRW-C{i:03d}" for i in range(args.codes)]
+    counter = [0]
+    stop = asyncio.Event()
+    subs = [hub.subscribe([codes[i % len(codes)]]) for i in range(args.subscribers)]
+    consumers = [asyncio.create_task(consume(sub, counter, stop)) for sub in subs]
+
+    await asyncio.sleep(1.0)  # 업스트림 구독 안정화
+    counter[0] = 0
+    started = time.perf_counter()
+    await asyncio.sleep(args.seconds)
+    elapsed = time.perf_counter() - started
+    delivered = counter[0]
+
+    stop.set()
+    await asyncio.gather(*consumers)
+    for sub in subs:
+        sub.close()
+    await hub.stop()
+    await runner.cleanup()
+
+    print(json.dumps({
+        "subscribers": args.subscribers,
+        "codes": args.codes,
+        "upstream_rate_per_code": args.ws_rate,
+        "seconds": round(elapsed, 3),
+        "delivered": delivered,
+        "delivered_per_sec": round(delivered / elapsed, 1),
+        "dropped": sum(sub.dropped for sub in subs),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="웹소켓 허브 팬아웃 벤치마크")
+    parser.add_argument("--subscribers", type=int, default=500)
+    parser.add_argument("--codes", type=int, default=20)
+    parser.add_argument("--ws-rate", type=float, default=20.0)
+    parser.add_argument("--queue-size", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+import dotenv
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiTrader import logbook
+from aiTrader.dbengine import make_engine, make_sessionmaker
+from aiTrader.orderexec import INSERT_BALANCES
+from tools.loadtest_db import setup_data
+
+
+# 거래 로그 키셋 페이지를 끝까지 따라가 모든 행이 정확히 한 번, 전체 조회와 같은 순서로 나오는지 확인한다.
+# NDJSON 스트림(stream_rows)도 같은 행을 주는지 본다. 읽기만 하므로 운영 DB 에도 돌릴 수 있다.
+#   python tools/check_logbook.py [--uno N] [--limits 1 7 200]      env dburl 의 DB
+#   python tools/check_logbook.py --seed                            임시 SQLite 에 부하 테스트 데이터 +
+#                                                                   같은 초에 몰린 주문 원장(앱 INSERT 그대로)을 만들어 확인
+
+SELECT_GROUPS = text(
+    "SELECT DISTINCT userNo, linkNo, currency FROM trWallet WHERE (:uno is null or userNo = :uno) "
+    "ORDER BY userNo, linkNo, currency")
+
+SEED_SECKEY = "20250101000000"
+
+
+async def seed(engine):
+    await setup_data(engine, 3, 40)
+    # 주문 원장처럼 regDate 를 DB 기본값(초 단위)으로 두고 한꺼번에 넣어 같은 regDate 의 행을 많이 만든다
+    async with engine.begin() as conn:
+        for i in range(150):
+            await conn.execute(INSERT_BALANCES, {
+                "uno": 9, "ctype": "BUY-KRW-BTC", "coinn": "KRW-BTC", "uprice": 100 + i, "seckey": SEED_SECKEY,
+                "krwin": None, "krwout": 100 + i, "remkrw": 1e7 - i, "coinin": 1, "coinout": None, "remcoin": i + 1})
+
+
+async def walk(session_factory, uno, seckey, coinn, limit):
+    keys, cursor, pages = [], None, 0
+    async with session_factory() as db:
+        while True:
+            rows, cursor = await logbook.fetch_page(db, uno, seckey, coinn, limit, cursor)
+            pages += 1
+            keys.extend(r[logbook.key_column()] for r in rows)
+            if cursor is None:
+                return keys, pages
+
+
+async def check(session_factory, uno, limits):
+    key = logbook.key_column()
+    async with session_factory() as db:
+        groups = (await db.execute(SELECT_GROUPS, {"uno": uno})).fetchall()
+    checked, report = 0, []
+    for g in groups:
+        async with session_factory() as db:
+            result = await db.execute(logbook.query("all"), {"uno": g.userNo, "coinn": g.currency, "seckey": g.linkNo})
+            expected = [row._mapping[key] for row in result]
+        streamed = []
+        async for chunk in logbook.stream_rows(session_factory, g.userNo, g.linkNo, g.currency, 50):
+            streamed.extend(json.loads(line)[key] for line in chunk.decode().splitlines())
+        results = {"stream": streamed}
+        for limit in limits:
+            results[f"limit={limit}"], _ = await walk(session_factory, g.userNo, g.linkNo, g.currency, limit)
+        checked += 1
+        for source, keys in results.items():
+            if keys != expected:
+                report.append({"userNo": g.userNo, "linkNo": g.linkNo, "currency": g.currency, "source": source,
+                               "rows": len(expected), "got": len(keys), "unique": len(set(keys))})
+    return checked, report
+
+
+async def _main(args):
+    tmpdir = None
+    if args.seed:
+        tmpdir = tempfile.mkdtemp(prefix="logbook_")
+        dburl = f"sqlite+aiosqlite:///{tmpdir}/logbook.db"
+    else:
+        dburl = os.getenv("dburl")
+    engine = make_engine(dburl)
+    try:
+        if args.seed:
+            await seed(engine)
+        return await check(make_sessionmaker(engine), args.uno, args.limits)
+    finally:
+        await engine.dispose()
+        if tmpdir:
+            for name in os.listdir(tmpdir):
+                os.remove(os.path.join(tmpdir, name))
+            os.rmdir(tmpdir)
+
+
+def main():
+    dotenv.load_dotenv()
+    parser = argparse.ArgumentParser(description="거래 로그 키셋 페이지 / 스트림 검증")
+    parser.add_argument("--uno", type=int, default=None)
+    parser.add_argument("--limits", type=int, nargs="+", default=[1, 7, logbook.PAGE_SIZE])
+    parser.add_argument("--seed", action="store_true", help="임시 SQLite 에 데이터를 만들어 확인")
+    args = parser.parse_args()
+    checked, report = asyncio.run(_main(args))
+    print(json.dumps({"checked": checked, "mismatches": report}, ensure_ascii=False, indent=2))
+    sys.exit(1 if report else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiTrader.candlefetch import CandleFetcher
+from aiTrader.candlestore import UPBIT_MAX_COUNT, candles_to_arrays
+from aiTrader.streamind import StreamingVwma
+from aiTrader.vwmatrend import vwma_diff_from_candles
+
+
+# StreamingVwma 결과를 pandas 구현(vwma_diff_from_candles)과 봉마다 비교한다.
+# StreamingVwma 는 단독 엔진이다 (앱의 트렌드 갱신은 vwmabatch 일괄 계산을 쓴다). 이 스크립트가 두 구현의 일치를 지킨다.
+# 기본 입력은 고정 시드로 만든 캔들이다 (업비트 응답 형식, 고가/저가 폭, 거래량 급증, 가격이 멈춘 구간 포함).
+#   python tools/check_streamind.py                                  생성 캔들로 비교 (매번 같은 값)
+#   python tools/check_streamind.py --candles KRW-BTC_1m.json        기록해 둔 업비트 캔들 파일 (최신순)
+#   python tools/check_streamind.py --record --candles KRW-ETH_3m.json --market KRW-ETH --unit 3m --bars 1500
+#                                                                    업비트(upbit_api_url)에서 받아 기록한 뒤 비교
+
+
+def synthetic_candles(n, seed=0, step_sec=60):
+    rng = np.random.default_rng(seed)
+    t0 = np.datetime64('2025-01-01T00:00:00')
+    returns = rng.normal(0, 0.004, n)
+    returns[rng.random(n) < 0.08] = 0.0  # 가격이 그대로인 봉 (변화율 부호 0 구간)
+    close = np.round(10000 * np.exp(np.cumsum(returns)), 1)
+    volume = rng.lognormal(1.0, 0.8, n)
+    spikes = rng.random(n) < 0.03
+    volume[spikes] *= rng.uniform(10, 40, int(spikes.sum()))
+    candles = []
+    for i in range(n):
+        c = float(close[i])
+        o = float(close[i - 1]) if i else c
+        spread = abs(rng.normal(0, 0.002)) * c
+        candles.append({
+            "candle_date_time_kst": str(t0 + np.timedelta64(i * step_sec, 's')),
+            "opening_price": o, "high_price": round(max(o, c) + spread, 1), "low_price": round(min(o, c) - spread, 1),
+            "trade_price": c, "candle_acc_trade_volume": float(volume[i]),
+        })
+    return candles[::-1]
+
+
+async def record_candles(path, market, candle_unit, bars):
+    # 최신 봉부터 to 커서로 과거로 거슬러 bars 개를 받아 최신순 리스트로 저장한다
+    fetcher = CandleFetcher()
+    candles, to = [], None
+    try:
+        while len(candles) < bars:
+            page = await fetcher.fetch(market, candle_unit, min(UPBIT_MAX_COUNT, bars - len(candles)), to)
+            candles.extend(page)
+            to = page[-1]["candle_date_time_utc"]
+            if len(page) < UPBIT_MAX_COUNT and len(candles) < bars:
+                break
+    finally:
+        await fetcher.close()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(candles, f, ensure_ascii=False, separators=(",", ":"))
+    return len(candles)
+
+
+def same(a, b, tol=1e-9):
+    if a is None or b is None:
+        return a is None and b is None
+    if math.isinf(a) or math.isinf(b):
+        return a == b
+    return math.isclose(a, b, rel_tol=tol, abs_tol=tol)
+
+
+def compare(candles, short_window, long_window, count):
+    ordered = candles[::-1]  # 오름차순
+    ts, rows = candles_to_arrays(candles)
+    engine = StreamingVwma(short_window, long_window, count)
+    mismatches = 0
+    checked = 0
+    for i in range(len(ordered)):
+        # 만들어지는 중인 봉이 먼저 들어왔다가 같은 ts 의 확정 봉으로 교체되는 경우도 함께 확인한다
+        engine.update(ts[i], rows[i, 3] * 1.003, rows[i, 4] * 0.5)
+        engine.update(ts[i], rows[i, 3], rows[i, 4])
+        if i + 1 < long_window + 2:
+            continue
+        window = ordered[max(0, i + 1 - count):i + 1][::-1]
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, idx, dist, slope, angle, delta_x = vwma_diff_from_candles(window, short_window, long_window)
+        _, s_idx, s_dist, s_slope, s_angle, s_delta_x = engine.result()
+        checked += 1
+        ok = (idx == s_idx and len(dist) == len(s_dist) and all(same(a, b) for a, b in zip(dist, s_dist))
+              and same(slope, s_slope, 1e-6) and same(angle, s_angle, 1e-6) and same(delta_x, s_delta_x))
+        if not ok:
+            mismatches += 1
+            print(f"불일치 bar={i}: pandas=({len(idx)}, {slope}, {delta_x}) stream=({len(s_idx)}, {s_slope}, {s_delta_x})")
+    return checked, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="스트리밍 VWMA 엔진 / pandas 구현 교차 검증")
+    parser.add_argument("--candles", help="업비트 캔들 JSON 파일 (최신순 리스트). 없으면 생성 캔들")
+    parser.add_argument("--record", action="store_true", help="업비트에서 받아 --candles 경로에 기록한 뒤 비교")
+    parser.add_argument("--market", default="KRW-BTC")
+    parser.add_argument("--unit", default="1m")
+    parser.add_argument("--bars", type=int, default=1500)
+    parser.add_argument("--short", type=int, default=3)
+    parser.add_argument("--long", type=int, default=35)
+    parser.add_argument("--count", type=int, default=150)
+    args = parser.parse_args()
+    if args.record and not args.candles:
+        parser.error("--record 에는 --candles 경로가 필요합니다")
+    if args.record:
+        n = asyncio.run(record_candles(args.candles, args.market, args.unit, args.bars))
+        print(f"{args.market} {args.unit} {n}봉 기록: {args.candles}")
+    if args.candles:
+        with open(args.candles, encoding="utf-8") as f:
+            candles = json.load(f)
+    else:
+        candles = synthetic_candles(args.bars)
+    checked, mismatches = compare(candles, args.short, args.long, args.count)
+    print(json.dumps({"checked": checked, "mismatches": mismatches}))
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
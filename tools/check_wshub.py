@@ -0,0 +1,75 @@
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiTrader.wshub import UpbitWsHub
+from tools.fakeupbit import make_app, start_server
+
+
+# 재접속 백오프 중에 마지막 구독자가 나가도 허브가 이벤트 루프를 막지 않고 쉬다가,
+# 다시 구독하면 새로 접속해 틱을 전달하는지 확인한다.
+# python tools/check_wshub.py
+
+WATCHDOG_SEC = 15
+
+
+def closed_port() -> int:
+    # 아무도 듣지 않는 포트 (접속이 바로 거절되어 백오프로 들어간다)
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def loop_ticks(seconds: float) -> int:
+    # 이벤트 루프가 돌고 있으면 10ms 마다 한 번씩 깨어난다
+    ticks, deadline = 0, time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+        ticks += 1
+    return ticks
+
+
+async def run():
+    hub = UpbitWsHub(f"ws://127.0.0.1:{closed_port()}/websocket/v1")
+    sub = hub.subscribe(["KRW-BTC"])
+    await asyncio.sleep(0.3)  # 첫 접속 실패 -> 백오프 sleep 중
+    sub.close()
+    ticks = await loop_ticks(2.0)
+    idle = hub._task is not None and not hub._task.done()
+
+    runner, port = await start_server(make_app(ws_rate=20))
+    hub.uri = f"ws://127.0.0.1:{port}/websocket/v1"
+    sub = hub.subscribe(["KRW-BTC"])
+    try:
+        tick = await asyncio.wait_for(sub.get(), 5)
+    except asyncio.TimeoutError:
+        tick = None
+    sub.close()
+    await hub.stop()
+    await runner.cleanup()
+    return {"loop_ticks_2s": ticks, "hub_idle": idle, "resubscribed": tick is not None}
+
+
+def main():
+    def watchdog():
+        print(json.dumps({"error": f"{WATCHDOG_SEC}초 안에 끝나지 않음 (이벤트 루프가 막힘)"}, ensure_ascii=False))
+        os._exit(1)
+
+    timer = threading.Timer(WATCHDOG_SEC, watchdog)
+    timer.daemon = True
+    timer.start()
+    report = asyncio.run(run())
+    timer.cancel()
+    print(json.dumps(report))
+    ok = report["loop_ticks_2s"] >= 50 and report["hub_idle"] and report["resubscribed"]
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
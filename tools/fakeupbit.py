@@ -0,0 +1,382 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiTrader.candlefetch import CANDLE_MAP
+from aiTrader.candlestore import KST_OFFSET
+
+
+# 오프라인 벤치마크용 가짜 업비트 거래소.
+# REST: /v1/market/all, /v1/ticker/all, /v1/ticker, /v1/candles/{minutes/N|days}, /v1/trades/ticks, /v1/orderbook
+# 웹소켓: /websocket/v1 (업비트와 같은 구독 메시지, 구독한 코드의 ticker/trade 를 지정한 속도로 흘려보낸다)
+# 가격은 (seed, 마켓, 시각) 으로 정해지는 결정적 곡선이라 같은 seed 면 같은 캔들이 나온다.
+# --archive 를 주면 캔들 보관소(aiTrader/candlearchive)에 있는 봉을 그대로 재생한다.
+# 지연(--latency-ms/--jitter-ms), 429(--error-rate, --rate-limit) 를 넣어 앱의 재시도/백오프 경로도 시험한다.
+# 앱 연결: upbit_api_url=http://127.0.0.1:8765 upbit_ws_url=ws://127.0.0.1:8765/websocket/v1
+
+MARKETS = ["KRW-BTC", "KRW-ETH", "KRW-XRP", "KRW-SOL", "KRW-DOGE", "KRW-ADA", "KRW-SUI", "KRW-TRX", "KRW-LINK",
+           "KRW-AVAX", "KRW-DOT", "KRW-BCH", "KRW-NEAR", "KRW-APT", "KRW-HBAR", "KRW-SHIB", "KRW-ETC", "KRW-XLM",
+           "KRW-SEI", "KRW-ARB"]
+MAX_COUNT = 200
+UNIT_SECONDS = {("minutes", m): m * 60 for _, (kind, m) in CANDLE_MAP.items() if kind == "minutes"}
+UNIT_SECONDS[("days", "")] = 86400
+UNIT_NAMES = {UNIT_SECONDS[(kind, m)]: name for name, (kind, m) in CANDLE_MAP.items()}
+
+
+def _fraction(*key) -> float:
+    # key 로 정해지는 [0, 1) 난수 (프로세스와 무관하게 같은 값)
+    return zlib.crc32(":".join(map(str, key)).encode()) / 2 ** 32
+
+
+class FakeMarket:
+    def __init__(self, seed: int = 0, base_price: float = 10000.0, markets=None, archive=None):
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.base_price = base_price
+        self.markets = list(markets or MARKETS)
+        self.archive = archive
+        self.prices = {}
+        self.sequence = 0
+
+    def curve(self, code: str, ts: float) -> float:
+        # 주기가 다른 사인파 몇 개를 겹친 가격 곡선. 마켓마다 기준가/위상이 다르다
+        base = self.base_price * 10 ** (4 * _fraction(self.seed, code, "base") - 2)
+        phase = 2 * math.pi * _fraction(self.seed, code, "phase")
+        wave = (0.03 * math.sin(2 * math.pi * ts / 86400 + phase) + 0.01 * math.sin(2 * math.pi * ts / 3600 + phase)
+                + 0.004 * math.sin(2 * math.pi * ts / 420 + 2 * phase))
+        return base * math.exp(wave)
+
+    def next_price(self, code: str) -> float:
+        price = self.curve(code, time.time()) * (1 + self.rng.gauss(0, 0.0005))
+        self.prices[code] = price
+        return price
+
+    def ticker(self, code: str) -> dict:
+        price = self.next_price(code)
+        now = int(time.time() * 1000)
+        return {
+            "type": "ticker",
+            "code": code,
+            "trade_price": round(price, 4),
+            "trade_volume": round(self.rng.uniform(0.001, 5), 8),
+            "ask_bid": self.rng.choice(("ASK", "BID")),
+            "timestamp": now,
+            "trade_timestamp": now,
+            "stream_type": "REALTIME",
+        }
+
+    def trade(self, code: str) -> dict:
+        msg = self.ticker(code)
+        self.sequence += 1
+        msg.update(type="trade", sequential_id=self.sequence)
+        return msg
+
+    def rest_ticker(self, code: str) -> dict:
+        price = round(self.next_price(code), 4)
+        now = datetime.now(timezone.utc)
+        kst = now + timedelta(seconds=KST_OFFSET)
+        prev = round(self.curve(code, now.timestamp() - 86400), 4)
+        return {
+            "market": code,
+            "trade_date": now.strftime("%Y%m%d"), "trade_time": now.strftime("%H%M%S"),
+            "trade_date_kst": kst.strftime("%Y%m%d"), "trade_time_kst": kst.strftime("%H%M%S"),
+            "trade_timestamp": int(now.timestamp() * 1000),
+            "opening_price": prev, "high_price": max(prev, price), "low_price": min(prev, price),
+            "trade_price": price, "prev_closing_price": prev,
+            "change": "RISE" if price > prev else "FALL" if price < prev else "EVEN",
+            "signed_change_price": round(price - prev, 4), "signed_change_rate": round(price / prev - 1, 6),
+            "trade_volume": round(self.rng.uniform(0.001, 5), 8),
+            "acc_trade_volume_24h": 1000.0, "acc_trade_price_24h": round(price * 1000, 2),
+            "timestamp": int(now.timestamp() * 1000),
+        }
+
+    def candle(self, code: str, unit_sec: int, start: int) -> dict:
+        # start: 봉 시작 시각 (UTC epoch 초)
+        opening = self.curve(code, start)
+        close = self.curve(code, start + unit_sec)
+        spread = abs(close - opening) + opening * 0.002 * _fraction(self.seed, code, unit_sec, start, "hl")
+        volume = 10 + 1000 * _fraction(self.seed, code, unit_sec, start, "vol")
+        return self._candle_row(code, unit_sec, start, opening, max(opening, close) + spread / 2,
+                                min(opening, close) - spread / 2, close, volume)
+
+    @staticmethod
+    def _candle_row(code, unit_sec, start, opening, high, low, close, volume) -> dict:
+        utc = datetime.fromtimestamp(start, timezone.utc)
+        row = {
+            "market": code,
+            "candle_date_time_utc": utc.strftime("%Y-%m-%dT%H:%M:%S"),
+            "candle_date_time_kst": (utc + timedelta(seconds=KST_OFFSET)).strftime("%Y-%m-%dT%H:%M:%S"),
+            "opening_price": round(opening, 4), "high_price": round(high, 4), "low_price": round(low, 4),
+            "trade_price": round(close, 4), "timestamp": (start + unit_sec) * 1000,
+            "candle_acc_trade_price": round(close * volume, 4), "candle_acc_trade_volume": round(volume, 8),
+        }
+        if unit_sec < 86400:
+            row["unit"] = unit_sec // 60
+        return row
+
+    def candles(self, code: str, unit_sec: int, count: int, to: float = None) -> list:
+        # 업비트처럼 to(UTC) 이전 봉을 최신순으로. to 가 없으면 진행 중인 봉부터
+        if self.archive is not None and unit_sec in UNIT_NAMES and self.archive.exists(code, UNIT_NAMES[unit_sec]):
+            return self._archived(code, unit_sec, count, to)
+        if to is None:
+            last = int(time.time() // unit_sec * unit_sec)
+        else:
+            last = int(math.ceil(to / unit_sec) * unit_sec) - unit_sec
+        return [self.candle(code, unit_sec, last - i * unit_sec) for i in range(count)]
+
+    def _archived(self, code: str, unit_sec: int, count: int, to: float = None) -> list:
+        series = self.archive.series(code, UNIT_NAMES[unit_sec])
+        end = None if to is None else int(to) + KST_OFFSET
+        cols = series.arrays(end=end)
+        n = len(cols["timestamp"])
+        rows = []
+        for i in range(n - 1, max(n - count, 0) - 1, -1):
+            rows.append(self._candle_row(code, unit_sec, int(cols["timestamp"][i]) - KST_OFFSET, cols["open"][i],
+                                         cols["high"][i], cols["low"][i], cols["close"][i], cols["volume"][i]))
+        return rows
+
+    def trades(self, code: str, count: int) -> list:
+        now = time.time()
+        rows = []
+        for i in range(count):
+            msg = self.trade(code)
+            ts = int((now - i * 0.5) * 1000)
+            rows.append({"market": code, "trade_price": msg["trade_price"], "trade_volume": msg["trade_volume"],
+                         "ask_bid": msg["ask_bid"], "timestamp": ts, "sequential_id": msg["sequential_id"],
+                         "trade_date_utc": datetime.fromtimestamp(ts / 1000, timezone.utc).strftime("%Y-%m-%d"),
+                         "trade_time_utc": datetime.fromtimestamp(ts / 1000, timezone.utc).strftime("%H:%M:%S")})
+        return rows
+
+    def orderbook(self, code: str, depth: int = 15) -> dict:
+        price = self.next_price(code)
+        tick = max(price * 0.0005, 0.0001)
+        units = [{"ask_price": round(price + (i + 1) * tick, 4), "bid_price": round(price - (i + 1) * tick, 4),
+                  "ask_size": round(self.rng.uniform(0.01, 10), 8), "bid_size": round(self.rng.uniform(0.01, 10), 8)}
+                 for i in range(depth)]
+        return {"market": code, "timestamp": int(time.time() * 1000),
+                "total_ask_size": round(sum(u["ask_size"] for u in units), 8),
+                "total_bid_size": round(sum(u["bid_size"] for u in units), 8), "orderbook_units": units}
+
+
+def parse_subscription(raw) -> dict:
+    # [{"ticket": ...}, {"type": "ticker", "codes": [...]}, ...] -> {type: set(codes)}
+    subs = {}
+    for item in json.loads(raw):
+        if isinstance(item, dict) and "type" in item:
+            subs[item["type"]] = set(item.get("codes", []))
+    return subs
+
+
+def parse_to(value: str):
+    # 업비트 to 파라미터: 'yyyy-MM-ddTHH:mm:ssZ' / 'yyyy-MM-dd HH:mm:ss' (UTC)
+    if not value:
+        return None
+    value = value.replace("Z", "").replace("T", " ")
+    return datetime.strptime(value, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+
+
+def error_response(status: int, name: str, message: str) -> web.Response:
+    return web.json_response({"error": {"name": name, "message": message}}, status=status)
+
+
+def codes_param(request, name: str = "markets") -> list:
+    return [c.strip() for c in request.query.get(name, "").split(",") if c.strip()]
+
+
+async def websocket_handler(request):
+    app = request.app
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+    subs = {}
+
+    async def streamer():
+        interval = 0.01
+        pending = 0.0
+        while not ws.closed:
+            await asyncio.sleep(interval)
+            pending += app["ws_rate"] * interval
+            count = int(pending)
+            pending -= count
+            for _ in range(count):
+                for code in subs.get("ticker", ()):
+                    await ws.send_bytes(json.dumps(app["market"].ticker(code)).encode())
+                for code in subs.get("trade", ()):
+                    await ws.send_bytes(json.dumps(app["market"].trade(code)).encode())
+
+    task = asyncio.create_task(streamer())
+    try:
+        async for msg in ws:
+            if msg.type in (web.WSMsgType.TEXT, web.WSMsgType.BINARY):
+                subs = parse_subscription(msg.data)
+    finally:
+        task.cancel()
+    return ws
+
+
+async def market_all(request):
+    return web.json_response([{"market": m, "korean_name": m.split("-")[1], "english_name": m.split("-")[1]}
+                              for m in request.app["market"].markets])
+
+
+async def ticker_all(request):
+    market = request.app["market"]
+    quotes = set(codes_param(request, "quote_currencies"))
+    return web.json_response([market.rest_ticker(m) for m in market.markets
+                              if not quotes or m.split("-")[0] in quotes])
+
+
+async def ticker(request):
+    market = request.app["market"]
+    codes = codes_param(request)
+    unknown = [c for c in codes if c not in market.markets]
+    if not codes or unknown:
+        return error_response(404, "Code not found", "마켓을 찾지 못하였습니다.")
+    return web.json_response([market.rest_ticker(c) for c in codes])
+
+
+async def candles(request):
+    market = request.app["market"]
+    code = request.query.get("market")
+    if code not in market.markets:
+        return error_response(404, "Code not found", "마켓을 찾지 못하였습니다.")
+    kind = request.match_info["kind"]
+    unit = int(request.match_info.get("unit", 0) or 0) if kind == "minutes" else ""
+    unit_sec = UNIT_SECONDS.get((kind, unit))
+    if unit_sec is None:
+        return error_response(400, "invalid_parameter_error", "지원하지 않는 캔들 단위")
+    try:
+        count = min(int(request.query.get("count", 1)), MAX_COUNT)
+        to = parse_to(request.query.get("to"))
+    except ValueError:
+        return error_response(400, "invalid_parameter_error", "잘못된 파라미터")
+    return web.json_response(market.candles(code, unit_sec, count, to))
+
+
+async def trades_ticks(request):
+    market = request.app["market"]
+    code = request.query.get("market")
+    if code not in market.markets:
+        return error_response(404, "Code not found", "마켓을 찾지 못하였습니다.")
+    return web.json_response(market.trades(code, min(int(request.query.get("count", 1)), 500)))
+
+
+async def orderbook(request):
+    market = request.app["market"]
+    codes = [c for c in codes_param(request) if c in market.markets]
+    if not codes:
+        return error_response(404, "Code not found", "마켓을 찾지 못하였습니다.")
+    return web.json_response([market.orderbook(c) for c in codes])
+
+
+async def stats(request):
+    return web.json_response(request.app["stats"])
+
+
+@web.middleware
+async def fault_middleware(request, handler):
+    # 지연 / 429 주입과 경로별 요청 수 집계. 웹소켓과 통계는 건드리지 않는다
+    app = request.app
+    if request.path.startswith("/v1/"):
+        route = request.match_info.route.resource.canonical if request.match_info.route.resource else request.path
+        counts = app["stats"].setdefault(route, {"requests": 0, "rejected": 0})
+        counts["requests"] += 1
+        delay = app["latency_ms"] + random.uniform(0, app["jitter_ms"])
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if (app["error_rate"] > 0 and random.random() < app["error_rate"]) or not app["bucket"].take():
+            counts["rejected"] += 1
+            resp = error_response(429, "too_many_requests", "Too many requests")
+        else:
+            resp = await handler(request)
+    else:
+        resp = await handler(request)
+    resp.headers["Access-Control-Allow-Origin"] = "*"
+    return resp
+
+
+class Bucket:
+    """초당 rate 개 요청만 통과시키는 토큰 버킷 (0 이면 제한 없음)."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated_at = time.monotonic()
+
+    def take(self) -> bool:
+        if self.rate <= 0:
+            return True
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+def make_app(ws_rate: float = 10.0, seed: int = 0, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+             error_rate: float = 0.0, rate_limit: float = 0.0, markets=None, archive=None) -> web.Application:
+    app = web.Application(middlewares=[fault_middleware])
+    app["ws_rate"] = ws_rate  # 코드당 초당 틱 수
+    app["market"] = FakeMarket(seed, markets=markets, archive=archive)
+    app["latency_ms"] = latency_ms
+    app["jitter_ms"] = jitter_ms
+    app["error_rate"] = error_rate  # 무작위 429 비율
+    app["bucket"] = Bucket(rate_limit)  # 초당 허용 요청 수, 넘으면 429
+    app["stats"] = {}
+    app.router.add_get("/websocket/v1", websocket_handler)
+    app.router.add_get("/v1/market/all", market_all)
+    app.router.add_get("/v1/ticker/all", ticker_all)
+    app.router.add_get("/v1/ticker", ticker)
+    app.router.add_get("/v1/candles/{kind:minutes}/{unit:\\d+}", candles)
+    app.router.add_get("/v1/candles/{kind:days}", candles)
+    app.router.add_get("/v1/trades/ticks", trades_ticks)
+    app.router.add_get("/v1/orderbook", orderbook)
+    app.router.add_get("/_stats", stats)
+    return app
+
+
+async def start_server(app: web.Application, host: str = "127.0.0.1", port: int = 0):
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, port
+
+
+def main():
+    parser = argparse.ArgumentParser(description="가짜 업비트 거래소 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ws-rate", type=float, default=10.0, help="코드당 초당 ticker 틱 수")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--markets", type=int, default=len(MARKETS), help="KRW 마켓 수 (기본 목록 뒤는 KRW-Cnnn)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="REST 응답 고정 지연")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="REST 응답 추가 지연 (0~값 균등)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="무작위 429 응답 비율 (0~1)")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="초당 허용 REST 요청 수 (0=무제한)")
+    parser.add_argument("--archive", default=None, help="캔들 보관소 디렉터리 (있는 봉은 재생)")
+    args = parser.parse_args()
+    markets = MARKETS[:args.markets] + [f"KRW-C{i:03d}" for i in range(max(args.markets - len(MARKETS), 0))]
+    archive = None
+    if args.archive:
+        from aiTrader.candlearchive import CandleArchive
+        archive = CandleArchive(args.archive)
+    web.run_app(make_app(args.ws_rate, args.seed, args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit,
+                         markets, archive), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import dotenv
+import numpy as np
+from sqlalchemy import Column, DateTime, Float, Index, Integer, MetaData, String, Table, insert, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiTrader.dbengine import make_engine, make_sessionmaker
+from aiTrader import logbook
+from aiTrader.walletstore import SELECT_AVG_BY_COIN, SELECT_BALANCES
+
+
+# DB 부하 테스트. /balance (잔고 + 평균단가) 와 거래 로그 조회를 동시에 흘려 req/s, 지연, 풀 대기 시간을 잰다.
+# python tools/loadtest_db.py --url sqlite+aiosqlite:////tmp/loadtest.db --setup --concurrency 32 --duration 10
+# MySQL: tools/schema.sql 적용 후 --url mysql+asyncmy://... --setup (빈 테이블에만 샘플 데이터를 넣는다)
+# 풀 설정은 dbengine 과 같은 env (db_pool_size, db_max_overflow ...) 로 바꿔가며 비교한다.
+
+COINS = ["KRW-BTC", "KRW-ETH", "KRW-XRP", "KRW-DOGE", "KRW-SOL"]
+
+# 앱의 raw SQL 이 기본값에 기대는 컬럼(attrib, regDate ...)은 server_default 로 둔다 (tools/schema.sql 과 같은 값)
+ATTRIB = text("'100001000010000'")
+NOW = text("CURRENT_TIMESTAMP")
+
+metadata = MetaData()
+tr_user = Table("trUser", metadata, Column("userNo", Integer, primary_key=True), Column("userName", String(50)),
+                Column("userRole", String(20)), Column("setupKey", String(20)), Column("userId", String(50)),
+                Column("userPasswd", String(100)), Column("lastLogin", DateTime),
+                Column("attrib", String(20), server_default=ATTRIB))
+tr_wallet = Table("trWallet", metadata, Column("walletNo", Integer, primary_key=True, autoincrement=True),
+                  Column("userNo", Integer), Column("changeType", String(30)), Column("currency", String(20)),
+                  Column("unitPrice", Float), Column("inAmt", Float), Column("outAmt", Float),
+                  Column("remainAmt", Float), Column("linkNo", String(20)),
+                  Column("attrib", String(20), server_default=ATTRIB), Column("regDate", DateTime, server_default=NOW),
+                  Index("ix_trWallet_logbook", "userNo", "linkNo", "currency", "regDate", "walletNo"))
+polaris_sets = Table("polarisSets", metadata, Column("setupNo", Integer, primary_key=True, autoincrement=True),
+                     Column("userNo", Integer), Column("coinName", String(20)),
+                     Column("stepAmt", Float, server_default="0"), Column("tradeType", String(20)),
+                     Column("maxAmt", Float, server_default="0"),
+                     Column("useYN", String(1), server_default="N"), Column("attrib", String(20), server_default=ATTRIB))
+tr_balance = Table("trBalance", metadata, Column("userNo", Integer, primary_key=True),
+                   Column("linkNo", String(20), primary_key=True), Column("currency", String(20), primary_key=True),
+                   Column("remainAmt", Float), Column("updDate", DateTime, server_default=NOW))
+tr_avg_cost = Table("trAvgCost", metadata, Column("userNo", Integer, primary_key=True),
+                    Column("linkNo", String(20), primary_key=True), Column("currency", String(20), primary_key=True),
+                    Column("sessionNo", Integer, primary_key=True), Column("buyAmt", Float), Column("buyQty", Float),
+                    Column("updDate", DateTime, server_default=NOW))
+
+
+async def setup_data(engine, users: int, trades: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.create_all)
+        if (await conn.execute(tr_user.select().limit(1))).first() is not None:
+            return
+        rng = random.Random(0)
+        seckey = "20250101000000"
+        start = datetime(2025, 1, 1)
+        await conn.execute(insert(tr_user), [
+            {"userNo": u, "userName": f"user{u}", "userRole": "user", "setupKey": seckey, "userId": f"user{u}",
+             "userPasswd": "x"} for u in range(1, users + 1)])
+        wallet, balance, avg = [], [], []
+        for u in range(1, users + 1):
+            for coin in COINS:
+                qty, amt, buyqty = 0.0, 0.0, 0.0
+                for t in range(trades):
+                    price = rng.uniform(100, 1000)
+                    volum = rng.uniform(0.1, 2)
+                    qty += volum
+                    amt += price * volum
+                    buyqty += volum
+                    wallet.append({"userNo": u, "changeType": f"BUY-{coin}", "currency": coin, "unitPrice": price,
+                                   "inAmt": volum, "remainAmt": qty, "linkNo": seckey,
+                                   "attrib": "100001000010000" if t == trades - 1 else "XXXUPXXXUP",
+                                   "regDate": start + timedelta(minutes=t)})
+                balance.append({"userNo": u, "linkNo": seckey, "currency": coin, "remainAmt": qty})
+                avg.append({"userNo": u, "linkNo": seckey, "currency": coin, "sessionNo": 0, "buyAmt": amt,
+                            "buyQty": buyqty})
+            balance.append({"userNo": u, "linkNo": seckey, "currency": "KRW", "remainAmt": 1e7})
+        await conn.execute(insert(tr_wallet), wallet)
+        await conn.execute(insert(tr_balance), balance)
+        await conn.execute(insert(tr_avg_cost), avg)
+
+
+async def balance_request(db, uno):
+    await db.execute(SELECT_BALANCES, {"uno": uno})
+    await db.execute(SELECT_AVG_BY_COIN, {"uno": uno, "seckey": "20250101000000"})
+
+
+async def logbook_request(db, uno):
+    await db.execute(logbook.query("first"), {"uno": uno, "coinn": random.choice(COINS), "seckey": "20250101000000",
+                                            "lim": 201})
+
+
+async def worker(session_factory, users: int, deadline: float, latencies: list, waits: list, errors: list):
+    while time.perf_counter() < deadline:
+        uno = random.randint(1, users)
+        request = balance_request if random.random() < 0.7 else logbook_request
+        started = time.perf_counter()
+        try:
+            async with session_factory() as db:
+                await db.connection()  # 풀에서 연결을 받는 시간
+                waits.append(time.perf_counter() - started)
+                await request(db, uno)
+        except Exception as e:
+            errors.append(str(e))
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+def percentiles(values) -> dict:
+    if not values:
+        return {}
+    arr = np.asarray(values) * 1000
+    return {"p50_ms": round(float(np.percentile(arr, 50)), 3), "p95_ms": round(float(np.percentile(arr, 95)), 3),
+            "p99_ms": round(float(np.percentile(arr, 99)), 3), "max_ms": round(float(arr.max()), 3)}
+
+
+async def main(args):
+    engine = make_engine(args.url)
+    try:
+        if args.setup:
+            await setup_data(engine, args.users, args.trades)
+        session_factory = make_sessionmaker(engine)
+        latencies, waits, errors = [], [], []
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(worker(session_factory, args.users, deadline, latencies, waits, errors)
+                               for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        report = {"url": engine.url.render_as_string(hide_password=True), "concurrency": args.concurrency,
+                  "requests": len(latencies), "errors": len(errors), "req_per_sec": round(len(latencies) / elapsed, 1),
+                  "latency": percentiles(latencies), "pool_wait": percentiles(waits),
+                  "pool": engine.pool.status()}
+        if errors:
+            report["first_error"] = errors[0]
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    dotenv.load_dotenv()
+    parser = argparse.ArgumentParser(description="DB 연결 풀 부하 테스트")
+    parser.add_argument("--url", default=os.getenv("dburl"))
+    parser.add_argument("--setup", action="store_true", help="테이블 생성 및 샘플 데이터 입력 (비어 있을 때만)")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--trades", type=int, default=40, help="사용자 x 코인당 원장 행 수")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    asyncio.run(main(parser.parse_args()))
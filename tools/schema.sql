@@ -0,0 +1,73 @@
+-- trsdeSimulator 테이블 정의 (MySQL / MariaDB)
+-- 로컬 부하 테스트나 새 환경 구성용. 기존 DB 에는 필요한 테이블/인덱스만 골라 적용한다.
+
+CREATE TABLE IF NOT EXISTS trUser (
+  userNo INT NOT NULL AUTO_INCREMENT,
+  userName VARCHAR(50) NOT NULL,
+  userRole VARCHAR(20) NULL,
+  setupKey VARCHAR(20) NULL,
+  userId VARCHAR(50) NOT NULL,
+  userPasswd VARCHAR(100) NOT NULL,
+  lastLogin DATETIME NULL,
+  attrib VARCHAR(20) NOT NULL DEFAULT '100001000010000',
+  PRIMARY KEY (userNo),
+  UNIQUE KEY ux_trUser_userId (userId)
+);
+
+-- 거래 원장. 행은 추가만 하고 지난 잔고 행은 attrib 에 XXX 를 넣어 마감한다
+-- trWallet 은 앱이 이름으로 쓰는 컬럼만 맞춘 재구성이다. 운영 테이블은 컬럼 순서가 다르고
+-- (SELECT * 결과를 [5]=currency, [9]=remainAmt 로 읽는다) 기본키 이름도 확인되지 않았다.
+-- walletNo 가 다르면 env logbook_key_column 에 운영 기본키 이름을 넣는다 (aiTrader/logbook.py).
+CREATE TABLE IF NOT EXISTS trWallet (
+  walletNo BIGINT NOT NULL AUTO_INCREMENT,
+  userNo INT NOT NULL,
+  changeType VARCHAR(30) NOT NULL,
+  currency VARCHAR(20) NOT NULL,
+  unitPrice DOUBLE NULL,
+  inAmt DOUBLE NULL,
+  outAmt DOUBLE NULL,
+  remainAmt DOUBLE NULL,
+  linkNo VARCHAR(20) NULL,
+  attrib VARCHAR(20) NOT NULL DEFAULT '100001000010000',
+  regDate DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (walletNo),
+  KEY ix_trWallet_user_currency (userNo, currency),
+  -- 거래 로그 키셋 페이지 / 평균단가 재구성 (aiTrader/logbook.py)
+  KEY ix_trWallet_logbook (userNo, linkNo, currency, regDate, walletNo)
+);
+
+CREATE TABLE IF NOT EXISTS polarisSets (
+  setupNo INT NOT NULL AUTO_INCREMENT,
+  userNo INT NOT NULL,
+  coinName VARCHAR(20) NOT NULL,
+  stepAmt DOUBLE NOT NULL DEFAULT 0,
+  tradeType VARCHAR(20) NULL,
+  maxAmt DOUBLE NOT NULL DEFAULT 0,
+  useYN CHAR(1) NOT NULL DEFAULT 'N',
+  attrib VARCHAR(20) NOT NULL DEFAULT '100001000010000',
+  PRIMARY KEY (setupNo),
+  KEY ix_polarisSets_user (userNo),
+  KEY ix_polarisSets_use (useYN)
+);
+
+-- 현재 잔고 (aiTrader/walletstore.py)
+CREATE TABLE IF NOT EXISTS trBalance (
+  userNo INT NOT NULL,
+  linkNo VARCHAR(20) NOT NULL,
+  currency VARCHAR(20) NOT NULL,
+  remainAmt DOUBLE NOT NULL DEFAULT 0,
+  updDate DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (userNo, linkNo, currency)
+);
+
+-- 평균 매수단가 (aiTrader/walletstore.py)
+CREATE TABLE IF NOT EXISTS trAvgCost (
+  userNo INT NOT NULL,
+  linkNo VARCHAR(20) NOT NULL,
+  currency VARCHAR(20) NOT NULL,
+  sessionNo INT NOT NULL,
+  buyAmt DOUBLE NOT NULL DEFAULT 0,
+  buyQty DOUBLE NOT NULL DEFAULT 0,
+  updDate DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (userNo, linkNo, currency, sessionNo)
+);
@@ -0,0 +1,76 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+import dotenv
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiTrader.walletstore import SELECT_AVG_BY_COIN, SELECT_LEDGER_FOR_AVG, replay_avg_cost
+
+
+# trAvgCost 평균단가를 원장(trWallet)에서 다시 계산한 값과 비교한다.
+# 1) 예전 get_avg_by_coin 윈도 함수 쿼리 결과  2) 원장 재생(replay_avg_cost) 결과  두 가지와 모두 비교.
+# python tools/verify_avgcost.py [--uno N] [--tol 0.01]
+
+LEGACY_AVG_BY_COIN = text(
+    "SELECT currency,IFNULL(누적매수금액 / NULLIF(누적매수수량,0), 0) AS avg_price FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY currency ORDER BY regDate DESC, linkNo DESC) AS rn,SUM(CASE WHEN changeType LIKE 'BUY%' THEN unitPrice * inAmt ELSE 0 END) OVER (PARTITION BY currency, session_id ORDER BY regDate, linkNo ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS 누적매수금액, SUM(CASE WHEN changeType LIKE 'BUY%' THEN inAmt ELSE 0 END) OVER (PARTITION BY currency, session_id ORDER BY regDate, linkNo ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS 누적매수수량 FROM (SELECT *, SUM(is_zero) OVER (PARTITION BY currency ORDER BY regDate, linkNo ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS session_id FROM ( SELECT *, CASE WHEN remainAmt = 0 THEN 1 ELSE 0 END AS is_zero FROM trWallet WHERE userNo = :uno and linkNo = :linkno ORDER BY regDate, linkNo ) t1 ) t2) t3 WHERE rn = 1")
+
+SELECT_LINKS = text(
+    "SELECT DISTINCT userNo, linkNo FROM trWallet WHERE (:uno is null or userNo = :uno) ORDER BY userNo, linkNo")
+
+
+def diff_avg(expected: dict, actual: dict, tol: float):
+    diffs = []
+    for coin in sorted(set(expected) | set(actual)):
+        if coin == "KRW":
+            continue
+        e, a = expected.get(coin, 0.0), actual.get(coin, 0.0)
+        if abs(e - a) > tol:
+            diffs.append({"currency": coin, "expected": e, "actual": a})
+    return diffs
+
+
+async def verify(db: AsyncSession, uno, tol: float):
+    replayed = replay_avg_cost((await db.execute(SELECT_LEDGER_FOR_AVG, {"uno": uno})).fetchall())
+    replay_avg = {}
+    for (u, link, coin), entry in replayed.items():
+        amt, qty = entry[max(entry)]
+        replay_avg.setdefault((u, link), {})[coin] = amt / qty if qty else 0.0
+    checked, report = 0, []
+    for row in (await db.execute(SELECT_LINKS, {"uno": uno})).fetchall():
+        legacy = {r.currency: float(r.avg_price)
+                  for r in (await db.execute(LEGACY_AVG_BY_COIN, {"uno": row.userNo, "linkno": row.linkNo}))}
+        stored = {r.currency: float(r.avg_price)
+                  for r in (await db.execute(SELECT_AVG_BY_COIN, {"uno": row.userNo, "seckey": row.linkNo}))}
+        checked += 1
+        for source, expected in (("legacy", legacy), ("replay", replay_avg.get((row.userNo, row.linkNo), {}))):
+            diffs = diff_avg(expected, stored, tol)
+            if diffs:
+                report.append({"userNo": row.userNo, "linkNo": row.linkNo, "source": source, "diffs": diffs})
+    return checked, report
+
+
+async def _main(args):
+    engine = create_async_engine(os.getenv("dburl"))
+    try:
+        async with AsyncSession(engine) as db:
+            checked, report = await verify(db, args.uno, args.tol)
+    finally:
+        await engine.dispose()
+    for item in report:
+        print(json.dumps(item, ensure_ascii=False))
+    print(json.dumps({"checked": checked, "mismatches": len(report)}))
+    return 1 if report else 0
+
+
+if __name__ == "__main__":
+    dotenv.load_dotenv()
+    parser = argparse.ArgumentParser(description="trAvgCost / 원장 재계산 평균단가 비교")
+    parser.add_argument("--uno", type=int, help="특정 사용자만 검사")
+    parser.add_argument("--tol", type=float, default=1e-6)
+    sys.exit(asyncio.run(_main(parser.parse_args())))